@@ -1,77 +1,398 @@
-from flask import Flask, jsonify, request
+import logging
+
+import os
+
+from flask import Flask, Response, request, send_file
 from flask_cors import CORS
-from utils.manejador_json import leer_inventario, guardar_inventario, inicializar_inventario, generar_id
+from utils.manejador_json import inicializar_inventario
+from utils.almacen import almacen, ErrorAjuste, ProductoNoEncontrado, VersionDistinta, StockInsuficiente
+from utils.paginacion import LIMITE_MAXIMO, leer_parametros_pagina, codificar_cursor
+from utils.filtros import leer_filtros
+from utils.validaciones import validar_nuevo_producto, validar_cambios_producto
+from utils.exportacion import iterar_productos, generar_json, generar_ndjson
+from utils.importacion import FORMATOS, RegistroImportaciones, detectar_formato, guardar_subida
+from utils.serializacion import a_json, respuesta_json
+from utils.vencimientos import ProgramadorVencimientos
+from utils.compresion import comprimir_respuestas, comprimir_partes, etag_base
+from utils.condicional import etag_producto, fecha_producto, a_fecha, no_modificado, con_validadores
+from utils.metricas import registro, instrumentar
+from utils.logs import configurar_logs
 from models.producto import Producto
 from datetime import datetime
 
+configurar_logs()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app)
+instrumentar(app)
+comprimir_respuestas(app)
+
+# Tamaño del inventario, calculado al pedir /metrics (en modo particionado
+# sale de los resúmenes del manifiesto, sin leer las particiones)
+registro.medidor('inventario_productos', 'Productos en el inventario', almacen.total)
+registro.medidor('inventario_categorias', 'Categorías distintas', lambda: almacen.estadisticas()['categorias'])
+registro.medidor('inventario_unidades', 'Unidades en stock', lambda: almacen.estadisticas()['unidades'])
+registro.medidor('inventario_valor', 'Valor del stock (precio × cantidad)', lambda: almacen.estadisticas()['valor'])
+registro.medidor('inventario_revision', 'Última revisión del registro de cambios', almacen.revision_cambios)
+
+# Importaciones en segundo plano: el estado y el reporte quedan junto al
+# archivo del inventario, así que cualquier proceso responde por ellas
+importaciones = RegistroImportaciones(almacen.persistencia.directorio_importaciones)
+
+# Máximo de operaciones aceptadas en POST /api/productos/lote
+LOTE_MAXIMO = 5000
+
+# Un producto con cantidad menor o igual a este valor tiene stock bajo
+UMBRAL_STOCK_BAJO = 10
+
+# Ventana por defecto (y máxima) de GET /api/productos/por-vencer, en días
+DIAS_POR_VENCER = 7
+DIAS_MAXIMOS = 3650
+
+# Segundos máximos de espera de GET /api/productos/cambios, y cada cuánto
+# se envía un ping por Server-Sent Events si no hay cambios
+ESPERA_MAXIMA = 30
+ESPERA_SSE = 15
 
 # Manejo de errores globales
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({'success': False, 'error': 'Endpoint no encontrado'}), 404
+    return respuesta_json({'success': False, 'error': 'Endpoint no encontrado'}), 404
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({'success': False, 'error': 'Error interno del servidor'}), 500
+    return respuesta_json({'success': False, 'error': 'Error interno del servidor'}), 500
 
 @app.errorhandler(400)
 def bad_request(error):
-    return jsonify({'success': False, 'error': 'Solicitud incorrecta'}), 400
+    return respuesta_json({'success': False, 'error': 'Solicitud incorrecta'}), 400
 
 
 @app.route('/', methods=['GET'])
 def home():
-    return jsonify({
+    return respuesta_json({
         'mensaje': 'API de Gestión de Inventario',
         'version': '1.0',
         'endpoints': {
-            'GET /api/productos': 'Obtener todos los productos',
+            'GET /api/productos': 'Obtener los productos (limit, offset, cursor, fields, categoria, precio_min/max, cantidad_min/max, vence_desde/hasta, q)',
             'GET /api/productos/<id>': 'Obtener un producto específico',
+            'GET /api/productos/exportar': 'Exportar todo el catálogo en streaming (formato=json|ndjson, gzip=1)',
+            'GET /api/productos/estadisticas': 'Totales del inventario (productos, unidades y valor)',
+            'GET /api/productos/estadisticas/categorias': 'Totales por categoría',
+            'GET /api/productos/estadisticas/stock-bajo': 'Productos con stock bajo (umbral, limit)',
+            'GET /api/productos/por-vencer': 'Productos que vencen en los próximos N días (dias, limit)',
+            'GET /api/productos/vencidos': 'Productos ya vencidos (limit)',
+            'GET /api/productos/cambios': 'Cambios posteriores a una revisión (desde, limit, espera)',
+            'GET /api/productos/cambios/stream': 'Cambios en vivo por Server-Sent Events (desde o Last-Event-ID)',
+            'GET /metrics': 'Métricas en formato Prometheus (latencia por ruta, E/S del inventario, tamaño)',
             'POST /api/productos': 'Crear un nuevo producto',
             'PUT /api/productos/<id>': 'Actualizar un producto',
-            'DELETE /api/productos/<id>': 'Eliminar un producto'
+            'DELETE /api/productos/<id>': 'Eliminar un producto',
+            'POST /api/productos/lote': 'Crear, actualizar o eliminar varios productos a la vez',
+            'POST /api/productos/<id>/stock': 'Sumar o restar unidades de forma atómica (delta, version o If-Match)',
+            'POST /api/productos/reservas': 'Descontar stock de varios productos a la vez, todo o nada (items)',
+            'POST /api/productos/importar': 'Importar un archivo CSV o JSON grande en segundo plano (formato)',
+            'GET /api/productos/importaciones/<id>': 'Estado y progreso de una importación',
+            'GET /api/productos/importaciones/<id>/rechazos': 'Reporte CSV de las filas rechazadas'
         }
     }), 200
 
 
-# Obtener todos los productos
+# Métricas del proceso en formato de texto de Prometheus
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    return Response(registro.exponer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Obtener los productos (todos, o filtrados y paginados con limit/offset o cursor)
 @app.route('/api/productos', methods=['GET'])
 def obtener_productos():
     try:
-        productos = leer_inventario()
-        return jsonify({
+        try:
+            limite, desplazamiento, despues_de, campos = leer_parametros_pagina(request.args)
+            filtros = leer_filtros(request.args)
+        except ValueError as e:
+            return respuesta_json({
+                'success': False, 
+                'error': str(e)
+            }), 400
+        
+        # El listado depende solo de la versión del inventario: si el cliente
+        # ya la tiene, no hace falta armar la respuesta
+        etag, marca = almacen.version()
+        ultima_modificacion = a_fecha(marca)
+        if no_modificado(etag, ultima_modificacion):
+            return con_validadores(Response(status=304), etag, ultima_modificacion)
+
+        # La revisión se lee antes que la página: si algo cambia entre medio,
+        # el cliente volverá a recibir ese cambio al pedir /cambios?desde=revision
+        revision = almacen.revision_cambios()
+        productos, total, siguiente = almacen.pagina(limite, desplazamiento, despues_de, campos, filtros)
+        respuesta = respuesta_json({
             'success': True, 
-            'total': len(productos), 
+            'revision': revision,
+            'total': total, 
+            'limit': limite,
+            'offset': desplazamiento if despues_de is None else None,
+            'siguiente_cursor': codificar_cursor(siguiente) if siguiente is not None else None,
             'productos': productos
-        }), 200
+        })
+        return con_validadores(respuesta, etag, ultima_modificacion), 200
     except Exception as e:
-        return jsonify({
+        return respuesta_json({
             'success': False, 
             'error': f'Error al obtener productos: {str(e)}'
         }), 500
 
 
+# Exportar todo el catálogo en streaming (JSON o NDJSON). Con gzip=1 se comprime
+# siempre; si no, según Accept-Encoding como el resto de las respuestas.
+@app.route('/api/productos/exportar', methods=['GET'])
+def exportar_productos():
+    formato = request.args.get('formato', 'json')
+    if formato not in ('json', 'ndjson'):
+        return respuesta_json({
+            'success': False, 
+            'error': 'El formato debe ser json o ndjson'
+        }), 400
+    
+    productos = iterar_productos(almacen)
+    if formato == 'ndjson':
+        partes = generar_ndjson(productos)
+        mimetype = 'application/x-ndjson'
+    else:
+        partes = generar_json(productos)
+        mimetype = 'application/json'
+    
+    headers = {}
+    if request.args.get('gzip') in ('1', 'true'):
+        partes = comprimir_partes(partes, 'gzip')
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(partes, mimetype=mimetype, headers=headers)
+
+
+# Totales del inventario: cantidad de productos, unidades y valor (precio × cantidad)
+@app.route('/api/productos/estadisticas', methods=['GET'])
+def obtener_estadisticas():
+    try:
+        return respuesta_json({
+            'success': True,
+            'estadisticas': almacen.estadisticas()
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener estadísticas: {str(e)}'
+        }), 500
+
+
+# Totales por categoría
+@app.route('/api/productos/estadisticas/categorias', methods=['GET'])
+def obtener_estadisticas_categorias():
+    try:
+        return respuesta_json({
+            'success': True,
+            'categorias': almacen.estadisticas_categorias()
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener estadísticas: {str(e)}'
+        }), 500
+
+
+# Productos con poco stock (cantidad <= umbral), de menor a mayor cantidad
+@app.route('/api/productos/estadisticas/stock-bajo', methods=['GET'])
+def obtener_stock_bajo():
+    try:
+        umbral = int(request.args.get('umbral', UMBRAL_STOCK_BAJO))
+        limite = int(request.args.get('limit', LIMITE_MAXIMO))
+    except ValueError:
+        return respuesta_json({
+            'success': False,
+            'error': 'Los parámetros umbral y limit deben ser números enteros'
+        }), 400
+
+    if limite < 1:
+        return respuesta_json({
+            'success': False,
+            'error': 'El parámetro limit debe ser mayor que cero'
+        }), 400
+
+    try:
+        productos, total = almacen.stock_bajo(umbral, min(limite, LIMITE_MAXIMO))
+        return respuesta_json({
+            'success': True,
+            'umbral': umbral,
+            'total': total,
+            'productos': productos
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener productos con stock bajo: {str(e)}'
+        }), 500
+
+
+# Productos que vencen entre hoy y dentro de N días, por fecha de vencimiento
+@app.route('/api/productos/por-vencer', methods=['GET'])
+def obtener_por_vencer():
+    try:
+        dias = int(request.args.get('dias', DIAS_POR_VENCER))
+        limite = int(request.args.get('limit', LIMITE_MAXIMO))
+    except ValueError:
+        return respuesta_json({
+            'success': False,
+            'error': 'Los parámetros dias y limit deben ser números enteros'
+        }), 400
+
+    if dias < 0 or dias > DIAS_MAXIMOS or limite < 1:
+        return respuesta_json({
+            'success': False,
+            'error': f'El parámetro dias debe estar entre 0 y {DIAS_MAXIMOS} y limit debe ser mayor que cero'
+        }), 400
+
+    try:
+        productos, total = almacen.por_vencer(dias, min(limite, LIMITE_MAXIMO))
+        return respuesta_json({
+            'success': True,
+            'dias': dias,
+            'total': total,
+            'productos': productos
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener productos por vencer: {str(e)}'
+        }), 500
+
+
+# Productos ya vencidos (marcados por el barrido periódico)
+@app.route('/api/productos/vencidos', methods=['GET'])
+def obtener_vencidos():
+    try:
+        limite = int(request.args.get('limit', LIMITE_MAXIMO))
+    except ValueError:
+        limite = 0
+    if limite < 1:
+        return respuesta_json({
+            'success': False,
+            'error': 'El parámetro limit debe ser un número entero mayor que cero'
+        }), 400
+
+    try:
+        productos, total = almacen.vencidos(min(limite, LIMITE_MAXIMO))
+        return respuesta_json({
+            'success': True,
+            'total': total,
+            'productos': productos
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener productos vencidos: {str(e)}'
+        }), 500
+
+
+# Cambios posteriores a una revisión, para sincronizar por diferencias.
+# Con espera=S (segundos) la petición espera hasta que haya alguno (long-poll).
+@app.route('/api/productos/cambios', methods=['GET'])
+def obtener_cambios():
+    try:
+        desde = int(request.args.get('desde', 0))
+        limite = int(request.args.get('limit', LIMITE_MAXIMO))
+        espera = float(request.args.get('espera', 0))
+    except ValueError:
+        return respuesta_json({
+            'success': False,
+            'error': 'Los parámetros desde, limit y espera deben ser numéricos'
+        }), 400
+
+    if desde < 0 or limite < 1 or espera < 0:
+        return respuesta_json({
+            'success': False,
+            'error': 'Los parámetros desde y espera no pueden ser negativos y limit debe ser mayor que cero'
+        }), 400
+
+    try:
+        cambios = almacen.cambios_desde(desde, min(limite, LIMITE_MAXIMO), min(espera, ESPERA_MAXIMA))
+        if cambios is None:
+            return respuesta_json({
+                'success': False,
+                'error': f'La revisión {desde} ya no está en el registro de cambios. Descargue el catálogo completo de nuevo.',
+                'revision': almacen.revision_cambios()
+            }), 410
+
+        return respuesta_json({
+            'success': True,
+            'desde': desde,
+            'hasta': cambios[-1]['rev'] if cambios else desde,
+            'revision': almacen.revision_cambios(),
+            'cambios': cambios
+        }), 200
+    except Exception as e:
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al obtener cambios: {str(e)}'
+        }), 500
+
+
+# Los mismos cambios como Server-Sent Events; retoma desde Last-Event-ID al reconectar
+@app.route('/api/productos/cambios/stream', methods=['GET'])
+def transmitir_cambios():
+    try:
+        desde = int(request.headers.get('Last-Event-ID') or request.args.get('desde', 0))
+    except ValueError:
+        return respuesta_json({
+            'success': False,
+            'error': 'El parámetro desde debe ser un número entero'
+        }), 400
+
+    def generar(revision):
+        while True:
+            cambios = almacen.cambios_desde(revision, LIMITE_MAXIMO, ESPERA_SSE)
+            if cambios is None:
+                # El cliente quedó demasiado atrás: debe descargar el catálogo completo
+                yield b'event: reinicio\ndata: ' + a_json({'revision': almacen.revision_cambios()}) + b'\n\n'
+                return
+            if not cambios:
+                # Comentario para mantener viva la conexión
+                yield b': ping\n\n'
+                continue
+            for cambio in cambios:
+                yield f"id: {cambio['rev']}\nevent: cambio\ndata: ".encode('ascii') + a_json(cambio) + b'\n\n'
+            revision = cambios[-1]['rev']
+
+    return Response(generar(desde), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # Obtener un producto específico
 @app.route('/api/productos/<int:id>', methods=['GET'])
 def obtener_producto(id):
     try:
-        productos = leer_inventario()
-        producto = next((p for p in productos if p['id'] == id), None)
+        producto = almacen.obtener(id)
         
         if not producto:
-            return jsonify({
+            return respuesta_json({
                 'success': False, 
                 'error': 'Producto no encontrado'
             }), 404
         
-        return jsonify({
+        etag = etag_producto(producto)
+        ultima_modificacion = fecha_producto(producto)
+        if no_modificado(etag, ultima_modificacion):
+            return con_validadores(Response(status=304), etag, ultima_modificacion)
+
+        respuesta = respuesta_json({
             'success': True, 
             'producto': producto
-        }), 200
+        })
+        return con_validadores(respuesta, etag, ultima_modificacion), 200
     except Exception as e:
-        return jsonify({
+        return respuesta_json({
             'success': False, 
             'error': f'Error al obtener el producto: {str(e)}'
         }), 500
@@ -83,81 +404,31 @@ def crear_producto():
     try:
         data = request.get_json()
         
-        # Validar que se recibieron datos
-        if not data:
-            return jsonify({
-                'success': False, 
-                'error': 'No se recibieron datos'
-            }), 400
-        
-        # Validar nombre (obligatorio)
-        if not data.get('nombre') or not data.get('nombre').strip():
-            return jsonify({
-                'success': False, 
-                'error': 'El nombre es obligatorio'
-            }), 400
-        
-        # Validar categoría (obligatoria)
-        if not data.get('categoria') or not data.get('categoria').strip():
-            return jsonify({
+        # Validar los datos recibidos
+        campos, error = validar_nuevo_producto(data)
+        if error:
+            return respuesta_json({
                 'success': False, 
-                'error': 'La categoría es obligatoria'
+                'error': error
             }), 400
         
-        # Validar precio
-        try:
-            precio = float(data.get('precio', 0))
-            if precio < 0:
-                return jsonify({
-                    'success': False, 
-                    'error': 'El precio no puede ser negativo'
-                }), 400
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False, 
-                'error': 'El precio debe ser un número válido'
-            }), 400
-        
-        # Validar cantidad
-        try:
-            cantidad = int(data.get('cantidad', 0))
-            if cantidad < 0:
-                return jsonify({
-                    'success': False, 
-                    'error': 'La cantidad no puede ser negativa'
-                }), 400
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False, 
-                'error': 'La cantidad debe ser un número entero válido'
-            }), 400
-        
-        # Leer inventario actual
-        productos = leer_inventario()
-        
-        # Crear nuevo producto
+        # Crear nuevo producto (el almacén asigna el id)
         nuevo = Producto(
-            id=generar_id(productos),
-            nombre=data['nombre'].strip(),
-            categoria=data['categoria'].strip(),
-            descripcion=data.get('descripcion', '').strip(),
-            precio=precio,
-            cantidad=cantidad,
-            fecha_vencimiento=data.get('fecha_vencimiento', '').strip(),
-            fecha_creacion=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            id=None,
+            fecha_creacion=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            **campos
         )
         
-        productos.append(nuevo.to_dict())
-        guardar_inventario(productos)
+        producto = almacen.crear(nuevo.to_dict())
         
-        return jsonify({
+        return respuesta_json({
             'success': True, 
             'mensaje': 'Producto creado exitosamente', 
-            'producto': nuevo.to_dict()
+            'producto': producto
         }), 201
         
     except Exception as e:
-        return jsonify({
+        return respuesta_json({
             'success': False, 
             'error': f'Error al crear el producto: {str(e)}'
         }), 500
@@ -171,118 +442,344 @@ def actualizar_producto(id):
         
         # Validar que se recibieron datos
         if not data:
-            return jsonify({
+            return respuesta_json({
                 'success': False, 
                 'error': 'No se recibieron datos para actualizar'
             }), 400
         
-        productos = leer_inventario()
-        producto = next((p for p in productos if p['id'] == id), None)
-        
-        if not producto:
-            return jsonify({
+        if almacen.obtener(id) is None:
+            return respuesta_json({
                 'success': False, 
                 'error': 'Producto no encontrado'
             }), 404
         
-        # Validar nombre 
-        if 'nombre' in data:
-            if not data['nombre'] or not data['nombre'].strip():
-                return jsonify({
-                    'success': False, 
-                    'error': 'El nombre no puede estar vacío'
-                }), 400
-            producto['nombre'] = data['nombre'].strip()
-        
-        # Validar categoría 
-        if 'categoria' in data:
-            if not data['categoria'] or not data['categoria'].strip():
-                return jsonify({
-                    'success': False, 
-                    'error': 'La categoría no puede estar vacía'
-                }), 400
-            producto['categoria'] = data['categoria'].strip()
-        
-        # Validar precio 
-        if 'precio' in data:
-            try:
-                precio = float(data['precio'])
-                if precio < 0:
-                    return jsonify({
-                        'success': False, 
-                        'error': 'El precio no puede ser negativo'
-                    }), 400
-                producto['precio'] = precio
-            except (ValueError, TypeError):
-                return jsonify({
-                    'success': False, 
-                    'error': 'El precio debe ser un número válido'
-                }), 400
-        
-        # Validar cantidad 
-        if 'cantidad' in data:
-            try:
-                cantidad = int(data['cantidad'])
-                if cantidad < 0:
-                    return jsonify({
-                        'success': False, 
-                        'error': 'La cantidad no puede ser negativa'
-                    }), 400
-                producto['cantidad'] = cantidad
-            except (ValueError, TypeError):
-                return jsonify({
-                    'success': False, 
-                    'error': 'La cantidad debe ser un número entero válido'
-                }), 400
-        
-        # Actualizar descripción y fecha 
-        if 'descripcion' in data:
-            producto['descripcion'] = data['descripcion'].strip()
-        
-        if 'fecha_vencimiento' in data:
-            producto['fecha_vencimiento'] = data['fecha_vencimiento'].strip()
+        # Validar los campos enviados
+        cambios, error = validar_cambios_producto(data)
+        if error:
+            return respuesta_json({
+                'success': False, 
+                'error': error
+            }), 400
         
         # Agregar fecha 
-        producto['fecha_modificacion'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cambios['fecha_modificacion'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        guardar_inventario(productos)
+        producto = almacen.actualizar(id, cambios)
+        if not producto:
+            return respuesta_json({
+                'success': False, 
+                'error': 'Producto no encontrado'
+            }), 404
         
-        return jsonify({
+        return respuesta_json({
             'success': True, 
             'mensaje': 'Producto actualizado exitosamente', 
             'producto': producto
         }), 200
         
     except Exception as e:
-        return jsonify({
+        return respuesta_json({
             'success': False, 
             'error': f'Error al actualizar el producto: {str(e)}'
         }), 500
 
 
+# Crear, actualizar y eliminar varios productos en una sola petición
+@app.route('/api/productos/lote', methods=['POST'])
+def procesar_lote():
+    try:
+        data = request.get_json()
+        operaciones = data.get('operaciones') if isinstance(data, dict) else None
+        
+        if not isinstance(operaciones, list) or not operaciones:
+            return respuesta_json({
+                'success': False, 
+                'error': 'Se esperaba una lista de operaciones'
+            }), 400
+        
+        if len(operaciones) > LOTE_MAXIMO:
+            return respuesta_json({
+                'success': False, 
+                'error': f'El lote no puede tener más de {LOTE_MAXIMO} operaciones'
+            }), 400
+        
+        # Validar cada operación con las mismas reglas que los endpoints individuales
+        resultados = [None] * len(operaciones)
+        validas = []
+        indices = []
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        for i, operacion in enumerate(operaciones):
+            if not isinstance(operacion, dict):
+                resultados[i] = {'indice': i, 'success': False, 'error': 'Operación inválida'}
+                continue
+            
+            op = operacion.get('op')
+            id = operacion.get('id')
+            
+            if op in ('actualizar', 'eliminar') and (not isinstance(id, int) or isinstance(id, bool)):
+                resultados[i] = {'indice': i, 'success': False, 'error': 'Se requiere un id entero'}
+                continue
+            
+            if op == 'crear':
+                campos, error = validar_nuevo_producto(operacion.get('producto'))
+                if not error:
+                    datos = Producto(id=None, fecha_creacion=ahora, **campos).to_dict()
+            elif op == 'actualizar':
+                datos, error = validar_cambios_producto(operacion.get('producto'))
+                if not error:
+                    datos['fecha_modificacion'] = ahora
+            elif op == 'eliminar':
+                datos, error = None, None
+            else:
+                error = 'La operación debe ser crear, actualizar o eliminar'
+            
+            if error:
+                resultados[i] = {'indice': i, 'success': False, 'error': error}
+                continue
+            
+            validas.append((op, id, datos))
+            indices.append(i)
+        
+        # Aplicar todas las operaciones válidas y persistir una sola vez
+        for i, resultado in zip(indices, almacen.aplicar_lote(validas)):
+            if resultado is None:
+                resultados[i] = {'indice': i, 'success': False, 'error': 'Producto no encontrado'}
+            elif resultado is True:
+                resultados[i] = {'indice': i, 'success': True}
+            else:
+                resultados[i] = {'indice': i, 'success': True, 'producto': resultado}
+        
+        exitosas = sum(1 for r in resultados if r['success'])
+        return respuesta_json({
+            'success': True, 
+            'exitosas': exitosas,
+            'fallidas': len(resultados) - exitosas,
+            'resultados': resultados
+        }), 200
+        
+    except Exception as e:
+        return respuesta_json({
+            'success': False, 
+            'error': f'Error al procesar el lote: {str(e)}'
+        }), 500
+
+
+def _es_entero(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _error_ajuste(error):
+    # Respuesta para un ajuste de stock rechazado por el almacén
+    cuerpo = {'success': False, 'error': str(error), 'id': error.id}
+    if isinstance(error, ProductoNoEncontrado):
+        return respuesta_json(cuerpo), 404
+    if isinstance(error, VersionDistinta):
+        cuerpo['version_actual'] = error.version_actual
+        return respuesta_json(cuerpo), 412
+    if isinstance(error, StockInsuficiente):
+        cuerpo['disponible'] = error.disponible
+        cuerpo['solicitado'] = error.solicitado
+        return respuesta_json(cuerpo), 409
+    return respuesta_json(cuerpo), 400
+
+
+# Sumar o restar unidades de un producto. A diferencia de PUT con la cantidad
+# nueva, el almacén lee y escribe la cantidad en la misma sección crítica:
+# dos ventas simultáneas del mismo producto no se pisan. Con "version" (o la
+# cabecera If-Match) el ajuste solo se aplica si el producto no cambió
+# desde que el cliente lo leyó.
+@app.route('/api/productos/<int:id>/stock', methods=['POST'])
+def ajustar_stock(id):
+    try:
+        data = request.get_json(silent=True)
+        delta = data.get('delta') if isinstance(data, dict) else None
+        
+        if not _es_entero(delta) or delta == 0:
+            return respuesta_json({
+                'success': False, 
+                'error': 'Se esperaba un delta entero distinto de cero'
+            }), 400
+        
+        version = data.get('version')
+        if version is None and request.if_match and not request.if_match.star_tag:
+            version = next(iter(request.if_match.as_set()), None)
+            version = etag_base(version) if version is not None else None
+        if version is not None and not isinstance(version, str):
+            return respuesta_json({
+                'success': False, 
+                'error': 'La versión debe ser texto'
+            }), 400
+        
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            producto, = almacen.ajustar_cantidades([(id, delta, version)], ahora)
+        except ErrorAjuste as e:
+            return _error_ajuste(e)
+        
+        etag = etag_producto(producto)
+        respuesta = respuesta_json({
+            'success': True, 
+            'producto': producto,
+            'version': etag
+        })
+        return con_validadores(respuesta, etag), 200
+        
+    except Exception as e:
+        return respuesta_json({
+            'success': False, 
+            'error': f'Error al ajustar el stock: {str(e)}'
+        }), 500
+
+
+# Descontar stock de varios productos a la vez (p. ej. un carrito): o se
+# reservan todas las unidades o ninguna
+@app.route('/api/productos/reservas', methods=['POST'])
+def reservar_stock():
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return respuesta_json({
+                'success': False, 
+                'error': 'Se esperaba una lista de items'
+            }), 400
+        
+        if len(items) > LOTE_MAXIMO:
+            return respuesta_json({
+                'success': False, 
+                'error': f'La reserva no puede tener más de {LOTE_MAXIMO} items'
+            }), 400
+        
+        ajustes = []
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or not _es_entero(item.get('id')):
+                error = 'Se requiere un id entero'
+            elif not _es_entero(item.get('cantidad')) or item['cantidad'] <= 0:
+                error = 'La cantidad debe ser un entero mayor que cero'
+            elif item.get('version') is not None and not isinstance(item['version'], str):
+                error = 'La versión debe ser texto'
+            else:
+                ajustes.append((item['id'], -item['cantidad'], item.get('version')))
+                continue
+            return respuesta_json({
+                'success': False, 
+                'error': f'Item {i}: {error}',
+                'indice': i
+            }), 400
+        
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            productos = almacen.ajustar_cantidades(ajustes, ahora)
+        except ErrorAjuste as e:
+            return _error_ajuste(e)
+        
+        return respuesta_json({
+            'success': True, 
+            'resultados': [{'id': p['id'], 'cantidad': p['cantidad'], 'version': etag_producto(p)}
+                           for p in productos]
+        }), 200
+        
+    except Exception as e:
+        return respuesta_json({
+            'success': False, 
+            'error': f'Error al reservar el stock: {str(e)}'
+        }), 500
+
+
+# Importar un archivo grande (CSV, arreglo JSON o NDJSON). El cuerpo puede
+# ser el archivo directamente o un formulario multipart con el campo "archivo".
+# Se guarda en disco y se importa en segundo plano: la respuesta trae la
+# dirección donde consultar el progreso.
+@app.route('/api/productos/importar', methods=['POST'])
+def importar_productos():
+    subido = request.files.get('archivo')
+    formato = request.args.get('formato') or detectar_formato(
+        subido.filename if subido else None, subido.mimetype if subido else request.mimetype)
+    if formato not in FORMATOS:
+        return respuesta_json({
+            'success': False,
+            'error': 'El formato debe ser csv o json (parámetro formato, extensión del archivo o Content-Type)'
+        }), 400
+    
+    ruta = None
+    try:
+        ruta = guardar_subida(subido.stream if subido else request.stream)
+        if os.path.getsize(ruta) == 0:
+            os.remove(ruta)
+            return respuesta_json({
+                'success': False,
+                'error': 'No se recibió ningún archivo'
+            }), 400
+        
+        importacion = importaciones.iniciar(almacen, ruta, formato, borrar_archivo=True)
+        url = f'/api/productos/importaciones/{importacion.id}'
+        respuesta = respuesta_json({
+            'success': True,
+            'mensaje': 'Importación iniciada',
+            'estado_url': url,
+            'importacion': importacion.to_dict()
+        })
+        respuesta.headers['Location'] = url
+        return respuesta, 202
+    except Exception as e:
+        if ruta is not None and os.path.exists(ruta):
+            os.remove(ruta)
+        return respuesta_json({
+            'success': False,
+            'error': f'Error al iniciar la importación: {str(e)}'
+        }), 500
+
+
+# Estado de una importación: filas procesadas, aceptadas, rechazadas y progreso
+@app.route('/api/productos/importaciones/<id>', methods=['GET'])
+def obtener_importacion(id):
+    importacion = importaciones.obtener(id)
+    if importacion is None:
+        return respuesta_json({
+            'success': False,
+            'error': 'Importación no encontrada'
+        }), 404
+    
+    return respuesta_json({
+        'success': True,
+        'rechazos_url': f'/api/productos/importaciones/{id}/rechazos',
+        'importacion': importacion
+    }), 200
+
+
+# Reporte de filas rechazadas (CSV con fila, error y datos originales)
+@app.route('/api/productos/importaciones/<id>/rechazos', methods=['GET'])
+def obtener_rechazos_importacion(id):
+    reporte = importaciones.reporte(id)
+    if reporte is None:
+        return respuesta_json({
+            'success': False,
+            'error': 'Importación no encontrada'
+        }), 404
+    
+    return send_file(reporte, mimetype='text/csv', as_attachment=True,
+                     download_name=f'rechazos_{id}.csv')
+
+
 # Eliminar un producto
 @app.route('/api/productos/<int:id>', methods=['DELETE'])
 def eliminar_producto(id):
     try:
-        productos = leer_inventario()
-        producto = next((p for p in productos if p['id'] == id), None)
-        
-        if not producto:
-            return jsonify({
+        if not almacen.eliminar(id):
+            return respuesta_json({
                 'success': False, 
                 'error': 'Producto no encontrado'
             }), 404
         
-        productos = [p for p in productos if p['id'] != id]
-        guardar_inventario(productos)
-        
-        return jsonify({
+        return respuesta_json({
             'success': True, 
             'mensaje': 'Producto eliminado exitosamente'
         }), 200
         
     except Exception as e:
-        return jsonify({
+        return respuesta_json({
             'success': False, 
             'error': f'Error al eliminar el producto: {str(e)}'
         }), 500
@@ -291,7 +788,9 @@ def eliminar_producto(id):
 if __name__ == '__main__':
     try:
         inicializar_inventario()
-        print("Servidor Flask corriendo en http://localhost:5000")
+        almacen.cargar()
+        ProgramadorVencimientos(almacen).iniciar()
+        logger.info("Servidor Flask corriendo en http://localhost:5000")
         app.run(debug=True, port=5000)
     except Exception as e:
-        print(f"Error al iniciar el servidor: {e}")
\ No newline at end of file
+        logger.exception("Error al iniciar el servidor: %s", e)
\ No newline at end of file
@@ -0,0 +1,104 @@
+# Micro-benchmarks de la capa de almacenamiento: lectura y escritura del
+# JSON, generación de ids, carga del almacén y sus operaciones más usadas,
+# para inventarios sintéticos de distintos tamaños.
+#
+# Uso: python backend_flask/benchmarks/bench_almacenamiento.py [--tamanos 1000 10000 100000]
+#        [--salida resultados.json] [--semilla 42]
+
+import argparse
+import os
+import random
+import tempfile
+
+from comun import medir, metadatos, imprimir_tabla, guardar_resultados
+from datos import generar_productos, escribir
+from utils.almacen import AlmacenInventario
+from utils.persistencia import PersistenciaJSON
+from utils.manejador_json import leer_inventario, guardar_inventario, generar_id
+from utils.serializacion import a_json
+
+# Presupuesto aproximado de "productos tocados" por benchmark: las
+# operaciones O(n) se repiten menos veces en inventarios grandes
+PRESUPUESTO = 2_000_000
+
+
+def repeticiones(n, minimo=3, maximo=200):
+    return max(minimo, min(maximo, PRESUPUESTO // max(n, 1)))
+
+
+def persistencia_json(archivo, retardo_escritura=0.5):
+    # Sin volcado binario, para medir siempre la carga desde el JSON
+    # (bench_arranque.py compara ambos caminos)
+    persistencia = PersistenciaJSON(archivo, retardo_escritura)
+    persistencia.volcado = None
+    return persistencia
+
+
+def benchmarks_tamano(n, directorio, semilla):
+    archivo = os.path.join(directorio, f'inventario_{n}.json')
+    productos = generar_productos(n, semilla)
+    escribir(productos, archivo)
+    azar = random.Random(semilla)
+    reps = repeticiones(n)
+    resultados = []
+
+    # Funciones de utils/manejador_json.py (trabajan sobre el archivo completo)
+    resultados.append(medir('leer_inventario', lambda i: leer_inventario(archivo), reps, n))
+    copia = os.path.join(directorio, f'copia_{n}.json')
+    resultados.append(medir('guardar_inventario', lambda i: guardar_inventario(productos, copia), reps, n))
+    resultados.append(medir('generar_id (recorrido lineal)', lambda i: generar_id(productos), reps, n))
+    resultados.append(medir('a_json lista completa', lambda i: a_json(productos), reps, n))
+
+    # Almacén en memoria. El retardo de escritura enorme deja fuera del tiempo
+    # las reescrituras en segundo plano: se mide solo el trabajo en memoria.
+    resultados.append(medir('AlmacenInventario.cargar',
+                            lambda i: AlmacenInventario(persistencia=persistencia_json(archivo)).cargar(),
+                            max(3, reps // 4), n))
+    almacen = AlmacenInventario(persistencia=persistencia_json(archivo, retardo_escritura=3600))
+    almacen.cargar()
+
+    ids = [azar.randint(1, n) for _ in range(2000)]
+    resultados.append(medir('almacen.obtener', lambda i: almacen.obtener(ids[i]), len(ids), n))
+    resultados.append(medir('almacen.pagina limit=100 offset',
+                            lambda i: almacen.pagina(100, desplazamiento=ids[i % 200] // 2), 200, n))
+    resultados.append(medir('almacen.pagina limit=100 cursor',
+                            lambda i: almacen.pagina(100, despues_de=ids[i % 200]), 200, n))
+    resultados.append(medir('almacen.pagina categoria limit=100',
+                            lambda i: almacen.pagina(100, filtros={'categoria': 'Lácteos'}), 100, n))
+    resultados.append(medir('almacen.pagina q=leche limit=100',
+                            lambda i: almacen.pagina(100, filtros={'q': 'leche'}), 100, n))
+    resultados.append(medir('almacen.listar + a_json',
+                            lambda i: a_json(almacen.listar()), max(3, reps // 2), n))
+    resultados.append(medir('almacen.crear', lambda i: almacen.crear({
+        'nombre': f'Nuevo {i}', 'categoria': 'Bebidas', 'descripcion': '', 'precio': 1.0,
+        'cantidad': 1, 'fecha_vencimiento': '', 'fecha_creacion': ''
+    }), 1000, n))
+    resultados.append(medir('almacen.actualizar', lambda i: almacen.actualizar(ids[i % len(ids)], {'cantidad': i}), 1000, n))
+    # Un mismo producto muy vendido: sube y baja una unidad por vez
+    resultados.append(medir('almacen.ajustar_cantidades (mismo id)', lambda i: almacen.ajustar_cantidades(
+        [(ids[0], -1 if i % 2 else 1, None)], '2026-01-01 00:00:00'), 1000, n))
+    resultados.append(medir('almacen.estadisticas', lambda i: almacen.estadisticas(), 1000, n))
+
+    almacen.cerrar()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de la capa de almacenamiento')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in args.tamanos:
+            resultados.extend(benchmarks_tamano(n, directorio, args.semilla))
+
+    imprimir_tabla(resultados)
+    if args.salida:
+        guardar_resultados(args.salida, metadatos(benchmark='almacenamiento', semilla=args.semilla), resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Tiempo de arranque del almacén: carga desde el JSON (decodificar y
+# construir los índices) contra carga desde el volcado binario, cuánto
+# cuesta escribir el volcado y cuánto tarda el rescate de un JSON dañado.
+#
+# Uso: python backend_flask/benchmarks/bench_arranque.py [--tamanos 100000 1000000]
+#        [--repeticiones 3] [--salida resultados.json] [--semilla 42]
+
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+from comun import resumir, metadatos, imprimir_tabla, guardar_resultados
+from datos import generar_productos, escribir
+from utils.almacen import AlmacenInventario
+from utils.manejador_json import firma_archivo, leer_inventario
+from utils.persistencia import PersistenciaJSON
+from utils.volcado import escribir_volcado
+
+
+def cronometrar(funcion, repeticiones, preparar=None):
+    duraciones = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+    return duraciones
+
+
+def almacen_sin_volcado(archivo):
+    # Carga siempre desde el JSON y no escribe volcados en segundo plano
+    persistencia = PersistenciaJSON(archivo, retardo_escritura=3600)
+    persistencia.volcado = None
+    return AlmacenInventario(persistencia=persistencia)
+
+
+def danar(origen, destino):
+    # Copia con bytes basura a mitad del archivo y el final cortado, como
+    # una escritura interrumpida sobre un disco con problemas
+    with open(origen, 'rb') as f:
+        contenido = f.read()
+    mitad = len(contenido) // 2
+    with open(destino, 'wb') as f:
+        f.write(contenido[:mitad] + b'\x00\xff basura' + contenido[mitad + 200:len(contenido) * 9 // 10])
+
+
+def benchmarks_tamano(n, directorio, semilla, repeticiones):
+    archivo = os.path.join(directorio, f'inventario_{n}.json')
+    escribir(generar_productos(n, semilla), archivo)
+    resultados = []
+
+    duraciones = cronometrar(lambda: leer_inventario(archivo), repeticiones)
+    resultados.append(resumir('leer_inventario (solo decodificar)', duraciones, n))
+
+    duraciones = cronometrar(lambda: almacen_sin_volcado(archivo).cargar(), repeticiones)
+    resultados.append(resumir('arranque desde JSON', duraciones, n))
+
+    almacen = almacen_sin_volcado(archivo)
+    almacen.cargar()
+    volcado = f"{archivo}.volcado"
+    duraciones = cronometrar(lambda: escribir_volcado(volcado, almacen._volcado(), firma_archivo(archivo)),
+                             repeticiones)
+    resultados.append(resumir('escribir volcado', duraciones, n, tamano_mb=round(os.path.getsize(volcado) / 1e6, 1)))
+    almacen.cerrar()
+    del almacen
+
+    def desde_volcado():
+        almacen = AlmacenInventario(archivo, modo='diferido', retardo_escritura=3600)
+        almacen.cargar()
+        if almacen.persistencia._volcado_al_dia is not True:
+            raise RuntimeError('No se usó el volcado')
+    duraciones = cronometrar(desde_volcado, repeticiones)
+    resultados.append(resumir('arranque desde volcado', duraciones, n))
+
+    danado = os.path.join(directorio, f'danado_{n}.json')
+    recuperados = []
+    duraciones = cronometrar(lambda: recuperados.append(len(leer_inventario(danado))), repeticiones,
+                             preparar=lambda: danar(archivo, danado))
+    resultados.append(resumir('rescate de JSON dañado', duraciones, n, recuperados=recuperados[-1]))
+
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de arranque: JSON contra volcado binario')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    directorio = tempfile.mkdtemp(prefix='bench_arranque_')
+    try:
+        for n in args.tamanos:
+            resultados.extend(benchmarks_tamano(n, directorio, args.semilla, args.repeticiones))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    imprimir_tabla(resultados)
+    for r in resultados:
+        if 'recuperados' in r:
+            print(f"{r['tamano']}: rescatados {r['recuperados']} productos del JSON dañado")
+    if args.salida:
+        guardar_resultados(args.salida, metadatos(benchmark='arranque', semilla=args.semilla), resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Compara el costo de una escritura con reescritura completa del JSON contra
+# el modo bitácora, para distintos tamaños de inventario.
+#
+# Uso: python backend_flask/benchmarks/bench_bitacora.py [tamaños...]
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.almacen import AlmacenInventario
+from utils.manejador_json import guardar_inventario
+
+# La reescritura completa es mucho más lenta: se hacen menos repeticiones
+ESCRITURAS = {'diferido': 20, 'bitacora': 500}
+
+
+def generar_productos(n):
+    return [{
+        'id': i,
+        'nombre': f'Producto {i}',
+        'categoria': f'Categoria {i % 20}',
+        'descripcion': 'Descripción de prueba',
+        'precio': float(i % 500),
+        'cantidad': i % 100,
+        'fecha_vencimiento': '',
+        'fecha_creacion': '2025-01-01 00:00:00'
+    } for i in range(1, n + 1)]
+
+
+def medir(n, modo, directorio):
+    archivo = os.path.join(directorio, f'inventario_{modo}_{n}.json')
+    guardar_inventario(generar_productos(n), archivo)
+
+    # Umbral enorme: se mide solo el costo de la escritura, sin compactación
+    almacen = AlmacenInventario(archivo, modo=modo, umbral_compactacion=1 << 40)
+    almacen.cargar()
+
+    inicio = time.perf_counter()
+    for i in range(ESCRITURAS[modo]):
+        almacen.actualizar(1 + i % n, {'cantidad': i})
+        if modo == 'diferido':
+            # Sin agrupar: una reescritura por operación, como antes
+            almacen.guardar()
+    transcurrido = time.perf_counter() - inicio
+
+    almacen.cerrar()
+    return transcurrido / ESCRITURAS[modo] * 1e6
+
+
+def main():
+    tamanos = [int(t) for t in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'productos':>10} {'reescritura (us)':>18} {'bitacora (us)':>15}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in tamanos:
+            completo = medir(n, 'diferido', directorio)
+            bitacora = medir(n, 'bitacora', directorio)
+            print(f"{n:>10} {completo:>18.1f} {bitacora:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Compara la memoria que ocupa el inventario como lista de diccionarios
+# (representación anterior) contra objetos Producto con __slots__.
+# Cada medición corre en un proceso nuevo para que el RSS no se mezcle.
+#
+# Uso: python backend_flask/benchmarks/bench_memoria.py [tamaños...]
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPRESENTACIONES = ['dict', 'slots']
+
+
+def rss_kb():
+    # RSS actual del proceso (Linux); en otros sistemas, el máximo alcanzado
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def generar_archivo(n, archivo):
+    # Una línea por producto: cada uno se convierte al leerlo, sin tener
+    # nunca todo el JSON decodificado en memoria
+    with open(archivo, 'w', encoding='utf-8') as f:
+        for i in range(1, n + 1):
+            f.write(json.dumps({
+                'id': i,
+                'nombre': f'Producto {i}',
+                'categoria': f'Categoria {i % 20}',
+                'descripcion': f'Descripción de prueba {i % 1000}',
+                'precio': float(i % 500),
+                'cantidad': i % 100,
+                'fecha_vencimiento': f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}',
+                'fecha_creacion': '2025-01-01 00:00:00'
+            }, ensure_ascii=False) + '\n')
+
+
+def medir(representacion, archivo):
+    # Se ejecuta en el proceso hijo: carga el archivo y reporta el RSS agregado
+    import gc
+    from models.producto import Producto
+
+    convertir = Producto.from_dict if representacion == 'slots' else (lambda p: p)
+    gc.collect()
+    antes = rss_kb()
+    with open(archivo, encoding='utf-8') as f:
+        productos = {}
+        for linea in f:
+            p = json.loads(linea)
+            productos[p['id']] = convertir(p)
+    gc.collect()
+    print(json.dumps({'rss_kb': rss_kb() - antes, 'n': len(productos)}))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--medir':
+        medir(sys.argv[2], sys.argv[3])
+        return
+
+    tamanos = [int(t) for t in sys.argv[1:]] or [100000]
+    print(f"{'productos':>10} {'representación':>15} {'RSS (MB)':>10} {'bytes/producto':>15}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in tamanos:
+            archivo = os.path.join(directorio, f'productos_{n}.ndjson')
+            generar_archivo(n, archivo)
+            for representacion in REPRESENTACIONES:
+                salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', representacion, archivo],
+                                        capture_output=True, text=True, check=True).stdout
+                datos = json.loads(salida.strip().splitlines()[-1])
+                print(f"{n:>10} {representacion:>15} {datos['rss_kb'] / 1024:>10.1f} {datos['rss_kb'] * 1024 // n:>15}")
+
+
+if __name__ == '__main__':
+    main()
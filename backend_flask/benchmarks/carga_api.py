@@ -0,0 +1,139 @@
+# Generador de carga para la API: varios hilos hacen peticiones mezcladas
+# (lecturas, filtros, estadísticas y escrituras) durante un tiempo fijo y se
+# reporta el rendimiento y la latencia p50/p99 por endpoint.
+#
+# Sin --url se usa el cliente de pruebas de Flask sobre un inventario
+# sintético temporal (no hace falta levantar el servidor). Con --url se
+# ataca un servidor real con conexiones persistentes.
+#
+# Uso: python backend_flask/benchmarks/carga_api.py [--productos 10000] [--hilos 8]
+#        [--duracion 10] [--url http://127.0.0.1:5000] [--salida resultados.json]
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+# El backend lee INVENTARIO_ARCHIVO al importarse: la ruta temporal se fija
+# antes de importar cualquier módulo suyo
+_DIRECTORIO = tempfile.TemporaryDirectory(prefix='carga_api_')
+os.environ['INVENTARIO_ARCHIVO'] = os.path.join(_DIRECTORIO.name, 'inventario.json')
+
+from comun import resumir, metadatos, imprimir_tabla, guardar_resultados
+from datos import generar_productos, escribir, CATEGORIAS
+
+# (nombre, peso, método, ruta o función(azar, n) -> ruta, cuerpo o None)
+ESCENARIOS = [
+    ('GET /api/productos?limit=50', 30, 'GET',
+     lambda azar, n: f'/api/productos?limit=50&offset={azar.randint(0, max(0, n - 50))}', None),
+    ('GET /api/productos/<id>', 30, 'GET', lambda azar, n: f'/api/productos/{azar.randint(1, n)}', None),
+    ('GET /api/productos?categoria', 10, 'GET',
+     lambda azar, n: f'/api/productos?limit=50&categoria={azar.choice(CATEGORIAS)}', None),
+    ('GET /api/productos?q', 5, 'GET', lambda azar, n: '/api/productos?limit=50&q=leche', None),
+    ('GET /api/productos/estadisticas', 5, 'GET', lambda azar, n: '/api/productos/estadisticas', None),
+    ('POST /api/productos', 10, 'POST', lambda azar, n: '/api/productos',
+     lambda azar: {'nombre': f'Carga {azar.random()}', 'categoria': azar.choice(CATEGORIAS),
+                   'descripcion': '', 'precio': 10, 'cantidad': 5, 'fecha_vencimiento': ''}),
+    ('PUT /api/productos/<id>', 10, 'PUT', lambda azar, n: f'/api/productos/{azar.randint(1, n)}',
+     lambda azar: {'cantidad': azar.randint(0, 500)}),
+]
+
+
+def cliente_prueba():
+    # Cada hilo usa su propio cliente de pruebas sobre la misma aplicación
+    from app import app
+    clientes = threading.local()
+
+    def pedir(metodo, ruta, cuerpo):
+        if not hasattr(clientes, 'c'):
+            clientes.c = app.test_client()
+        return clientes.c.open(ruta, method=metodo, json=cuerpo).status_code
+    return pedir
+
+
+def cliente_http(url):
+    import requests
+    sesiones = threading.local()
+
+    def pedir(metodo, ruta, cuerpo):
+        if not hasattr(sesiones, 's'):
+            sesiones.s = requests.Session()
+        return sesiones.s.request(metodo, url + ruta, json=cuerpo, timeout=30).status_code
+    return pedir
+
+
+def ejecutar(pedir, n, hilos, duracion, semilla):
+    nombres = [e[0] for e in ESCENARIOS]
+    pesos = [e[1] for e in ESCENARIOS]
+    duraciones = {nombre: [] for nombre in nombres}
+    errores = {nombre: 0 for nombre in nombres}
+    lock = threading.Lock()
+    fin = time.perf_counter() + duracion
+
+    def hilo(numero):
+        azar = random.Random(semilla * 1000 + numero)
+        propias = {nombre: [] for nombre in nombres}
+        fallidas = {nombre: 0 for nombre in nombres}
+        while time.perf_counter() < fin:
+            nombre, _, metodo, ruta, cuerpo = ESCENARIOS[azar.choices(range(len(ESCENARIOS)), pesos)[0]]
+            datos = cuerpo(azar) if cuerpo else None
+            inicio = time.perf_counter()
+            codigo = pedir(metodo, ruta(azar, n), datos)
+            propias[nombre].append(time.perf_counter() - inicio)
+            if codigo >= 400 and codigo != 404:
+                fallidas[nombre] += 1
+        with lock:
+            for nombre in nombres:
+                duraciones[nombre].extend(propias[nombre])
+                errores[nombre] += fallidas[nombre]
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=hilo, args=(i,)) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    transcurrido = time.perf_counter() - inicio
+
+    resultados = [resumir(nombre, duraciones[nombre], n, transcurrido, errores=errores[nombre])
+                  for nombre in nombres if duraciones[nombre]]
+    todas = [d for nombre in nombres for d in duraciones[nombre]]
+    resultados.append(resumir('total', todas, n, transcurrido, errores=sum(errores.values())))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de la API')
+    parser.add_argument('--productos', type=int, default=10000)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=10)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--url', help='servidor real, p. ej. http://127.0.0.1:5000 (debe tener --productos productos)')
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    if args.url:
+        pedir = cliente_http(args.url.rstrip('/'))
+    else:
+        escribir(generar_productos(args.productos, args.semilla), os.environ['INVENTARIO_ARCHIVO'])
+        pedir = cliente_prueba()
+        from utils.almacen import almacen
+        almacen.cargar()
+
+    resultados = ejecutar(pedir, args.productos, args.hilos, args.duracion, args.semilla)
+
+    if not args.url:
+        almacen.cerrar()
+    _DIRECTORIO.cleanup()
+
+    imprimir_tabla(resultados)
+    if args.salida:
+        meta = metadatos(benchmark='carga_api', semilla=args.semilla, hilos=args.hilos, duracion=args.duracion,
+                         destino=args.url or 'cliente de pruebas')
+        guardar_resultados(args.salida, meta, resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Compara dos archivos de resultados (de bench_almacenamiento.py o
+# carga_api.py) y marca las regresiones de latencia p50 por encima del umbral.
+# Sale con código 1 si hay alguna, para poder usarlo en integración continua.
+#
+# Uso: python backend_flask/benchmarks/comparar.py base.json nuevo.json [--umbral 10]
+
+import argparse
+import json
+import sys
+
+
+def cargar(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    return datos.get('meta', {}), {(r['nombre'], r['tamano']): r for r in datos['resultados']}
+
+
+def variacion(antes, despues):
+    return (despues - antes) / antes * 100 if antes else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara dos corridas de benchmarks')
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=10, help='porcentaje de aumento del p50 que cuenta como regresión')
+    args = parser.parse_args()
+
+    meta_base, base = cargar(args.base)
+    meta_nuevo, nuevo = cargar(args.nuevo)
+    for clave in ('python', 'plataforma', 'orjson'):
+        if meta_base.get(clave) != meta_nuevo.get(clave):
+            print(f"[AVISO] {clave} distinto: {meta_base.get(clave)} -> {meta_nuevo.get(clave)}")
+
+    print(f"{'benchmark':<40} {'tamaño':>9} {'p50 antes':>11} {'p50 ahora':>11} {'p50 %':>8} {'p99 %':>8}")
+    regresiones = []
+    for clave in sorted(base.keys() & nuevo.keys(), key=lambda c: (c[1] or 0, c[0])):
+        antes, ahora = base[clave], nuevo[clave]
+        cambio_p50 = variacion(antes['p50_us'], ahora['p50_us'])
+        cambio_p99 = variacion(antes['p99_us'], ahora['p99_us'])
+        marca = ''
+        if cambio_p50 > args.umbral:
+            marca = '  <- regresión'
+            regresiones.append(clave)
+        nombre, tamano = clave
+        print(f"{nombre:<40} {'' if tamano is None else tamano:>9} {antes['p50_us']:>11.1f} "
+              f"{ahora['p50_us']:>11.1f} {cambio_p50:>+7.1f}% {cambio_p99:>+7.1f}%{marca}")
+
+    faltantes = base.keys() - nuevo.keys()
+    if faltantes:
+        print(f"[AVISO] {len(faltantes)} benchmarks de la base no están en la corrida nueva")
+
+    if regresiones:
+        print(f"[ERROR] {len(regresiones)} regresiones por encima del {args.umbral:.0f}%")
+        sys.exit(1)
+    print("[OK] Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
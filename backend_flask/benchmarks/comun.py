@@ -0,0 +1,88 @@
+# Funciones compartidas por los benchmarks: medición, percentiles y salida
+# en JSON para poder comparar corridas (ver comparar.py).
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentil(ordenados, p):
+    # Percentil p (0-100) de una lista ya ordenada, por rango más cercano
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def resumir(nombre, duraciones, tamano=None, transcurrido=None, **extra):
+    # duraciones en segundos -> resultado con latencias en microsegundos
+    ordenadas = sorted(duraciones)
+    total = transcurrido if transcurrido is not None else sum(ordenadas)
+    resultado = {
+        'nombre': nombre,
+        'tamano': tamano,
+        'repeticiones': len(ordenadas),
+        'media_us': round(sum(ordenadas) / len(ordenadas) * 1e6, 2) if ordenadas else 0.0,
+        'p50_us': round(percentil(ordenadas, 50) * 1e6, 2),
+        'p99_us': round(percentil(ordenadas, 99) * 1e6, 2),
+        'ops_s': round(len(ordenadas) / total, 1) if total else 0.0,
+    }
+    resultado.update(extra)
+    return resultado
+
+
+def medir(nombre, funcion, repeticiones, tamano=None, preparar=None):
+    # Ejecuta funcion(i) "repeticiones" veces y mide cada llamada por separado.
+    # preparar(i), si se da, corre antes de cada llamada sin contar en el tiempo.
+    duraciones = []
+    for i in range(repeticiones):
+        if preparar is not None:
+            preparar(i)
+        inicio = time.perf_counter()
+        funcion(i)
+        duraciones.append(time.perf_counter() - inicio)
+    return resumir(nombre, duraciones, tamano)
+
+
+def metadatos(**extra):
+    # Datos del entorno, para saber si dos corridas son comparables
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import orjson
+        version_orjson = orjson.__version__
+    except ImportError:
+        version_orjson = None
+    datos = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'orjson': version_orjson,
+    }
+    datos.update(extra)
+    return datos
+
+
+def imprimir_tabla(resultados):
+    print(f"{'benchmark':<40} {'tamaño':>9} {'reps':>7} {'p50 (us)':>12} {'p99 (us)':>12} {'ops/s':>11}")
+    for r in resultados:
+        tamano = '' if r['tamano'] is None else r['tamano']
+        print(f"{r['nombre']:<40} {tamano:>9} {r['repeticiones']:>7} "
+              f"{r['p50_us']:>12.1f} {r['p99_us']:>12.1f} {r['ops_s']:>11.1f}")
+
+
+def guardar_resultados(ruta, meta, resultados):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {ruta}")
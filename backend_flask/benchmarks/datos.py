@@ -0,0 +1,66 @@
+# Generador de inventarios sintéticos reproducibles: la misma semilla y el
+# mismo tamaño producen siempre los mismos productos.
+#
+# Uso: python backend_flask/benchmarks/datos.py 100000 inventario.json [--semilla 42] [--formato json|ndjson]
+
+import argparse
+import random
+from datetime import date, timedelta
+
+import comun  # noqa: F401  (agrega backend_flask al path)
+from utils.manejador_json import guardar_inventario
+from utils.serializacion import a_json
+
+CATEGORIAS = [
+    'Lácteos', 'Panadería', 'Frutas', 'Verduras', 'Carnes', 'Pescados', 'Bebidas', 'Limpieza',
+    'Higiene', 'Congelados', 'Enlatados', 'Granos', 'Snacks', 'Dulces', 'Especias', 'Aceites',
+    'Mascotas', 'Bebés', 'Farmacia', 'Papelería'
+]
+NOMBRES = ['Leche', 'Pan', 'Queso', 'Manzana', 'Arroz', 'Frijol', 'Jabón', 'Café', 'Azúcar', 'Atún',
+           'Galleta', 'Jugo', 'Yogur', 'Harina', 'Pasta', 'Salsa', 'Cereal', 'Agua', 'Té', 'Miel']
+MARCAS = ['Del Valle', 'La Granja', 'Don Pedro', 'Doña María', 'El Sol', 'Premium', 'Económico', 'Natural']
+
+# Fecha fija: los vencimientos no dependen del día en que se generan
+FECHA_BASE = date(2026, 1, 1)
+
+
+def generar_productos(n, semilla=42):
+    azar = random.Random(semilla)
+    productos = []
+    for i in range(1, n + 1):
+        nombre = f'{azar.choice(NOMBRES)} {azar.choice(MARCAS)} {i}'
+        vence = azar.random() < 0.8
+        productos.append({
+            'id': i,
+            'nombre': nombre,
+            'categoria': azar.choice(CATEGORIAS),
+            'descripcion': f'{nombre}, presentación de {azar.randint(1, 20) * 50} g',
+            'precio': round(azar.uniform(0.5, 500), 2),
+            'cantidad': azar.randint(0, 500),
+            'fecha_vencimiento': (FECHA_BASE + timedelta(days=azar.randint(-60, 365))).isoformat() if vence else '',
+            'fecha_creacion': '2025-01-01 00:00:00'
+        })
+    return productos
+
+
+def escribir(productos, archivo, formato='json'):
+    if formato == 'ndjson':
+        with open(archivo, 'wb') as f:
+            f.write(b''.join(a_json(p) + b'\n' for p in productos))
+        return True
+    return guardar_inventario(productos, archivo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un inventario sintético')
+    parser.add_argument('tamano', type=int)
+    parser.add_argument('archivo')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--formato', choices=['json', 'ndjson'], default='json')
+    args = parser.parse_args()
+    escribir(generar_productos(args.tamano, args.semilla), args.archivo, args.formato)
+    print(f"{args.tamano} productos escritos en {args.archivo}")
+
+
+if __name__ == '__main__':
+    main()
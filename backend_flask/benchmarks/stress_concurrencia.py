@@ -0,0 +1,117 @@
+# Prueba de estrés: varios procesos, cada uno con varios hilos, crean y
+# actualizan productos a la vez sobre el mismo archivo. Al final se verifica
+# que no haya ids duplicados ni actualizaciones perdidas.
+#
+# Uso: python backend_flask/benchmarks/stress_concurrencia.py [--modo bitacora|diferido|sqlite|particionado]
+#        [--procesos 4] [--hilos 4] [--operaciones 50]
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.almacen import AlmacenInventario
+from utils.manejador_json import inicializar_inventario
+
+
+def trabajador(archivo, modo, proceso, hilos, operaciones):
+    # Un proceso: crea y luego actualiza sus propios productos desde varios hilos
+    almacen = AlmacenInventario(archivo, modo=modo, multiproceso=True, umbral_compactacion=16 * 1024)
+    creados = []
+    lock = threading.Lock()
+
+    def hilo(numero):
+        propios = []
+        for k in range(operaciones):
+            producto = almacen.crear({
+                'nombre': f'p{proceso}-{numero}-{k}',
+                'categoria': f'c{k % 5}',
+                'descripcion': '',
+                'precio': 1.0,
+                'cantidad': 0,
+                'fecha_vencimiento': '',
+                'fecha_creacion': ''
+            })
+            propios.append(producto['id'])
+        for k, id in enumerate(propios):
+            if almacen.actualizar(id, {'cantidad': k + 1}) is None:
+                raise AssertionError(f'El producto {id} desapareció')
+        with lock:
+            creados.extend(propios)
+
+    threads = [threading.Thread(target=hilo, args=(n,)) for n in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    almacen.cerrar()
+    return creados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modo', default='bitacora', choices=['bitacora', 'diferido', 'sqlite', 'particionado'])
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--operaciones', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        if args.modo == 'sqlite':
+            archivo = os.path.join(directorio, 'inventario.db')
+        else:
+            archivo = os.path.join(directorio, 'inventario.json')
+            inicializar_inventario(archivo)
+
+        inicio = time.perf_counter()
+        with multiprocessing.Pool(args.procesos) as pool:
+            resultados = pool.starmap(trabajador, [
+                (archivo, args.modo, p, args.hilos, args.operaciones) for p in range(args.procesos)
+            ])
+        transcurrido = time.perf_counter() - inicio
+
+        ids = [id for creados in resultados for id in creados]
+        esperados = args.procesos * args.hilos * args.operaciones
+
+        # Verificar con un almacén nuevo, leyendo solo lo que quedó en disco
+        final = AlmacenInventario(archivo, modo=args.modo)
+        productos = final.listar()
+        # Registro de cambios: una revisión por operación, sin repetidas ni huecos
+        revisiones = [c['rev'] for c in final.cambios_desde(0)]
+        final.cerrar()
+
+        errores = []
+        if len(ids) != esperados:
+            errores.append(f'se esperaban {esperados} creaciones y hubo {len(ids)}')
+        if len(set(ids)) != len(ids):
+            errores.append(f'{len(ids) - len(set(ids))} ids duplicados')
+        if len(productos) != esperados:
+            errores.append(f'el inventario final tiene {len(productos)} productos, se esperaban {esperados}')
+        nombres = {p['nombre'] for p in productos}
+        if len(nombres) != len(productos):
+            errores.append('hay nombres repetidos en el inventario final')
+        sin_actualizar = [p['id'] for p in productos if p['cantidad'] != int(p['nombre'].rsplit('-', 1)[1]) + 1]
+        if sin_actualizar:
+            errores.append(f'{len(sin_actualizar)} actualizaciones perdidas')
+
+        operaciones = esperados * 2
+        if revisiones != list(range(1, operaciones + 1)):
+            errores.append(f'el registro de cambios tiene {len(revisiones)} revisiones '
+                           f'({len(set(revisiones))} distintas), se esperaban {operaciones} consecutivas')
+        print(f"modo={args.modo} procesos={args.procesos} hilos={args.hilos} "
+              f"operaciones={operaciones} tiempo={transcurrido:.2f}s ({operaciones / transcurrido:.0f} ops/s)")
+
+        if errores:
+            for error in errores:
+                print(f"[ERROR] {error}")
+            sys.exit(1)
+        print("[OK] Sin ids duplicados, actualizaciones perdidas ni revisiones repetidas")
+
+
+if __name__ == '__main__':
+    main()
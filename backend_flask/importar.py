@@ -0,0 +1,77 @@
+# Importa un archivo grande de productos (CSV, arreglo JSON o NDJSON) al
+# inventario, con las mismas reglas de validación que POST /api/productos.
+# Los ids del archivo se ignoran: el almacén asigna ids nuevos.
+#
+# Uso: python backend_flask/importar.py productos.csv [--formato csv|json]
+#        [--trabajadores 4] [--bloque 500] [--rechazos rechazos.csv]
+#
+# Escribe directamente en el archivo del inventario (INVENTARIO_ARCHIVO y
+# INVENTARIO_MODO, como la API): con la API corriendo a la vez hay que usar
+# INVENTARIO_MULTIPROCESO=1 en ambos, o importar por POST /api/productos/importar.
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.almacen import almacen
+from utils.importacion import FORMATOS, TAMANO_BLOQUE, Importacion, detectar_formato
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importar productos desde un archivo CSV o JSON')
+    parser.add_argument('archivo')
+    parser.add_argument('--formato', choices=FORMATOS, help='por defecto, según la extensión del archivo')
+    parser.add_argument('--trabajadores', type=int, default=1,
+                        help='procesos que validan en paralelo (1 = sin pool; aplicar al almacén suele pesar más)')
+    parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help='filas por commit')
+    parser.add_argument('--rechazos', help='dónde guardar el reporte CSV de filas rechazadas')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archivo):
+        print(f"[ERROR] No existe el archivo: {args.archivo}")
+        sys.exit(1)
+
+    formato = args.formato or detectar_formato(args.archivo)
+    if formato is None:
+        print("[ERROR] No se reconoce el formato por la extensión; indíquelo con --formato")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    almacen.cargar()
+    importacion = Importacion(almacen, args.archivo, formato, trabajadores=args.trabajadores,
+                              tamano_bloque=args.bloque).iniciar()
+    while importacion.estado in ('pendiente', 'en_curso'):
+        importacion.esperar(1)
+        estado = importacion.to_dict()
+        print(f"\r{estado['progreso']:5.1f}%  {estado['filas']} filas, {estado['aceptadas']} aceptadas, "
+              f"{estado['rechazadas']} rechazadas", end='', flush=True)
+    print()
+    importacion.esperar()
+    almacen.cerrar()
+
+    estado = importacion.to_dict()
+    if args.rechazos and estado['rechazadas']:
+        shutil.copyfile(importacion.reporte, args.rechazos)
+    os.remove(importacion.reporte)
+
+    if estado['estado'] != 'completada':
+        print(f"[ERROR] Importación interrumpida: {estado['error']} "
+              f"({estado['aceptadas']} productos ya importados)")
+        sys.exit(1)
+
+    ids = f" (ids {estado['ids']['primero']}-{estado['ids']['ultimo']})" if estado['ids'] else ''
+    print(f"[OK] {estado['aceptadas']} productos importados{ids}, {estado['rechazadas']} rechazados, "
+          f"en {time.perf_counter() - inicio:.2f}s")
+    if estado['rechazadas']:
+        for rechazo in estado['rechazos'][:10]:
+            print(f"  fila {rechazo['fila']}: {rechazo['error']}")
+        if args.rechazos:
+            print(f"Reporte completo en {args.rechazos}")
+
+
+if __name__ == '__main__':
+    main()
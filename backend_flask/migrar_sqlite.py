@@ -0,0 +1,53 @@
+# Migra el inventario de inventario.json (más su bitácora, si existe) a SQLite.
+#
+# Uso: python backend_flask/migrar_sqlite.py [origen.json] [destino.db] [--reemplazar]
+# Después iniciar la API con INVENTARIO_MODO=sqlite (e INVENTARIO_SQLITE=destino.db).
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.manejador_json import ARCHIVO
+from utils.persistencia import ARCHIVO_SQLITE, PersistenciaBitacora, PersistenciaSQLite
+from utils.almacen import AlmacenInventario
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrar el inventario JSON a SQLite')
+    parser.add_argument('origen', nargs='?', default=ARCHIVO)
+    parser.add_argument('destino', nargs='?', default=ARCHIVO_SQLITE)
+    parser.add_argument('--reemplazar', action='store_true',
+                        help='borrar los productos que ya tenga la base de datos')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.origen):
+        print(f"[ERROR] No existe el archivo de origen: {args.origen}")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+
+    # Se lee con la persistencia de bitácora para incluir operaciones no compactadas
+    origen = AlmacenInventario(persistencia=PersistenciaBitacora(args.origen))
+    productos = origen.listar()
+    origen.cerrar()
+
+    destino = PersistenciaSQLite(args.destino)
+    existentes, _ = destino.cargar()
+    if existentes and not args.reemplazar:
+        print(f"[ERROR] {args.destino} ya tiene {len(existentes)} productos. Use --reemplazar para sobrescribirlos.")
+        sys.exit(1)
+
+    with destino.bloqueo():
+        if existentes:
+            destino.vaciar()
+        destino.importar(productos)
+    destino.cerrar()
+
+    print(f"[OK] {len(productos)} productos migrados a {args.destino} en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
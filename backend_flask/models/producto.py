@@ -1,22 +1,105 @@
+import sys
+
+# Campos que puede tener un producto en el inventario
+CAMPOS = [
+    "id", "nombre", "categoria", "descripcion", "precio", "cantidad",
+    "fecha_vencimiento", "fecha_creacion", "fecha_modificacion"
+]
+
+_CONOCIDOS = frozenset(CAMPOS)
+_FALTA = object()
+
+
 class Producto:
-    def __init__(self, id, nombre, categoria, descripcion, precio, cantidad, fecha_vencimiento="", fecha_creacion=""):
+    # Registro compacto: con __slots__ cada producto ocupa una fracción de lo
+    # que ocupa un diccionario, lo que importa con catálogos grandes porque
+    # cada proceso tiene su propia copia en memoria.
+    #
+    # Un campo que no venía en los datos simplemente queda sin asignar, para
+    # que to_dict() devuelva exactamente la forma original. Los campos
+    # desconocidos se conservan en "extra". El almacén nunca modifica un
+    # producto en el lugar: con_cambios() devuelve uno nuevo.
+    __slots__ = CAMPOS + ["extra"]
+
+    def __init__(self, id, nombre, categoria, descripcion, precio, cantidad, fecha_vencimiento="", fecha_creacion="",
+                 fecha_modificacion=None, extra=None):
         self.id = id
         self.nombre = nombre
-        self.categoria = categoria
+        self.categoria = _internar(categoria)
         self.descripcion = descripcion
         self.precio = precio
         self.cantidad = cantidad
         self.fecha_vencimiento = fecha_vencimiento
         self.fecha_creacion = fecha_creacion
+        if fecha_modificacion is not None:
+            self.fecha_modificacion = fecha_modificacion
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, datos):
+        producto = cls.__new__(cls)
+        producto.extra = None
+        producto._asignar(datos)
+        return producto
+
+    def _asignar(self, datos):
+        for campo, valor in datos.items():
+            if campo in _CONOCIDOS:
+                setattr(self, campo, _internar(valor) if campo == "categoria" else valor)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[campo] = valor
+
+    def fila(self):
+        # Tupla compacta para el volcado binario (utils/volcado.py), o None
+        # si falta alguno de los campos básicos (se guarda como diccionario)
+        try:
+            return (self.id, self.nombre, self.categoria, self.descripcion, self.precio, self.cantidad,
+                    self.fecha_vencimiento, self.fecha_creacion, getattr(self, 'fecha_modificacion', ...),
+                    self.extra)
+        except AttributeError:
+            return None
+
+    @classmethod
+    def desde_fila(cls, fila):
+        # Inversa de fila(): sin recorrer campo por campo como from_dict
+        producto = cls.__new__(cls)
+        (producto.id, producto.nombre, categoria, producto.descripcion, producto.precio, producto.cantidad,
+         producto.fecha_vencimiento, producto.fecha_creacion, fecha_modificacion, producto.extra) = fila
+        producto.categoria = _internar(categoria)
+        if fecha_modificacion is not ...:
+            producto.fecha_modificacion = fecha_modificacion
+        return producto
+
+    def con_cambios(self, cambios):
+        # Copia del producto con los cambios aplicados
+        nuevo = Producto.__new__(Producto)
+        for campo in CAMPOS:
+            valor = getattr(self, campo, _FALTA)
+            if valor is not _FALTA:
+                setattr(nuevo, campo, valor)
+        nuevo.extra = dict(self.extra) if self.extra else None
+        nuevo._asignar(cambios)
+        return nuevo
+
+    def get(self, campo, defecto=None):
+        # Lectura al estilo de un diccionario (filtros e índices la usan)
+        if campo in _CONOCIDOS:
+            return getattr(self, campo, defecto)
+        return self.extra.get(campo, defecto) if self.extra else defecto
+
+    def to_dict(self, campos=None):
+        datos = {}
+        for campo in campos or CAMPOS:
+            valor = self.get(campo, _FALTA)
+            if valor is not _FALTA:
+                datos[campo] = valor
+        if self.extra and not campos:
+            datos.update(self.extra)
+        return datos
+
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nombre": self.nombre,
-            "categoria": self.categoria,
-            "descripcion": self.descripcion,
-            "precio": self.precio,
-            "cantidad": self.cantidad,
-            "fecha_vencimiento": self.fecha_vencimiento,
-            "fecha_creacion": self.fecha_creacion
-        }
+def _internar(valor):
+    # Las categorías se repiten mucho: una sola copia de cada texto
+    return sys.intern(valor) if type(valor) is str else valor
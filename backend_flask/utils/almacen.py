@@ -0,0 +1,692 @@
+import atexit
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+
+from utils.manejador_json import generar_id
+from utils.persistencia import (
+    MODO, RETARDO_ESCRITURA, UMBRAL_COMPACTACION, MULTIPROCESO, crear_persistencia
+)
+from utils.indices import IndiceHash, IndiceOrdenado, IndiceTexto
+from utils.estadisticas import Estadisticas
+from utils.cambios import RegistroCambios
+from utils.condicional import etag_producto
+from utils.filtros import es_fecha, cumple
+from models.producto import Producto
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorAjuste(Exception):
+    # Un ajuste de stock que no se aplicó; el lote completo queda sin cambios
+    def __init__(self, id, mensaje):
+        super().__init__(mensaje)
+        self.id = id
+
+
+class ProductoNoEncontrado(ErrorAjuste):
+    def __init__(self, id):
+        super().__init__(id, f'Producto {id} no encontrado')
+
+
+class VersionDistinta(ErrorAjuste):
+    # El producto cambió desde que el cliente leyó la versión que envió
+    def __init__(self, id, version_actual):
+        super().__init__(id, f'El producto {id} fue modificado (versión actual {version_actual})')
+        self.version_actual = version_actual
+
+
+class StockInsuficiente(ErrorAjuste):
+    def __init__(self, id, disponible, solicitado):
+        super().__init__(id, f'Stock insuficiente para el producto {id}: hay {disponible}, se piden {solicitado}')
+        self.disponible = disponible
+        self.solicitado = solicitado
+
+
+class AlmacenInventario:
+    # Inventario en memoria. El disco sigue siendo la fuente durable: se carga
+    # una sola vez al iniciar (en modo particionado, cada partición la primera
+    # vez que hace falta) y los cambios se persisten con la estrategia elegida
+    # (ver utils/persistencia.py).
+    #
+    # Es seguro entre hilos (un RLock protege todo el estado). Si la
+    # persistencia es multiproceso, cada modificación toma el bloqueo entre
+    # procesos, se pone al día con lo que escribieron los demás y persiste
+    # antes de soltarlo.
+
+    def __init__(self, archivo=None, modo=MODO, retardo_escritura=RETARDO_ESCRITURA,
+                 umbral_compactacion=UMBRAL_COMPACTACION, multiproceso=MULTIPROCESO, persistencia=None):
+        self.persistencia = persistencia or crear_persistencia(
+            modo, archivo, retardo_escritura=retardo_escritura,
+            umbral_compactacion=umbral_compactacion, multiproceso=multiproceso)
+
+        self._lock = threading.RLock()
+        # Índice id -> Producto (registro compacto; se convierte a diccionario
+        # solo al responder). Los dict de Python conservan el orden de
+        # inserción, así que también sirve como lista ordenada del inventario.
+        self._productos = {}
+        # Ids ordenados, para paginar por posición o por cursor sin recorrer todo
+        self._ids = []
+        # Mayor id asignado hasta ahora, para no recorrer todo al crear
+        self._max_id = 0
+        self._crear_indices()
+        self._cargado = False
+
+        self.ultima_modificacion = time.time()
+
+        # Registro de cambios con revisión global, para la sincronización incremental
+        self.cambios = RegistroCambios(self.persistencia.archivo_cambios,
+                                       multiproceso=self.persistencia.multiproceso)
+
+        self.persistencia.vincular(self._lock, self._instantanea, self._volcado)
+
+    # ---------------------------------------------------------------
+    # Carga y sincronización con el disco
+    # ---------------------------------------------------------------
+
+    def cargar(self):
+        with self._lock, self.persistencia.bloqueo():
+            volcado = self.persistencia.cargar_volcado()
+            if volcado is not None:
+                datos, registros = volcado
+                self._restaurar(datos)
+            else:
+                productos, registros = self.persistencia.cargar()
+                self._productos = {p['id']: Producto.from_dict(p) for p in productos if isinstance(p, dict) and 'id' in p}
+                self._ids = sorted(self._productos)
+                self._reconstruir_indices()
+                self._max_id = max(generar_id(productos) - 1, self.persistencia.id_maximo())
+
+            # Operaciones pendientes de repetir sobre la instantánea (bitácora)
+            for registro in registros:
+                self._aplicar(registro)
+
+            if not self._cargado:
+                # En las recargas posteriores el registro se pone al día solo
+                self.cambios.cargar()
+            self.ultima_modificacion = time.time()
+            self._cargado = True
+
+    def _instantanea(self, ids=None):
+        # Copia superficial: los productos nunca se modifican en el lugar, así
+        # que se pueden convertir a diccionarios después, fuera del lock.
+        # Con ids, solo esos productos (una partición).
+        with self._lock:
+            if ids is None:
+                return list(self._productos.values())
+            return [self._productos[i] for i in ids]
+
+    def _volcado(self):
+        # Estado para el volcado binario (utils/volcado.py): productos,
+        # estadísticas e índices caros de construir. El de categoría se
+        # recalcula al restaurar, que es rápido.
+        with self._lock:
+            return {
+                'productos': list(self._productos.values()),
+                'max_id': self._max_id,
+                'estadisticas': self._estadisticas.exportar(),
+                'texto': self._idx_texto.exportar(),
+                'precio': self._idx_precio.exportar(),
+                'cantidad': self._idx_cantidad.exportar(),
+                'vencimiento': self._idx_vencimiento.exportar(),
+            }
+
+    def _restaurar(self, datos):
+        productos = [Producto.desde_fila(f) for f in datos['filas']]
+        productos.extend(Producto.from_dict(p) for p in datos['otros'])
+        self._productos = {p.id: p for p in productos}
+        self._ids = sorted(self._productos)
+        self._max_id = max(datos['max_id'], self._ids[-1] if self._ids else 0)
+        self._crear_indices()
+        self._idx_texto.importar(datos['texto'])
+        self._idx_precio.importar(datos['precio'])
+        self._idx_cantidad.importar(datos['cantidad'])
+        self._idx_vencimiento.importar(datos['vencimiento'])
+        self._estadisticas.importar(datos['estadisticas'])
+        for id, p in self._productos.items():
+            self._idx_categoria.agregar(p.get('categoria'), id)
+
+    def _asegurar(self, ids=None, categorias=None, productos=None):
+        # Inventario particionado: lee las particiones que todavía no están en
+        # memoria y hacen falta para esos ids, categorías o productos nuevos
+        # (sin argumentos, todas). Con las demás persistencias no hace nada.
+        self._leer_particiones(self.persistencia.por_cargar(ids, categorias, productos))
+
+    def _leer_particiones(self, nombres):
+        if not nombres:
+            return
+        nuevos = [Producto.from_dict(p) for p in self.persistencia.cargar_particiones(nombres)]
+        for p in nuevos:
+            self._productos[p.id] = p
+        self._ids = sorted(self._productos)
+        self._productos = {i: self._productos[i] for i in self._ids}
+        self._indexar_varios(nuevos)
+        if self._ids:
+            self._max_id = max(self._max_id, self._ids[-1])
+
+    # ---------------------------------------------------------------
+    # Índices secundarios
+    # ---------------------------------------------------------------
+
+    def _crear_indices(self):
+        self._idx_categoria = IndiceHash()
+        self._idx_precio = IndiceOrdenado()
+        self._idx_cantidad = IndiceOrdenado()
+        self._idx_vencimiento = IndiceOrdenado()
+        self._idx_texto = IndiceTexto()
+        self._estadisticas = Estadisticas()
+        # Ids con fecha de vencimiento anterior a _corte_vencidos. El barrido
+        # solo recorre el tramo del índice de vencimiento entre el corte
+        # anterior y hoy, y cada cambio mantiene el conjunto al día.
+        self._vencidos = set()
+        self._corte_vencidos = ''
+
+    @staticmethod
+    def _es_numero(valor):
+        # NaN e inf (p. ej. de un archivo editado a mano) no se indexan
+        if isinstance(valor, float):
+            return math.isfinite(valor)
+        return isinstance(valor, int) and not isinstance(valor, bool)
+
+    def _reconstruir_indices(self):
+        # Al cargar se construyen de una vez (ordenar es más barato que insertar uno a uno)
+        self._crear_indices()
+        self._indexar_varios(self._productos.values())
+
+    def _indexar_varios(self, productos):
+        # Como _indexar para muchos productos: los índices ordenados se
+        # completan con un solo ordenamiento en lugar de un insort por producto
+        precios, cantidades, vencimientos = [], [], []
+        for p in productos:
+            id = p.id
+            self._estadisticas.agregar(p)
+            self._idx_categoria.agregar(p.get('categoria'), id)
+            self._idx_texto.agregar(p.get('nombre'), id)
+            self._idx_texto.agregar(p.get('descripcion'), id)
+            if self._es_numero(p.get('precio')):
+                precios.append((p.precio, id))
+            if self._es_numero(p.get('cantidad')):
+                cantidades.append((p.cantidad, id))
+            if es_fecha(p.get('fecha_vencimiento')):
+                vencimientos.append((p.fecha_vencimiento, id))
+                if p.fecha_vencimiento < self._corte_vencidos:
+                    self._vencidos.add(id)
+        self._idx_precio.agregar_varios(precios)
+        self._idx_cantidad.agregar_varios(cantidades)
+        self._idx_vencimiento.agregar_varios(vencimientos)
+
+    def _indexar(self, p):
+        id = p.id
+        self._estadisticas.agregar(p)
+        self._idx_categoria.agregar(p.get('categoria'), id)
+        self._idx_texto.agregar(p.get('nombre'), id)
+        self._idx_texto.agregar(p.get('descripcion'), id)
+        if self._es_numero(p.get('precio')):
+            self._idx_precio.agregar(p.precio, id)
+        if self._es_numero(p.get('cantidad')):
+            self._idx_cantidad.agregar(p.cantidad, id)
+        if es_fecha(p.get('fecha_vencimiento')):
+            self._idx_vencimiento.agregar(p.fecha_vencimiento, id)
+            if p.fecha_vencimiento < self._corte_vencidos:
+                self._vencidos.add(id)
+
+    def _desindexar(self, p):
+        id = p.id
+        self._estadisticas.quitar(p)
+        self._idx_categoria.quitar(p.get('categoria'), id)
+        self._idx_texto.quitar(p.get('nombre'), id)
+        self._idx_texto.quitar(p.get('descripcion'), id)
+        if self._es_numero(p.get('precio')):
+            self._idx_precio.quitar(p.precio, id)
+        if self._es_numero(p.get('cantidad')):
+            self._idx_cantidad.quitar(p.cantidad, id)
+        if es_fecha(p.get('fecha_vencimiento')):
+            self._idx_vencimiento.quitar(p.fecha_vencimiento, id)
+            self._vencidos.discard(id)
+
+    def _reindexar(self, anterior, nuevo):
+        # Igual que _desindexar(anterior) + _indexar(nuevo), pero solo toca los
+        # índices de los campos que cambiaron: un ajuste de cantidad no mueve
+        # el índice de texto ni los de precio o vencimiento
+        id = nuevo.id
+        self._estadisticas.quitar(anterior)
+        self._estadisticas.agregar(nuevo)
+
+        categoria, categoria_nueva = anterior.get('categoria'), nuevo.get('categoria')
+        if categoria != categoria_nueva:
+            self._idx_categoria.quitar(categoria, id)
+            self._idx_categoria.agregar(categoria_nueva, id)
+
+        # Nombre y descripción comparten el índice de texto: se rehacen juntos
+        if anterior.get('nombre') != nuevo.get('nombre') or anterior.get('descripcion') != nuevo.get('descripcion'):
+            self._idx_texto.quitar(anterior.get('nombre'), id)
+            self._idx_texto.quitar(anterior.get('descripcion'), id)
+            self._idx_texto.agregar(nuevo.get('nombre'), id)
+            self._idx_texto.agregar(nuevo.get('descripcion'), id)
+
+        for campo, indice in (('precio', self._idx_precio), ('cantidad', self._idx_cantidad)):
+            valor, valor_nuevo = anterior.get(campo), nuevo.get(campo)
+            if valor == valor_nuevo and type(valor) is type(valor_nuevo):
+                continue
+            if self._es_numero(valor):
+                indice.quitar(valor, id)
+            if self._es_numero(valor_nuevo):
+                indice.agregar(valor_nuevo, id)
+
+        vence, vence_nuevo = anterior.get('fecha_vencimiento'), nuevo.get('fecha_vencimiento')
+        if vence != vence_nuevo:
+            if es_fecha(vence):
+                self._idx_vencimiento.quitar(vence, id)
+                self._vencidos.discard(id)
+            if es_fecha(vence_nuevo):
+                self._idx_vencimiento.agregar(vence_nuevo, id)
+                if vence_nuevo < self._corte_vencidos:
+                    self._vencidos.add(id)
+
+    def _filtrar(self, filtros):
+        # Elige el índice más selectivo (estimando su tamaño sin materializarlo),
+        # obtiene sus candidatos y verifica el resto de filtros solo sobre ellos.
+        opciones = []
+        if 'categoria' in filtros:
+            opciones.append((self._idx_categoria.contar(filtros['categoria']),
+                             lambda: self._idx_categoria.buscar(filtros['categoria'])))
+        if 'precio_min' in filtros or 'precio_max' in filtros:
+            limites = (filtros.get('precio_min'), filtros.get('precio_max'))
+            opciones.append((self._idx_precio.contar(*limites), lambda: self._idx_precio.rango(*limites)))
+        if 'cantidad_min' in filtros or 'cantidad_max' in filtros:
+            limites_c = (filtros.get('cantidad_min'), filtros.get('cantidad_max'))
+            opciones.append((self._idx_cantidad.contar(*limites_c), lambda: self._idx_cantidad.rango(*limites_c)))
+        if 'vence_desde' in filtros or 'vence_hasta' in filtros:
+            limites_v = (filtros.get('vence_desde'), filtros.get('vence_hasta'))
+            opciones.append((self._idx_vencimiento.contar(*limites_v), lambda: self._idx_vencimiento.rango(*limites_v)))
+        if 'q' in filtros:
+            estimado = self._idx_texto.contar(filtros['q'])
+            # Consultas de menos de 3 letras no pueden usar el índice de trigramas
+            if estimado is not None:
+                opciones.append((estimado, lambda: self._idx_texto.buscar(filtros['q'])))
+
+        if opciones:
+            candidatos = min(opciones, key=lambda opcion: opcion[0])[1]()
+        else:
+            candidatos = self._ids
+
+        return sorted(i for i in candidatos if cumple(self._productos[i], filtros))
+
+    def _verificar(self, ids=None, categorias=None):
+        # Carga inicial perezosa y puesta al día si los datos cambiaron por
+        # fuera (edición manual del archivo u otro proceso). Después se leen
+        # las particiones que falten (ver _asegurar; ids=[] no lee ninguna).
+        if not self._cargado:
+            self.cargar()
+        elif self.persistencia.hay_cambios():
+            if self.persistencia.pendiente():
+                # Hay cambios en memoria sin guardar: prevalecen sobre la edición externa
+                logger.warning("El archivo cambió en disco con cambios pendientes. Se conservará la versión en memoria.")
+            else:
+                with self.persistencia.bloqueo():
+                    self._sincronizar()
+        self._asegurar(ids, categorias)
+
+    def _sincronizar(self):
+        # Aplica las operaciones externas nuevas o recarga todo si no se pueden obtener
+        registros = self.persistencia.leer_cambios()
+        if registros is None:
+            logger.info("Cambio externo detectado en el inventario. Recargando...")
+            self.cargar()
+            return
+        for registro in registros:
+            self._aplicar(registro)
+
+    @contextlib.contextmanager
+    def _modificacion(self, ids=None, productos=None):
+        # Sección crítica de toda modificación. ids y productos (los nuevos o
+        # con otra categoría) indican qué particiones hay que tener cargadas.
+        with self._lock, self.persistencia.bloqueo():
+            if not self._cargado:
+                self.cargar()
+            elif self.persistencia.multiproceso:
+                # Con el bloqueo tomado nadie más escribe: ponerse al día
+                # garantiza ids únicos y que no se pierdan actualizaciones
+                self._sincronizar()
+            else:
+                self._verificar(ids=[])
+            self._asegurar(ids, productos=productos)
+            yield
+
+    # ---------------------------------------------------------------
+    # Lectura
+    # ---------------------------------------------------------------
+
+    def listar(self):
+        return self.pagina()[0]
+
+    def obtener(self, id):
+        with self._lock:
+            self._verificar(ids=[id])
+            producto = self._productos.get(id)
+            return producto.to_dict() if producto else None
+
+    def pagina(self, limite=None, desplazamiento=0, despues_de=None, campos=None, filtros=None):
+        # Devuelve (productos, total, id del último producto si quedan más).
+        # Con despues_de se continúa desde un cursor en lugar de una posición.
+        with self._lock:
+            # Filtrando por categoría basta con la partición de esa categoría
+            self._verificar(categorias=[filtros['categoria']] if filtros and 'categoria' in filtros else None)
+            todos = self._filtrar(filtros) if filtros else self._ids
+            if despues_de is not None:
+                inicio = bisect.bisect_right(todos, despues_de)
+            else:
+                inicio = desplazamiento
+            fin = len(todos) if limite is None else inicio + limite
+            ids = todos[inicio:fin]
+
+            productos = [self._productos[i].to_dict(campos) for i in ids]
+
+            siguiente = ids[-1] if ids and fin < len(todos) else None
+            return productos, len(todos), siguiente
+
+    def version(self):
+        # (etiqueta, fecha de última modificación) del inventario completo,
+        # para ETag y Last-Modified de los listados.
+        #
+        # La etiqueta no depende del proceso, así que todos los workers dan la
+        # misma para el mismo contenido: es la revisión global del registro de
+        # cambios (sube con cada escritura, también antes de que una escritura
+        # diferida llegue al disco) más una huella del estado de la
+        # persistencia, que cambia si el archivo se editó a mano o si una
+        # revisión no se pudo anotar
+        with self._lock:
+            self._verificar(ids=[])
+            huella = zlib.crc32(repr(self.persistencia.estado()).encode())
+            return f"{self.cambios.actual()}.{huella:08x}", self.ultima_modificacion
+
+    def _estadisticas_completas(self):
+        # Con el lock tomado. Inventario particionado: a lo que está en memoria
+        # se suman los totales que el manifiesto guarda de las particiones sin
+        # cargar, para que /metrics y /estadisticas no las lean todas
+        self._verificar(ids=[])
+        faltan = self.persistencia.totales_sin_cargar()
+        if faltan is None:
+            self._asegurar()
+        elif faltan:
+            return self._estadisticas.con_totales(faltan)
+        return self._estadisticas
+
+    def estadisticas(self):
+        # Totales generales: O(1), se mantienen al día en cada cambio
+        with self._lock:
+            return self._estadisticas_completas().resumen()
+
+    def estadisticas_categorias(self):
+        # Totales por categoría: O(categorías)
+        with self._lock:
+            return self._estadisticas_completas().por_categoria()
+
+    def stock_bajo(self, umbral, limite=None):
+        # (productos con cantidad <= umbral de menor a mayor, total) usando el índice de cantidad
+        with self._lock:
+            self._verificar(ids=[])
+            self._leer_particiones(self.persistencia.por_cargar_rango(cantidad_max=umbral))
+            ids = self._idx_cantidad.rango(None, umbral, limite)
+            return [self._productos[i].to_dict() for i in ids], self._idx_cantidad.contar(None, umbral)
+
+    def _barrer_vencidos(self):
+        # Marca los productos que vencieron desde el último barrido:
+        # O(log n + k), solo se recorre el tramo [corte anterior, hoy).
+        # Devuelve cuántos se marcaron.
+        hoy = date.today().isoformat()
+        if hoy <= self._corte_vencidos:
+            return 0
+        nuevos = self._idx_vencimiento.rango(self._corte_vencidos or None, (date.today() - timedelta(days=1)).isoformat())
+        self._vencidos.update(nuevos)
+        self._corte_vencidos = hoy
+        return len(nuevos)
+
+    def barrer_vencidos(self):
+        # Solo sobre lo ya cargado: al leer otra partición se reconstruyen los
+        # índices y el próximo barrido la incluye
+        with self._lock:
+            self._verificar(ids=[])
+            return self._barrer_vencidos()
+
+    def vencidos(self, limite=None):
+        # (productos ya vencidos ordenados por fecha, total)
+        with self._lock:
+            self._verificar(ids=[])
+            ayer = (date.today() - timedelta(days=1)).isoformat()
+            self._leer_particiones(self.persistencia.por_cargar_rango(vence_hasta=ayer))
+            self._barrer_vencidos()
+            ids = sorted(self._vencidos, key=lambda i: (self._productos[i].fecha_vencimiento, i))
+            return [self._productos[i].to_dict() for i in ids[:limite]], len(ids)
+
+    def por_vencer(self, dias, limite=None):
+        # (productos que vencen entre hoy y dentro de "dias" días, total): O(log n + k)
+        with self._lock:
+            self._verificar(ids=[])
+            desde = date.today()
+            hasta = (desde + timedelta(days=dias)).isoformat()
+            self._leer_particiones(self.persistencia.por_cargar_rango(vence_desde=desde.isoformat(),
+                                                                      vence_hasta=hasta))
+            ids = self._idx_vencimiento.rango(desde.isoformat(), hasta, limite)
+            return [self._productos[i].to_dict() for i in ids], self._idx_vencimiento.contar(desde.isoformat(), hasta)
+
+    def revision_cambios(self):
+        # Última revisión del registro de cambios
+        with self._lock:
+            self._verificar(ids=[])
+        return self.cambios.actual()
+
+    def cambios_desde(self, revision, limite=None, espera=0):
+        # Cambios posteriores a "revision" (None si ya no están en el registro).
+        # Con espera > 0 se espera a que haya alguno, sin tener el lock del almacén.
+        with self._lock:
+            self._verificar(ids=[])
+        if espera:
+            self.cambios.esperar(revision, espera)
+        return self.cambios.desde(revision, limite)
+
+    def total(self):
+        with self._lock:
+            return self._estadisticas_completas().total.productos
+
+    # ---------------------------------------------------------------
+    # Escritura
+    # ---------------------------------------------------------------
+
+    def crear(self, producto):
+        # Asigna el id y agrega el producto (un diccionario)
+        with self._modificacion(ids=[]):
+            nuevo = dict(producto)
+            nuevo['id'] = self.generar_id()
+            self._asegurar(productos=[nuevo])
+            return self._registrar({'op': 'crear', 'producto': nuevo}).to_dict()
+
+    def actualizar(self, id, cambios):
+        destino = [{'id': id, 'categoria': cambios['categoria']}] if 'categoria' in cambios else None
+        with self._modificacion(ids=[id], productos=destino):
+            if id not in self._productos:
+                return None
+            return self._registrar({'op': 'actualizar', 'id': id, 'cambios': dict(cambios)}).to_dict()
+
+    def eliminar(self, id):
+        with self._modificacion(ids=[id]):
+            if id not in self._productos:
+                return False
+            self._registrar({'op': 'eliminar', 'id': id})
+            return True
+
+    def aplicar_lote(self, operaciones):
+        # Aplica varias operaciones ya validadas con una sola persistencia.
+        # Cada operación es (op, id, datos) con op en crear/actualizar/eliminar.
+        # Devuelve un resultado por operación: el producto, True (eliminado)
+        # o None si el producto no existe.
+        ids = [id for op, id, _ in operaciones if op != 'crear']
+        destinos = [{'id': id, 'categoria': datos['categoria']} for op, id, datos in operaciones
+                    if op == 'actualizar' and 'categoria' in datos]
+        with self._modificacion(ids=ids, productos=destinos):
+            registros = []
+            cambios = []
+            resultados = []
+            for op, id, datos in operaciones:
+                if op == 'crear':
+                    nuevo = dict(datos)
+                    nuevo['id'] = self.generar_id()
+                    self._asegurar(productos=[nuevo])
+                    registro = {'op': 'crear', 'producto': nuevo}
+                elif id not in self._productos:
+                    resultados.append(None)
+                    continue
+                elif op == 'actualizar':
+                    registro = {'op': 'actualizar', 'id': id, 'cambios': dict(datos)}
+                else:
+                    registro = {'op': 'eliminar', 'id': id}
+
+                resultado = self._aplicar(registro)
+                registros.append(registro)
+                cambios.append(self._cambio(registro, resultado))
+                resultados.append(True if op == 'eliminar' else resultado.to_dict())
+
+            if registros:
+                self._persistir(registros, cambios)
+            return resultados
+
+    def ajustar_cantidades(self, ajustes, fecha_modificacion):
+        # Suma o resta unidades de forma atómica: la lectura de la cantidad,
+        # la comprobación y la escritura ocurren dentro de la misma sección
+        # crítica, así que dos ventas simultáneas del mismo producto no pisan
+        # el resultado de la otra. Cada ajuste es (id, delta, version); con
+        # version (el ETag del producto) el ajuste solo se aplica si el
+        # producto no cambió desde entonces.
+        #
+        # Todo o nada: si algún ajuste falla se lanza ErrorAjuste y no se
+        # modifica ningún producto. Devuelve los productos resultantes, en el
+        # orden en que aparecen por primera vez en los ajustes.
+        with self._modificacion(ids=[id for id, _, _ in ajustes]):
+            deltas = {}
+            for id, delta, version in ajustes:
+                producto = self._productos.get(id)
+                if producto is None:
+                    raise ProductoNoEncontrado(id)
+                if version is not None:
+                    actual = etag_producto(producto.to_dict())
+                    if actual != version:
+                        raise VersionDistinta(id, actual)
+                deltas[id] = deltas.get(id, 0) + delta
+
+            registros = []
+            for id, delta in deltas.items():
+                cantidad = self._productos[id].get('cantidad')
+                if not self._es_numero(cantidad):
+                    cantidad = 0
+                if cantidad + delta < 0:
+                    raise StockInsuficiente(id, cantidad, -delta)
+                # La bitácora guarda la cantidad resultante y no el delta:
+                # así la operación sigue siendo idempotente al repetirla
+                registros.append({'op': 'actualizar', 'id': id, 'cambios': {
+                    'cantidad': cantidad + delta, 'fecha_modificacion': fecha_modificacion}})
+
+            cambios = []
+            resultados = []
+            for registro in registros:
+                resultado = self._aplicar(registro)
+                cambios.append(self._cambio(registro, resultado))
+                resultados.append(resultado.to_dict())
+            if registros:
+                self._persistir(registros, cambios)
+            return resultados
+
+    def generar_id(self):
+        # Contador del mayor id: O(1) en lugar de max() sobre todo el inventario
+        self._max_id += 1
+        return self._max_id
+
+    def _registrar(self, registro):
+        # Aplica la operación en memoria y la persiste
+        resultado = self._aplicar(registro)
+        self._persistir([registro], [self._cambio(registro, resultado)])
+        return resultado
+
+    @staticmethod
+    def _cambio(registro, resultado):
+        # Entrada del registro de cambios: (op, id, producto resultante o None)
+        if registro['op'] == 'eliminar':
+            return 'eliminar', registro['id'], None
+        return registro['op'], resultado.id, resultado.to_dict()
+
+    def _persistir(self, registros, cambios):
+        # Persiste operaciones ya aplicadas en memoria y las anota en el
+        # registro de cambios (todavía con el bloqueo entre procesos tomado)
+        try:
+            self.persistencia.registrar(registros)
+        except Exception:
+            # No se pudo escribir: descartar el cambio en memoria para no divergir del disco
+            self.cargar()
+            raise
+        self.cambios.anotar(cambios)
+
+    def _aplicar(self, registro):
+        # Aplica una operación sobre la lista en memoria. Las operaciones son
+        # idempotentes para poder repetir la bitácora sobre una instantánea más nueva.
+        op = registro['op']
+        self.ultima_modificacion = time.time()
+
+        if op == 'crear':
+            nuevo = Producto.from_dict(registro['producto'])
+            anterior = self._productos.get(nuevo.id)
+            if anterior is not None:
+                self._desindexar(anterior)
+            elif not self._ids or nuevo.id > self._ids[-1]:
+                self._ids.append(nuevo.id)
+            else:
+                bisect.insort(self._ids, nuevo.id)
+            self._productos[nuevo.id] = nuevo
+            self._indexar(nuevo)
+            self._max_id = max(self._max_id, nuevo.id)
+            return nuevo
+
+        if op == 'actualizar':
+            producto = self._productos.get(registro['id'])
+            if producto is None:
+                return None
+            # Se reemplaza el producto en lugar de modificarlo para que
+            # la copia que está guardando el hilo de escritura no cambie
+            actualizado = producto.con_cambios(registro['cambios'])
+            self._productos[registro['id']] = actualizado
+            self._reindexar(producto, actualizado)
+            return actualizado
+
+        if op == 'eliminar':
+            producto = self._productos.pop(registro['id'], None)
+            if producto is not None:
+                del self._ids[bisect.bisect_left(self._ids, registro['id'])]
+                self._desindexar(producto)
+            return producto
+
+        raise ValueError(f"Operación desconocida en la bitácora: {op}")
+
+    # ---------------------------------------------------------------
+    # Persistencia
+    # ---------------------------------------------------------------
+
+    def guardar(self):
+        # Fuerza a disco los cambios pendientes (escritura diferida)
+        return self.persistencia.guardar()
+
+    def compactar(self):
+        # Reescribe la instantánea y descarta la bitácora (modo bitácora)
+        compactar = getattr(self.persistencia, 'compactar', None)
+        return compactar() if compactar else self.guardar()
+
+    def cerrar(self):
+        # Guarda lo pendiente y libera archivos y conexiones
+        self.persistencia.cerrar()
+        self.cambios.cerrar()
+
+
+almacen = AlmacenInventario()
+atexit.register(almacen.cerrar)
@@ -0,0 +1,129 @@
+import logging
+import os
+
+from utils.serializacion import ErrorJSON, a_json, desde_json
+from utils.metricas import BYTES_BITACORA
+
+logger = logging.getLogger(__name__)
+
+
+class Bitacora:
+    # Registro de solo-anexar (write-ahead log) con una operación JSON por línea.
+    # Cada escritura cuesta lo mismo sin importar el tamaño del inventario.
+    #
+    # La bitácora recuerda hasta dónde la leyó o escribió este proceso
+    # (inodo y posición), para que varios procesos que comparten el archivo
+    # puedan ponerse al día leyendo solo lo que agregaron los demás.
+
+    def __init__(self, archivo, sincronizar=False):
+        self.archivo = archivo
+        self.archivo_rotado = f"{archivo}.old"
+        # Con sincronizar=True se hace fsync en cada registro (más lento, más seguro)
+        self.sincronizar = sincronizar
+        self._f = None
+        self.inodo = None
+        self.posicion = 0
+
+    def _abrir(self):
+        # Si otro proceso rotó el archivo, el descriptor abierto apunta al
+        # archivo viejo: hay que abrir el nuevo
+        if self._f is not None and self.firma()[0] != os.fstat(self._f.fileno()).st_ino:
+            self.cerrar()
+        if self._f is None:
+            directorio = os.path.dirname(self.archivo)
+            if directorio and not os.path.exists(directorio):
+                os.makedirs(directorio)
+            self._f = open(self.archivo, 'ab')
+        return self._f
+
+    def agregar(self, registro):
+        self.agregar_varios([registro])
+
+    def agregar_varios(self, registros):
+        # Todas las líneas se escriben con una sola llamada
+        f = self._abrir()
+        datos = b''.join(a_json(r) + b'\n' for r in registros)
+        f.write(datos)
+        BYTES_BITACORA.incrementar(len(datos))
+        f.flush()
+        if self.sincronizar:
+            os.fsync(f.fileno())
+        self.inodo = os.fstat(f.fileno()).st_ino
+        self.posicion = f.tell()
+
+    def firma(self):
+        # (inodo, tamaño) del archivo actual; (None, 0) si todavía no existe
+        try:
+            info = os.stat(self.archivo)
+            return (info.st_ino, info.st_size)
+        except OSError:
+            return (None, 0)
+
+    def tamano(self):
+        return self.firma()[1]
+
+    def hay_cambios(self):
+        # True si alguien más escribió o rotó la bitácora desde la última lectura
+        return self.firma() != (self.inodo, self.posicion)
+
+    def _leer_archivo(self, archivo, posicion=0):
+        # Devuelve (registros, posición final, inodo). Solo se consumen
+        # líneas completas: una línea a medio escribir se leerá la próxima vez.
+        registros = []
+        try:
+            f = open(archivo, 'rb')
+        except FileNotFoundError:
+            return registros, 0, None
+
+        with f:
+            inodo = os.fstat(f.fileno()).st_ino
+            f.seek(posicion)
+            for linea in f:
+                if not linea.endswith(b'\n'):
+                    break
+                posicion += len(linea)
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    registros.append(desde_json(linea))
+                except ErrorJSON:
+                    logger.warning("Registro inválido en la bitácora (byte %d). Se omite.", posicion, extra={'archivo': archivo})
+        return registros, posicion, inodo
+
+    def leer(self):
+        # Todos los registros: los del archivo rotado (si quedó uno) y los del actual
+        registros, _, _ = self._leer_archivo(self.archivo_rotado)
+        actuales, self.posicion, self.inodo = self._leer_archivo(self.archivo)
+        return registros + actuales
+
+    def leer_nuevos(self):
+        # Registros agregados por otros procesos desde la última lectura.
+        # Devuelve None si el archivo fue rotado: hay que recargar todo.
+        inodo, _ = self.firma()
+        if inodo != self.inodo and self.inodo is not None:
+            return None
+        registros, posicion, inodo = self._leer_archivo(self.archivo, self.posicion if inodo == self.inodo else 0)
+        self.posicion, self.inodo = posicion, inodo
+        return registros
+
+    def rotar(self):
+        # Cierra el archivo actual y lo aparta para compactarlo; los nuevos
+        # registros van a un archivo vacío. Devuelve False si ya hay uno rotado.
+        if os.path.exists(self.archivo_rotado):
+            return False
+        self.cerrar()
+        if os.path.exists(self.archivo):
+            os.replace(self.archivo, self.archivo_rotado)
+        self.inodo = None
+        self.posicion = 0
+        return True
+
+    def descartar_rotado(self):
+        if os.path.exists(self.archivo_rotado):
+            os.remove(self.archivo_rotado)
+
+    def cerrar(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
@@ -0,0 +1,64 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class BloqueoArchivo:
+    # Bloqueo exclusivo entre procesos mediante un archivo .lock.
+    # Es reentrante dentro del mismo proceso; quien lo use debe protegerlo
+    # además con un lock de hilos (el almacén siempre lo hace).
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._fd = None
+        self._profundidad = 0
+
+    def _abrir(self):
+        if self._fd is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio and not os.path.exists(directorio):
+                os.makedirs(directorio)
+            self._fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def adquirir(self):
+        if self._profundidad == 0:
+            fd = self._abrir()
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK se rinde tras unos reintentos: seguir esperando
+                        time.sleep(0.05)
+        self._profundidad += 1
+
+    def liberar(self):
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *args):
+        self.liberar()
+
+    def cerrar(self):
+        if self._fd is not None and self._profundidad == 0:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,151 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from utils.bitacora import Bitacora
+from utils.serializacion import a_json
+
+logger = logging.getLogger(__name__)
+
+# Cambios que se conservan para la sincronización incremental
+MAX_CAMBIOS = int(os.environ.get('INVENTARIO_MAX_CAMBIOS', '10000'))
+
+# Con varios procesos, cada cuánto se revisa el archivo mientras se espera
+INTERVALO_SONDEO = 0.5
+
+
+class RegistroCambios:
+    # Registro acotado de cambios para que otros sistemas se sincronicen por
+    # diferencias en lugar de descargar todo el catálogo.
+    #
+    # Cada modificación recibe una revisión creciente y queda anotada como
+    # {'rev', 'op', 'id', 'producto'}; las eliminaciones quedan como lápida
+    # (sin 'producto'). Se guardan las últimas "maximo" en memoria y en un
+    # archivo JSONL que sobrevive a los reinicios y que comparten los
+    # procesos: la revisión se asigna con el bloqueo entre procesos tomado,
+    # después de leer lo que anotaron los demás.
+
+    def __init__(self, archivo=None, maximo=MAX_CAMBIOS, multiproceso=False):
+        self.maximo = maximo
+        self.multiproceso = multiproceso
+        self._bitacora = Bitacora(archivo) if archivo else None
+        self._entradas = deque()
+        self._lineas = 0
+        self.revision = 0
+        self._condicion = threading.Condition(threading.RLock())
+
+    def cargar(self):
+        with self._condicion:
+            entradas = self._bitacora.leer() if self._bitacora else []
+            self._lineas = len(entradas)
+            self._entradas = deque(entradas[-self.maximo:])
+            self.revision = max(self.revision, entradas[-1]['rev']) if entradas else self.revision
+            self._condicion.notify_all()
+
+    def _incorporar(self, entradas):
+        self._entradas.extend(entradas)
+        while len(self._entradas) > self.maximo:
+            self._entradas.popleft()
+        if entradas:
+            self.revision = entradas[-1]['rev']
+
+    def sincronizar(self):
+        # Incorpora lo que anotaron otros procesos
+        if self._bitacora is None or not self.multiproceso:
+            return
+        with self._condicion:
+            if not self._bitacora.hay_cambios():
+                return
+            nuevas = self._bitacora.leer_nuevos()
+            if nuevas is None:
+                # Otro proceso compactó el archivo
+                self.cargar()
+                return
+            self._lineas += len(nuevas)
+            self._incorporar(nuevas)
+            self._condicion.notify_all()
+
+    def actual(self):
+        with self._condicion:
+            self.sincronizar()
+            return self.revision
+
+    def anotar(self, cambios):
+        # cambios: [(op, id, producto o None)]. Debe llamarse con el bloqueo
+        # entre procesos tomado (el almacén lo hace desde _modificacion).
+        with self._condicion:
+            self.sincronizar()
+            entradas = []
+            for revision, (op, id, producto) in enumerate(cambios, self.revision + 1):
+                entrada = {'rev': revision, 'op': op, 'id': id}
+                if producto is not None:
+                    entrada['producto'] = producto
+                entradas.append(entrada)
+
+            if self._bitacora is not None:
+                try:
+                    self._bitacora.agregar_varios(entradas)
+                except OSError as e:
+                    # Sin el archivo los demás procesos no verían estas
+                    # revisiones y podrían repetirlas: no se anotan
+                    logger.error("No se pudo anotar el registro de cambios: %s", e, extra={'archivo': self._bitacora.archivo})
+                    return []
+                self._lineas += len(entradas)
+                if self._lineas > 2 * self.maximo:
+                    self._compactar()
+
+            self._incorporar(entradas)
+            self._condicion.notify_all()
+            return entradas
+
+    def _compactar(self):
+        # Reescribe el archivo solo con las últimas "maximo" entradas
+        archivo = self._bitacora.archivo
+        temporal = f"{archivo}.tmp"
+        conservar = list(self._entradas)[-self.maximo:]
+        with open(temporal, 'wb') as f:
+            f.write(b''.join(a_json(e) + b'\n' for e in conservar))
+            f.flush()
+            os.fsync(f.fileno())
+        self._bitacora.cerrar()
+        os.replace(temporal, archivo)
+        self._bitacora.leer()
+        self._lineas = len(conservar)
+
+    def desde(self, revision, limite=None):
+        # Cambios posteriores a "revision", en orden. Devuelve None si esa
+        # revisión ya no está en el registro (o no existe): el cliente debe
+        # volver a descargar el catálogo completo.
+        with self._condicion:
+            self.sincronizar()
+            if revision == self.revision:
+                return []
+            primera = self._entradas[0]['rev'] if self._entradas else self.revision + 1
+            if revision > self.revision or revision < primera - 1:
+                return None
+            # Las revisiones en memoria son consecutivas
+            inicio = revision - primera + 1
+            fin = None if limite is None else inicio + limite
+            return list(itertools.islice(self._entradas, inicio, fin))
+
+    def esperar(self, revision, espera):
+        # Espera larga (long-poll): bloquea hasta que haya algo posterior a
+        # "revision" o pasen "espera" segundos
+        limite = time.monotonic() + espera
+        with self._condicion:
+            while True:
+                self.sincronizar()
+                if self.revision != revision:
+                    return True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                # Los cambios de otros procesos no despiertan esta condición: revisar cada tanto
+                self._condicion.wait(min(restante, INTERVALO_SONDEO) if self.multiproceso else restante)
+
+    def cerrar(self):
+        if self._bitacora is not None:
+            self._bitacora.cerrar()
@@ -0,0 +1,219 @@
+import collections
+import os
+import threading
+import zlib
+
+from utils.metricas import RESPUESTAS_COMPRIMIDAS
+
+# Compresión de las respuestas según Accept-Encoding: gzip siempre, y
+# brotli (br) y zstd si están instaladas las librerías.
+#
+# - Las respuestas pequeñas (menos de COMPRESION_MINIMA bytes) van sin comprimir.
+# - Las respuestas en streaming (exportación) y las muy grandes se comprimen
+#   por partes, a medida que se envían.
+# - El cuerpo comprimido de una respuesta con ETag se guarda en una caché
+#   (ruta, ETag, codificación): mientras el ETag no cambie, las peticiones
+#   repetidas reutilizan el mismo resultado en lugar de comprimir otra vez.
+#
+# Cada codificación es una representación distinta, así que lleva su propio
+# ETag ("<etag>-gzip"). etag_base() le quita el sufijo para comparar con el
+# ETag del contenido (If-None-Match e If-Match).
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Dependencia opcional
+    zstandard = None
+
+# Bytes mínimos para que valga la pena comprimir
+COMPRESION_MINIMA = int(os.environ.get('INVENTARIO_COMPRESION_MINIMA', '1024'))
+
+# A partir de este tamaño el cuerpo se comprime y se envía por partes
+COMPRESION_STREAMING = int(os.environ.get('INVENTARIO_COMPRESION_STREAMING', str(1024 * 1024)))
+
+# Tamaño máximo de la caché de cuerpos comprimidos (MB, 0 = sin caché)
+CACHE_COMPRESION_MB = float(os.environ.get('INVENTARIO_CACHE_COMPRESION_MB', '64'))
+
+# Niveles: un punto medio entre tamaño y CPU para comprimir en cada petición
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+NIVEL_ZSTD = 3
+
+# Tamaño de cada parte al comprimir un cuerpo grande por partes
+TAMANO_PARTE = 64 * 1024
+
+# En orden de preferencia cuando el cliente acepta varias con la misma calidad
+CODIFICACIONES = tuple(c for c, disponible in (('zstd', zstandard), ('br', brotli), ('gzip', zlib))
+                       if disponible is not None)
+
+# Tipos que se comprimen; text/event-stream queda fuera porque cada evento
+# debe llegar al cliente en cuanto se emite
+TIPOS_COMPRIMIBLES = ('text/html', 'text/plain', 'text/csv', 'application/json', 'application/x-ndjson')
+
+
+def _compresor(codificacion):
+    # (comprimir, terminar) para una codificación
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=NIVEL_BROTLI)
+        return compresor.process, compresor.finish
+    if codificacion == 'zstd':
+        compresor = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+        return compresor.compress, compresor.flush
+    # wbits=31: formato gzip, con fecha 0 (el mismo cuerpo da los mismos bytes)
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compresor.compress, compresor.flush
+
+
+def comprimir(datos, codificacion):
+    comprimir_parte, terminar = _compresor(codificacion)
+    return comprimir_parte(datos) + terminar()
+
+
+def comprimir_partes(partes, codificacion):
+    # Comprime al vuelo; solo se emite cuando el compresor tiene datos listos
+    comprimir_parte, terminar = _compresor(codificacion)
+    for parte in partes:
+        datos = comprimir_parte(parte)
+        if datos:
+            yield datos
+    yield terminar()
+
+
+def etag_base(etag):
+    # ETag del contenido a partir del de una representación comprimida
+    base, _, codificacion = etag.rpartition('-')
+    return base if base and codificacion in CODIFICACIONES else etag
+
+
+class CacheComprimidos:
+    # LRU de cuerpos comprimidos limitada por bytes. Con el largo del cuerpo
+    # original se descarta una entrada si el mismo ETag trae otro contenido.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, largo):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != largo:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave, largo, comprimido):
+        if len(comprimido) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._entradas[clave] = (largo, comprimido)
+            self._bytes += len(comprimido)
+            while self._bytes > self.max_bytes:
+                _, (_, descartado) = self._entradas.popitem(last=False)
+                self._bytes -= len(descartado)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+
+cache_comprimidos = CacheComprimidos(int(CACHE_COMPRESION_MB * 1024 * 1024))
+
+
+def _comprimible(respuesta):
+    return (respuesta.mimetype in TIPOS_COMPRIMIBLES
+            and 200 <= respuesta.status_code < 300 and respuesta.status_code != 204
+            and 'Content-Encoding' not in respuesta.headers
+            and 'no-transform' not in respuesta.headers.get('Cache-Control', '')
+            and not respuesta.direct_passthrough)
+
+
+def _partes_con_cache(datos, codificacion, clave):
+    # Comprime un cuerpo grande por partes y, si se envió completo, lo guarda
+    comprimir_parte, terminar = _compresor(codificacion)
+    enviadas = []
+    for inicio in range(0, len(datos), TAMANO_PARTE):
+        parte = comprimir_parte(datos[inicio:inicio + TAMANO_PARTE])
+        if parte:
+            enviadas.append(parte)
+            yield parte
+    parte = terminar()
+    enviadas.append(parte)
+    yield parte
+    if clave is not None:
+        cache_comprimidos.guardar(clave, len(datos), b''.join(enviadas))
+
+
+def _no_modificada(respuesta, if_none_match):
+    # Un 304 lleva el ETag de la representación que tiene el cliente
+    respuesta.vary.add('Accept-Encoding')
+    etag, debil = respuesta.get_etag()
+    if etag:
+        for codificacion in CODIFICACIONES:
+            if if_none_match.contains_weak(f'{etag}-{codificacion}'):
+                respuesta.set_etag(f'{etag}-{codificacion}', debil)
+                break
+    return respuesta
+
+
+def comprimir_respuestas(app):
+    # Comprime las respuestas de la aplicación Flask según Accept-Encoding.
+    # Se registra después de instrumentar() para que el tiempo medido incluya
+    # la compresión de las respuestas que no van en streaming.
+    from flask import request
+
+    @app.after_request
+    def _comprimir(respuesta):
+        if respuesta.status_code == 304:
+            return _no_modificada(respuesta, request.if_none_match)
+        if request.method == 'HEAD' or not _comprimible(respuesta):
+            return respuesta
+        respuesta.vary.add('Accept-Encoding')
+        codificacion = request.accept_encodings.best_match(CODIFICACIONES)
+        if codificacion is None:
+            return respuesta
+
+        if respuesta.is_streamed:
+            # Tamaño desconocido: siempre se comprime, sin caché
+            respuesta.response = comprimir_partes(respuesta.iter_encoded(), codificacion)
+            respuesta.headers.pop('Content-Length', None)
+            respuesta.headers['Content-Encoding'] = codificacion
+            RESPUESTAS_COMPRIMIDAS.incrementar(1, codificacion, 'streaming')
+            return respuesta
+
+        datos = respuesta.get_data()
+        if len(datos) < COMPRESION_MINIMA:
+            return respuesta
+
+        # El ETag del listado es la versión del inventario (no depende de los
+        # parámetros), por eso la ruta completa forma parte de la clave
+        etag, debil = respuesta.get_etag()
+        clave = (request.full_path, etag, debil, codificacion) if etag and cache_comprimidos.max_bytes else None
+        comprimido = cache_comprimidos.obtener(clave, len(datos)) if clave is not None else None
+        if comprimido is not None:
+            respuesta.set_data(comprimido)
+            RESPUESTAS_COMPRIMIDAS.incrementar(1, codificacion, 'cache')
+        elif len(datos) >= COMPRESION_STREAMING:
+            respuesta.response = _partes_con_cache(datos, codificacion, clave)
+            respuesta.headers.pop('Content-Length', None)
+            RESPUESTAS_COMPRIMIDAS.incrementar(1, codificacion, 'streaming')
+        else:
+            comprimido = comprimir(datos, codificacion)
+            if clave is not None:
+                cache_comprimidos.guardar(clave, len(datos), comprimido)
+            respuesta.set_data(comprimido)
+            RESPUESTAS_COMPRIMIDAS.incrementar(1, codificacion, 'compresion')
+
+        respuesta.headers['Content-Encoding'] = codificacion
+        if etag:
+            respuesta.set_etag(f'{etag}-{codificacion}', debil)
+        return respuesta
@@ -0,0 +1,46 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import request
+
+from utils.compresion import etag_base
+from utils.serializacion import a_json
+
+# Soporte de peticiones condicionales (If-None-Match / If-Modified-Since)
+
+
+def etag_producto(producto):
+    # ETag fuerte a partir del contenido: igual en todos los procesos
+    return hashlib.sha1(a_json(producto, ordenar=True)).hexdigest()[:20]
+
+
+def fecha_producto(producto):
+    # Última modificación de un producto según sus fechas guardadas
+    texto = producto.get('fecha_modificacion') or producto.get('fecha_creacion')
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d %H:%M:%S').astimezone(timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def a_fecha(marca):
+    # Segundos desde epoch -> datetime UTC sin fracciones (precisión de HTTP)
+    return datetime.fromtimestamp(int(marca), timezone.utc)
+
+
+def no_modificado(etag, ultima_modificacion=None):
+    # True si la copia del cliente sigue vigente. If-None-Match tiene prioridad
+    # y vale también el ETag de una versión comprimida (utils/compresion.py).
+    if request.if_none_match:
+        return (request.if_none_match.star_tag
+                or any(etag_base(e) == etag for e in request.if_none_match.as_set()))
+    if request.if_modified_since and ultima_modificacion is not None:
+        return ultima_modificacion <= request.if_modified_since
+    return False
+
+
+def con_validadores(respuesta, etag, ultima_modificacion=None):
+    respuesta.set_etag(etag)
+    if ultima_modificacion is not None:
+        respuesta.last_modified = ultima_modificacion
+    return respuesta
@@ -0,0 +1,124 @@
+import math
+
+# Totales del inventario que el almacén mantiene al día en cada cambio
+# (igual que los índices), para responder sin recorrer todos los productos.
+
+
+def es_numero(valor):
+    # NaN e inf no cuentan: una suma acumulada no se recupera de un NaN
+    if isinstance(valor, float):
+        return math.isfinite(valor)
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+class Acumulado:
+    # Cantidad de productos, unidades en stock y valor (precio × cantidad)
+    __slots__ = ['productos', 'unidades', 'valor']
+
+    def __init__(self):
+        self.productos = 0
+        self.unidades = 0
+        self.valor = 0.0
+
+    def sumar(self, unidades, valor, signo):
+        self.productos += signo
+        self.unidades += signo * unidades
+        self.valor += signo * valor
+        if self.productos == 0:
+            # Sin productos el valor es exactamente 0: se descarta el
+            # error de redondeo acumulado por las restas
+            self.unidades = 0
+            self.valor = 0.0
+
+    def sumar_totales(self, productos, unidades, valor):
+        # Totales ya calculados de varios productos (p. ej. de una partición sin cargar)
+        self.productos += productos
+        self.unidades += unidades
+        self.valor += valor
+
+    def to_dict(self):
+        return {
+            'productos': self.productos,
+            'unidades': self.unidades,
+            'valor': round(self.valor, 2)
+        }
+
+
+class Estadisticas:
+
+    def __init__(self):
+        self.total = Acumulado()
+        self.categorias = {}
+
+    @staticmethod
+    def _aporte(producto):
+        # (unidades, valor) de un producto; los campos no numéricos o no
+        # finitos cuentan como 0 (también un producto que desborda a inf)
+        cantidad = producto.get('cantidad')
+        precio = producto.get('precio')
+        unidades = cantidad if es_numero(cantidad) else 0
+        valor = precio * unidades if es_numero(precio) else 0.0
+        if not es_numero(valor):
+            valor = 0.0
+        return unidades, valor
+
+    def _sumar(self, producto, signo):
+        unidades, valor = self._aporte(producto)
+        self.total.sumar(unidades, valor, signo)
+
+        categoria = producto.get('categoria')
+        acumulado = self.categorias.get(categoria)
+        if acumulado is None:
+            acumulado = self.categorias[categoria] = Acumulado()
+        acumulado.sumar(unidades, valor, signo)
+        if acumulado.productos == 0:
+            del self.categorias[categoria]
+
+    def agregar(self, producto):
+        self._sumar(producto, 1)
+
+    def quitar(self, producto):
+        self._sumar(producto, -1)
+
+    def exportar(self):
+        # Para el volcado binario: (productos, unidades, valor) del total y por categoría
+        def tupla(a):
+            return a.productos, a.unidades, a.valor
+        return tupla(self.total), {c: tupla(a) for c, a in self.categorias.items()}
+
+    def importar(self, datos):
+        def acumulado(tupla):
+            a = Acumulado()
+            a.productos, a.unidades, a.valor = tupla
+            return a
+        total, categorias = datos
+        self.total = acumulado(total)
+        self.categorias = {c: acumulado(t) for c, t in categorias.items()}
+
+    def totales(self):
+        # [categoría, productos, unidades, valor] por categoría, para guardar
+        # en JSON (las claves de un objeto JSON solo pueden ser texto)
+        return [[c, a.productos, a.unidades, a.valor] for c, a in self.categorias.items()]
+
+    def con_totales(self, filas):
+        # Copia que además suma filas de totales(): las de las particiones
+        # que no están en memoria
+        copia = Estadisticas()
+        copia.importar(self.exportar())
+        for categoria, productos, unidades, valor in filas:
+            acumulado = copia.categorias.get(categoria)
+            if acumulado is None:
+                acumulado = copia.categorias[categoria] = Acumulado()
+            acumulado.sumar_totales(productos, unidades, valor)
+            copia.total.sumar_totales(productos, unidades, valor)
+        return copia
+
+    def resumen(self):
+        datos = self.total.to_dict()
+        datos['categorias'] = len(self.categorias)
+        return datos
+
+    def por_categoria(self):
+        # Ordenadas por nombre; las categorías vacías o no textuales al final
+        claves = sorted(self.categorias, key=lambda c: (not isinstance(c, str), str(c)))
+        return [dict(categoria=c, **self.categorias[c].to_dict()) for c in claves]
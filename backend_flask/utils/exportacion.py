@@ -0,0 +1,38 @@
+from utils.serializacion import a_json
+
+# Productos que se copian del almacén en cada bloque de la exportación
+TAMANO_BLOQUE = 500
+
+
+def iterar_productos(almacen, tamano_bloque=TAMANO_BLOQUE):
+    # Recorre el inventario por bloques usando el cursor por id, de modo que
+    # nunca se tiene en memoria más de un bloque. Cada bloque es consistente
+    # por sí mismo; los cambios hechos durante la exportación pueden aparecer
+    # o no según el bloque en que caigan.
+    despues_de = None
+    while True:
+        productos, _, siguiente = almacen.pagina(tamano_bloque, despues_de=despues_de)
+        yield from productos
+        if siguiente is None:
+            break
+        despues_de = siguiente
+
+
+def generar_json(productos):
+    # Arreglo JSON emitido por partes (bytes): '[', producto, ',', producto, ..., ']'
+    yield b'['
+    primero = True
+    for producto in productos:
+        if primero:
+            primero = False
+            yield a_json(producto)
+        else:
+            yield b',' + a_json(producto)
+    yield b']'
+
+
+def generar_ndjson(productos):
+    # Un producto por línea (JSON delimitado por saltos de línea)
+    for producto in productos:
+        yield a_json(producto) + b'\n'
+
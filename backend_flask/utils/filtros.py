@@ -0,0 +1,97 @@
+import math
+from datetime import date, datetime
+
+from utils.indices import normalizar_texto
+
+# Filtros de GET /api/productos: parámetro -> tipo
+PARAMETROS = {
+    'categoria': str,
+    'precio_min': float,
+    'precio_max': float,
+    'cantidad_min': int,
+    'cantidad_max': int,
+    'vence_desde': 'fecha',
+    'vence_hasta': 'fecha',
+    'q': str,
+}
+
+
+def es_fecha(valor):
+    # Fechas de vencimiento en formato AAAA-MM-DD. date.fromisoformat es
+    # mucho más rápida que strptime; los guiones en su lugar descartan las
+    # otras formas ISO que también acepta (p. ej. semanas, 2026-W01-1), y
+    # strptime queda para dígitos no ASCII, que fromisoformat no reconoce.
+    if not isinstance(valor, str) or len(valor) != 10 or valor[4] != '-' or valor[7] != '-':
+        return False
+    try:
+        if valor.isascii():
+            date.fromisoformat(valor)
+        else:
+            datetime.strptime(valor, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
+
+
+def leer_filtros(args):
+    # Devuelve un diccionario solo con los filtros presentes.
+    # Lanza ValueError con un mensaje para el cliente si alguno no es válido.
+    filtros = {}
+    for parametro, tipo in PARAMETROS.items():
+        valor = args.get(parametro)
+        if valor is None or valor.strip() == '':
+            continue
+        valor = valor.strip()
+
+        if tipo == 'fecha':
+            if not es_fecha(valor):
+                raise ValueError(f'El parámetro {parametro} debe tener el formato AAAA-MM-DD')
+            filtros[parametro] = valor
+        elif tipo is str:
+            filtros[parametro] = valor
+        else:
+            try:
+                filtros[parametro] = tipo(valor)
+            except ValueError:
+                raise ValueError(f'El parámetro {parametro} debe ser numérico')
+            if tipo is float and not math.isfinite(filtros[parametro]):
+                raise ValueError(f'El parámetro {parametro} debe ser numérico')
+    return filtros
+
+
+def _en_rango(valor, minimo, maximo):
+    if minimo is None and maximo is None:
+        return True
+    try:
+        if minimo is not None and valor < minimo:
+            return False
+        if maximo is not None and valor > maximo:
+            return False
+    except TypeError:
+        return False
+    return True
+
+
+def cumple(producto, filtros):
+    # Verifica un producto contra todos los filtros
+    if 'categoria' in filtros and producto.get('categoria') != filtros['categoria']:
+        return False
+
+    if not _en_rango(producto.get('precio'), filtros.get('precio_min'), filtros.get('precio_max')):
+        return False
+
+    if not _en_rango(producto.get('cantidad'), filtros.get('cantidad_min'), filtros.get('cantidad_max')):
+        return False
+
+    if 'vence_desde' in filtros or 'vence_hasta' in filtros:
+        fecha = producto.get('fecha_vencimiento')
+        if not es_fecha(fecha) or not _en_rango(fecha, filtros.get('vence_desde'), filtros.get('vence_hasta')):
+            return False
+
+    if 'q' in filtros:
+        consulta = normalizar_texto(filtros['q'])
+        if consulta not in normalizar_texto(producto.get('nombre')) and \
+                consulta not in normalizar_texto(producto.get('descripcion')):
+            return False
+
+    return True
@@ -0,0 +1,467 @@
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from models.producto import Producto
+from utils.metricas import FILAS_IMPORTADAS
+from utils.validaciones import validar_nuevo_producto
+
+logger = logging.getLogger(__name__)
+
+# Importación masiva de productos desde CSV o JSON (arreglo o NDJSON).
+#
+# El archivo se lee por partes, nunca completo en memoria. Las filas se
+# agrupan en bloques que se validan con las mismas reglas que
+# POST /api/productos, opcionalmente en un pool de procesos, y cada bloque
+# se aplica al almacén con una sola operación de lote (un commit por
+# bloque). Los ids salen del contador del almacén: cada bloque recibe un
+# tramo consecutivo porque se aplica bajo el mismo lock.
+#
+# Las filas rechazadas se escriben en un reporte CSV (fila, error, datos).
+#
+# Las importaciones de la API guardan su estado (<id>.json) y su reporte
+# (<id>_rechazos.csv) en un directorio junto al archivo del inventario, y
+# los actualizan en cada commit: con varios procesos (INVENTARIO_MULTIPROCESO)
+# cualquiera de ellos puede responder por una importación que corre en otro.
+
+# Filas por bloque: cuánto tiempo se retiene el lock del almacén en cada commit
+TAMANO_BLOQUE = 500
+
+# Procesos que validan en paralelo (0 o 1: se valida en el mismo hilo)
+TRABAJADORES = int(os.environ.get('INVENTARIO_TRABAJADORES_IMPORTACION', '0'))
+
+# Caracteres que se leen del archivo en cada paso, y tamaño máximo de un
+# elemento del arreglo JSON (evita leer el resto del archivo buscando el
+# final de un elemento mal formado)
+TAMANO_LECTURA = 1 << 16
+TAMANO_MAXIMO_ELEMENTO = 1 << 22
+
+# Un error de JSON a más de estos caracteres del final del búfer no se debe
+# a que el elemento esté cortado (ningún literal o número es tan largo)
+MARGEN_ERROR = 16
+
+# Caracteres de un elemento mal formado que se guardan en el reporte
+MAXIMO_EN_REPORTE = 1000
+
+# Rechazos que se incluyen en el estado (el reporte los tiene todos)
+RECHAZOS_EN_ESTADO = 100
+
+# Importaciones terminadas que se conservan en el directorio (con su reporte)
+MAX_IMPORTACIONES = 20
+
+FORMATOS = ('csv', 'json')
+
+
+# ---------------------------------------------------------------
+# Lectura incremental
+# ---------------------------------------------------------------
+
+def leer_csv(archivo):
+    # (número de línea, fila) por cada registro. Las celdas vacías se omiten,
+    # igual que un campo ausente en JSON (se usa el valor por defecto).
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    lector = csv.DictReader(texto)
+    for fila in lector:
+        yield lector.line_num, {k.strip(): v for k, v in fila.items() if k and v not in (None, '')}
+
+
+def leer_json(archivo):
+    # (número de elemento, valor) de un arreglo JSON o de NDJSON (un objeto
+    # por línea). Se decodifica un elemento a la vez sobre un búfer que solo
+    # guarda lo que falta por procesar. Un elemento mal formado es un rechazo
+    # (como una línea mal formada de NDJSON): se sigue desde el próximo '{',
+    # igual que rescatar_productos con el archivo del inventario.
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig')
+    decodificador = json.JSONDecoder()
+    bufer = texto.read(TAMANO_LECTURA)
+    inicio = len(bufer) - len(bufer.lstrip())
+    if bufer[inicio:inicio + 1] != '[':
+        yield from _leer_ndjson(bufer, texto)
+        return
+
+    pos = inicio + 1
+    numero = 0
+    fin_archivo = False
+    while True:
+        # Saltar espacios y la coma entre elementos
+        while pos < len(bufer) and (bufer[pos].isspace() or (bufer[pos] == ',' and numero)):
+            pos += 1
+        if pos >= len(bufer):
+            if fin_archivo:
+                raise ValueError('El arreglo JSON no está cerrado')
+            bufer, pos = bufer[pos:] + texto.read(TAMANO_LECTURA), 0
+            fin_archivo = pos >= len(bufer)
+            continue
+        if bufer[pos] == ']':
+            return
+        try:
+            valor, final = decodificador.raw_decode(bufer, pos)
+            # Un valor que llega justo al final del búfer puede estar cortado (un número)
+            completo = final < len(bufer) or fin_archivo
+        except json.JSONDecodeError as e:
+            # Un texto sin cerrar puede ser solo un elemento cortado por el búfer
+            malformado = fin_archivo or (not e.msg.startswith('Unterminated string')
+                                         and len(bufer) - e.pos > MARGEN_ERROR)
+            siguiente = bufer.find('{', max(e.pos, pos + 1)) if malformado else -1
+            if siguiente >= 0 or fin_archivo:
+                fin = siguiente if siguiente >= 0 else len(bufer)
+                numero += 1
+                yield numero, _LineaInvalida(bufer[pos:fin].rstrip().rstrip(',')[:MAXIMO_EN_REPORTE])
+                if siguiente < 0:
+                    return
+                pos = siguiente
+                continue
+            completo = False
+        if not completo:
+            if len(bufer) - pos > TAMANO_MAXIMO_ELEMENTO:
+                raise ValueError(f'JSON inválido o elemento demasiado grande después del elemento {numero}')
+            parte = texto.read(TAMANO_LECTURA)
+            fin_archivo = not parte
+            bufer, pos = bufer[pos:] + parte, 0
+            continue
+        numero += 1
+        pos = final
+        yield numero, valor
+        if pos > TAMANO_LECTURA:
+            bufer, pos = bufer[pos:], 0
+
+
+def _leer_ndjson(inicio, texto):
+    for numero, linea in enumerate(_lineas(inicio, texto), 1):
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except json.JSONDecodeError:
+            # Una línea mal formada es un rechazo, no detiene la importación
+            yield numero, _LineaInvalida(linea)
+
+
+def _lineas(inicio, texto):
+    # Líneas del archivo, empezando por lo que ya se había leído
+    lineas = inicio.splitlines(keepends=True)
+    if lineas and not lineas[-1].endswith('\n'):
+        lineas[-1] += texto.readline()
+    yield from lineas
+    yield from texto
+
+
+class _LineaInvalida(str):
+    pass
+
+
+def detectar_formato(nombre=None, tipo_contenido=None):
+    # Por la extensión del archivo o, si no la tiene, por el Content-Type
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if extension == '.csv' or (not extension and 'csv' in (tipo_contenido or '')):
+        return 'csv'
+    if extension in ('.json', '.ndjson', '.jsonl') or 'json' in (tipo_contenido or ''):
+        return 'json'
+    return None
+
+
+def guardar_subida(origen):
+    # Copia el cuerpo subido a un archivo temporal por partes; la
+    # importación se hace después, desde el disco
+    descriptor, ruta = tempfile.mkstemp(prefix='importacion_', suffix='.datos')
+    with os.fdopen(descriptor, 'wb') as destino:
+        while True:
+            parte = origen.read(1 << 20)
+            if not parte:
+                break
+            destino.write(parte)
+    return ruta
+
+
+# ---------------------------------------------------------------
+# Validación (se ejecuta en los procesos del pool)
+# ---------------------------------------------------------------
+
+def validar_bloque(filas, ahora):
+    # [(número, datos)] -> [(número, producto listo para crear o None, error)]
+    resultado = []
+    for numero, datos in filas:
+        if isinstance(datos, _LineaInvalida):
+            resultado.append((numero, None, 'JSON inválido'))
+            continue
+        campos, error = validar_nuevo_producto(datos)
+        if error:
+            resultado.append((numero, None, error))
+        else:
+            resultado.append((numero, Producto(id=None, fecha_creacion=ahora, **campos).to_dict(), None))
+    return resultado
+
+
+# ---------------------------------------------------------------
+# Importación
+# ---------------------------------------------------------------
+
+class Importacion:
+    # Una importación de un archivo, con su estado consultable mientras corre.
+    # Con directorio, el estado y el reporte se publican ahí; sin él (el
+    # script importar.py) el reporte va al directorio temporal.
+
+    def __init__(self, almacen, archivo, formato, trabajadores=TRABAJADORES, tamano_bloque=TAMANO_BLOQUE,
+                 borrar_archivo=False, directorio=None):
+        if formato not in FORMATOS:
+            raise ValueError(f'Formato no soportado: {formato} (se acepta {", ".join(FORMATOS)})')
+        self.id = uuid.uuid4().hex[:12]
+        self.almacen = almacen
+        self.archivo = archivo
+        self.formato = formato
+        self.trabajadores = trabajadores
+        self.tamano_bloque = tamano_bloque
+        self.borrar_archivo = borrar_archivo
+        self.directorio = directorio
+        if directorio is None:
+            self.reporte = os.path.join(tempfile.gettempdir(), f'importacion_{self.id}_rechazos.csv')
+        else:
+            os.makedirs(directorio, exist_ok=True)
+            self.reporte = ruta_reporte(directorio, self.id)
+
+        self.estado = 'pendiente'
+        self.error = None
+        self.filas = 0
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.bloques = 0
+        self.primer_id = None
+        self.ultimo_id = None
+        self.tamano = os.path.getsize(archivo)
+        self.leidos = 0
+        self.inicio = None
+        self.fin = None
+        self.rechazos = []
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def iniciar(self):
+        # Ejecuta la importación en un hilo aparte. El estado se publica
+        # antes, para que se pueda consultar apenas se responde el 202.
+        self.publicar()
+        self._hilo = threading.Thread(target=self.ejecutar, name=f'importacion-{self.id}', daemon=True)
+        self._hilo.start()
+        return self
+
+    def esperar(self, tiempo=None):
+        if self._hilo is not None:
+            self._hilo.join(tiempo)
+
+    def ejecutar(self):
+        self.estado = 'en_curso'
+        self.inicio = time.time()
+        try:
+            with open(self.archivo, 'rb') as archivo, \
+                    open(self.reporte, 'w', encoding='utf-8', newline='') as reporte:
+                escritor = csv.writer(reporte)
+                escritor.writerow(['fila', 'error', 'datos'])
+                lector = leer_csv(archivo) if self.formato == 'csv' else leer_json(archivo)
+                ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                datos_por_fila = {}
+                for bloque in self._validados(self._bloques(lector, archivo, datos_por_fila), ahora):
+                    self._aplicar(bloque, escritor, datos_por_fila)
+                    # Lo aplicado queda visible para los demás procesos
+                    reporte.flush()
+                    self.publicar()
+            self.estado = 'completada'
+        except ValueError as e:
+            # Archivo mal formado: lo ya aplicado se queda, el resto no se
+            # importa. El error lo dice para que no se vuelva a importar todo
+            # (se duplicarían los productos de los bloques anteriores).
+            self.estado = 'fallida'
+            self.error = str(e)
+            if self.aceptadas:
+                self.error += (f'. Los {self.aceptadas} productos de los bloques anteriores ya se importaron '
+                               f'(ids {self.primer_id}-{self.ultimo_id})')
+            logger.warning('Importación %s interrumpida: %s', self.id, e)
+        except Exception as e:
+            self.estado = 'fallida'
+            self.error = str(e)
+            logger.exception('Importación %s fallida', self.id)
+        finally:
+            self.fin = time.time()
+            if self.borrar_archivo:
+                try:
+                    os.remove(self.archivo)
+                except OSError:
+                    pass
+            self.publicar()
+        logger.info('Importación %s %s', self.id, self.estado,
+                    extra={'filas': self.filas, 'aceptadas': self.aceptadas, 'rechazadas': self.rechazadas,
+                           'duracion': round(self.fin - self.inicio, 3)})
+        return self
+
+    def _bloques(self, lector, archivo, datos_por_fila):
+        # Agrupa las filas leídas; se guardan los datos originales de cada
+        # bloque en vuelo para poder escribirlos en el reporte si se rechazan
+        bloque = []
+        for numero, datos in lector:
+            bloque.append((numero, datos))
+            datos_por_fila[numero] = datos
+            if len(bloque) >= self.tamano_bloque:
+                self.leidos = archivo.tell()
+                yield bloque
+                bloque = []
+        if bloque:
+            yield bloque
+
+    def _validados(self, bloques, ahora):
+        if self.trabajadores <= 1:
+            for bloque in bloques:
+                yield validar_bloque(bloque, ahora)
+            return
+        # Se mantienen como mucho dos bloques por proceso en vuelo, para que
+        # la lectura no se adelante (y no llene la memoria) si aplicar es más lento
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(self.trabajadores, mp_context=contexto) as pool:
+            pendientes = deque()
+            for bloque in bloques:
+                pendientes.append(pool.submit(validar_bloque, bloque, ahora))
+                if len(pendientes) >= self.trabajadores * 2:
+                    yield pendientes.popleft().result()
+            while pendientes:
+                yield pendientes.popleft().result()
+
+    def _aplicar(self, bloque, escritor, datos_por_fila):
+        validas = []
+        rechazos = []
+        for numero, producto, error in bloque:
+            datos = datos_por_fila.pop(numero, None)
+            if error:
+                rechazos.append((numero, error, datos))
+            else:
+                validas.append(('crear', None, producto))
+
+        creados = self.almacen.aplicar_lote(validas) if validas else []
+        for numero, error, datos in rechazos:
+            escritor.writerow([numero, error, datos.strip() if isinstance(datos, str) else json.dumps(datos, ensure_ascii=False)])
+
+        with self._lock:
+            self.bloques += 1
+            self.filas += len(bloque)
+            self.aceptadas += len(creados)
+            self.rechazadas += len(rechazos)
+            if creados:
+                if self.primer_id is None:
+                    self.primer_id = creados[0]['id']
+                self.ultimo_id = creados[-1]['id']
+            espacio = RECHAZOS_EN_ESTADO - len(self.rechazos)
+            self.rechazos.extend({'fila': numero, 'error': error} for numero, error, _ in rechazos[:max(espacio, 0)])
+        FILAS_IMPORTADAS.incrementar(len(creados), 'aceptada')
+        FILAS_IMPORTADAS.incrementar(len(rechazos), 'rechazada')
+
+    def to_dict(self):
+        with self._lock:
+            terminada = self.estado in ('completada', 'fallida')
+            fin = self.fin if self.fin is not None else time.time()
+            return {
+                'id': self.id,
+                'estado': self.estado,
+                'formato': self.formato,
+                'filas': self.filas,
+                'aceptadas': self.aceptadas,
+                'rechazadas': self.rechazadas,
+                'bloques': self.bloques,
+                'progreso': 100.0 if terminada else round(self.leidos / self.tamano * 100, 1) if self.tamano else 0.0,
+                'ids': {'primero': self.primer_id, 'ultimo': self.ultimo_id} if self.primer_id is not None else None,
+                'duracion': round(fin - self.inicio, 3) if self.inicio is not None else 0.0,
+                'error': self.error,
+                'rechazos': list(self.rechazos)
+            }
+
+    def publicar(self):
+        # Escribe el estado en el directorio (escritura atómica: quien lo lea
+        # desde otro proceso ve el anterior o el nuevo, nunca uno a medias)
+        if self.directorio is None:
+            return
+        ruta = ruta_estado(self.directorio, self.id)
+        temporal = f'{ruta}.tmp'
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.error('No se pudo publicar el estado de la importación %s: %s', self.id, e,
+                         extra={'archivo': ruta})
+
+
+class RegistroImportaciones:
+    # Importaciones iniciadas desde la API. El estado se lee del directorio
+    # compartido, no de la memoria del proceso que aceptó el archivo. Se
+    # conservan las últimas MAX_IMPORTACIONES terminadas; al descartar una se
+    # borra también su reporte.
+
+    def __init__(self, directorio=None, maximo=MAX_IMPORTACIONES):
+        # Sin directorio (persistencia sin archivo) se usa uno temporal
+        self.directorio = directorio or os.path.join(tempfile.gettempdir(), 'inventario_importaciones')
+        self.maximo = maximo
+
+    def iniciar(self, almacen, archivo, formato, **opciones):
+        importacion = Importacion(almacen, archivo, formato, directorio=self.directorio, **opciones)
+        self._descartar_viejas()
+        return importacion.iniciar()
+
+    def obtener(self, id):
+        # Estado publicado de una importación (diccionario), o None
+        if not _id_valido(id):
+            return None
+        try:
+            with open(ruta_estado(self.directorio, id), 'rb') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def reporte(self, id):
+        # Ruta del reporte de rechazos, o None si no existe
+        if not _id_valido(id):
+            return None
+        ruta = ruta_reporte(self.directorio, id)
+        return ruta if os.path.exists(ruta) else None
+
+    def _descartar_viejas(self):
+        # Las terminadas más antiguas (por la fecha de su última publicación)
+        terminadas = []
+        try:
+            nombres = os.listdir(self.directorio)
+        except OSError:
+            return
+        for nombre in nombres:
+            id, extension = os.path.splitext(nombre)
+            if extension != '.json':
+                continue
+            estado = self.obtener(id)
+            if estado is not None and estado['estado'] in ('completada', 'fallida'):
+                try:
+                    terminadas.append((os.path.getmtime(ruta_estado(self.directorio, id)), id))
+                except OSError:
+                    pass
+        terminadas.sort()
+        for _, id in terminadas[:max(0, len(terminadas) - self.maximo)]:
+            for ruta in (ruta_estado(self.directorio, id), ruta_reporte(self.directorio, id)):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+
+def ruta_estado(directorio, id):
+    return os.path.join(directorio, f'{id}.json')
+
+
+def ruta_reporte(directorio, id):
+    return os.path.join(directorio, f'{id}_rechazos.csv')
+
+
+def _id_valido(id):
+    # Los ids son hexadecimales; cualquier otra cosa no puede ser un archivo del directorio
+    return bool(id) and len(id) <= 32 and all(c in '0123456789abcdef' for c in id)
@@ -0,0 +1,166 @@
+import bisect
+import math
+import re
+import unicodedata
+
+# Índices secundarios que el almacén mantiene al día en cada cambio, para
+# responder consultas sin recorrer todo el inventario.
+
+_INFINITO = float('inf')
+
+
+# Marcas diacríticas del latín (tildes, diéresis, virgulilla) tal como
+# quedan al descomponer con NFKD. U+034F no es una marca combinante.
+_MARCAS_LATINAS = re.compile('[\u0300-\u034e\u0350-\u036f]')
+
+
+def normalizar_texto(texto):
+    # Minúsculas y sin tildes, para que "lacteos" encuentre "Lácteos"
+    if not isinstance(texto, str):
+        return ''
+    if texto.isascii():
+        return texto.casefold()
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    # Caso común (español): al quitar las tildes latinas no queda nada fuera de ASCII
+    sin_tildes = _MARCAS_LATINAS.sub('', descompuesto)
+    if sin_tildes.isascii():
+        return sin_tildes.casefold()
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+class IndiceHash:
+    # valor -> conjunto de ids (igualdad exacta, p. ej. categoría)
+
+    def __init__(self):
+        self._valores = {}
+
+    def agregar(self, valor, id):
+        self._valores.setdefault(valor, set()).add(id)
+
+    def quitar(self, valor, id):
+        ids = self._valores.get(valor)
+        if ids is not None:
+            ids.discard(id)
+            if not ids:
+                del self._valores[valor]
+
+    def buscar(self, valor):
+        return self._valores.get(valor, set())
+
+    def contar(self, valor):
+        return len(self._valores.get(valor, ()))
+
+    def valores(self):
+        return self._valores.keys()
+
+
+def _es_finito(valor):
+    # NaN no es comparable (bisect no lo encuentra para quitarlo) e inf no
+    # cae en ningún rango útil: esos valores no entran al índice
+    return not isinstance(valor, float) or math.isfinite(valor)
+
+
+class IndiceOrdenado:
+    # Lista ordenada de (valor, id) para consultas por rango en O(log n + k)
+
+    def __init__(self):
+        self._entradas = []
+
+    def agregar(self, valor, id):
+        if _es_finito(valor):
+            bisect.insort(self._entradas, (valor, id))
+
+    def quitar(self, valor, id):
+        i = bisect.bisect_left(self._entradas, (valor, id))
+        if i < len(self._entradas) and self._entradas[i] == (valor, id):
+            del self._entradas[i]
+
+    def _limites(self, minimo, maximo):
+        inicio = 0 if minimo is None else bisect.bisect_left(self._entradas, (minimo,))
+        fin = len(self._entradas) if maximo is None else bisect.bisect_right(self._entradas, (maximo, _INFINITO))
+        return inicio, max(inicio, fin)
+
+    def contar(self, minimo=None, maximo=None):
+        inicio, fin = self._limites(minimo, maximo)
+        return fin - inicio
+
+    def rango(self, minimo=None, maximo=None, limite=None):
+        # Ids en orden de valor (y de id para valores iguales), hasta "limite"
+        inicio, fin = self._limites(minimo, maximo)
+        if limite is not None:
+            fin = min(fin, inicio + limite)
+        return [id for _, id in self._entradas[inicio:fin]]
+
+    def agregar_varios(self, entradas):
+        # Ordenar dos tramos ya ordenados es casi una mezcla lineal
+        self._entradas.extend(e for e in entradas if _es_finito(e[0]))
+        self._entradas.sort()
+
+    def exportar(self):
+        # Copia para el volcado binario (las tuplas no cambian)
+        return list(self._entradas)
+
+    def importar(self, entradas):
+        # Entradas de exportar(), ya ordenadas
+        self._entradas = entradas
+
+
+class IndiceTexto:
+    # Índice de trigramas para búsqueda de subcadenas. Una subcadena de 3 o
+    # más caracteres solo puede estar en los textos que contienen todos sus
+    # trigramas; el resultado son candidatos que luego se verifican.
+
+    def __init__(self):
+        self._trigramas = {}
+
+    @staticmethod
+    def _trigramas_de(texto):
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def agregar(self, texto, id):
+        trigramas = self._trigramas
+        for trigrama in self._trigramas_de(normalizar_texto(texto)):
+            ids = trigramas.get(trigrama)
+            if ids is None:
+                trigramas[trigrama] = {id}
+            else:
+                ids.add(id)
+
+    def quitar(self, texto, id):
+        for trigrama in self._trigramas_de(normalizar_texto(texto)):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._trigramas[trigrama]
+
+    def exportar(self):
+        # Para el volcado binario: listas en lugar de conjuntos, que marshal
+        # escribe varias veces más rápido
+        return {trigrama: list(ids) for trigrama, ids in self._trigramas.items()}
+
+    def importar(self, trigramas):
+        self._trigramas = {trigrama: set(ids) for trigrama, ids in trigramas.items()}
+
+    def _conjuntos(self, consulta):
+        trigramas = self._trigramas_de(normalizar_texto(consulta))
+        if not trigramas:
+            return None
+        return sorted((self._trigramas.get(t, set()) for t in trigramas), key=len)
+
+    def contar(self, consulta):
+        # Cota superior barata: el conjunto más pequeño de sus trigramas
+        conjuntos = self._conjuntos(consulta)
+        return None if conjuntos is None else len(conjuntos[0])
+
+    def buscar(self, consulta):
+        # Devuelve None si la consulta es demasiado corta para usar el índice
+        conjuntos = self._conjuntos(consulta)
+        if conjuntos is None:
+            return None
+        resultado = set(conjuntos[0])
+        for ids in conjuntos[1:]:
+            resultado &= ids
+            if not resultado:
+                break
+        return resultado
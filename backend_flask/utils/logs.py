@@ -0,0 +1,52 @@
+import json
+import logging
+import os
+
+# Configuración del logging del backend.
+#   INVENTARIO_LOG_FORMATO = 'texto' (por defecto) o 'json' (una línea JSON por evento)
+#   INVENTARIO_LOG_NIVEL   = DEBUG, INFO (por defecto), WARNING, ERROR
+FORMATO = os.environ.get('INVENTARIO_LOG_FORMATO', 'texto')
+NIVEL = os.environ.get('INVENTARIO_LOG_NIVEL', 'INFO')
+
+# Atributos propios de LogRecord; el resto son los campos pasados con extra={...}
+_ESTANDAR = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormatoJSON(logging.Formatter):
+    # Cada evento como un objeto JSON, con los campos de extra={...} incluidos
+
+    def format(self, record):
+        datos = {
+            'fecha': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'origen': record.name,
+            'mensaje': record.getMessage(),
+        }
+        datos.update({k: v for k, v in vars(record).items() if k not in _ESTANDAR})
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    # Texto legible; los campos de extra={...} se agregan como clave=valor
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        texto = super().format(record)
+        extra = ' '.join(f'{k}={v}' for k, v in vars(record).items() if k not in _ESTANDAR)
+        return f'{texto} {extra}' if extra else texto
+
+
+def configurar_logs(nivel=NIVEL, formato=FORMATO):
+    # Solo si nadie configuró el logging antes: se respeta lo que haya puesto
+    # quien importa la aplicación (gunicorn --log-config, pruebas, benchmarks)
+    raiz = logging.getLogger()
+    if raiz.handlers:
+        return
+    manejador = logging.StreamHandler()
+    manejador.setFormatter(FormatoJSON() if formato == 'json' else FormatoTexto())
+    raiz.addHandler(manejador)
+    raiz.setLevel(nivel)
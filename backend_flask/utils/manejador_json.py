@@ -1,119 +1,188 @@
+import hashlib
 import json
+import logging
 import os
+import re
+import unicodedata
 
-ARCHIVO = 'backend_flask/inventario.json'
+from utils.serializacion import LEGIBLE, ErrorJSON, a_json, desde_json
+from utils.metricas import (
+    LECTURAS, BYTES_LEIDOS, DURACION_DECODIFICACION, ESCRITURAS, BYTES_ESCRITOS,
+    DURACION_CODIFICACION, DURACION_ESCRITURA, ERRORES_IO
+)
 
-def inicializar_inventario():
+logger = logging.getLogger(__name__)
+
+ARCHIVO = os.environ.get('INVENTARIO_ARCHIVO', 'backend_flask/inventario.json')
+
+def inicializar_inventario(archivo=None):
+    archivo = archivo or ARCHIVO
     try:
         # Crear directorio si no existe
-        directorio = os.path.dirname(ARCHIVO)
+        directorio = os.path.dirname(archivo)
         if directorio and not os.path.exists(directorio):
             os.makedirs(directorio)
-            print(f" Directorio creado: {directorio}")
+            logger.info("Directorio creado", extra={'archivo': directorio})
         
         # Crear archivo si no existe
-        if not os.path.exists(ARCHIVO):
-            with open(ARCHIVO, 'w', encoding='utf-8') as f:
+        if not os.path.exists(archivo):
+            with open(archivo, 'w', encoding='utf-8') as f:
                 json.dump([], f, indent=4, ensure_ascii=False)
-            print(f" Archivo de inventario creado: {ARCHIVO}")
+            logger.info("Archivo de inventario creado", extra={'archivo': archivo})
         
         return True
     except Exception as e:
-        print(f" Error al inicializar inventario: {e}")
+        logger.error("Error al inicializar inventario: %s", e, extra={'archivo': archivo})
         return False
 
 
-def leer_inventario():
+def leer_inventario(archivo=None):
+    archivo = archivo or ARCHIVO
+    LECTURAS.incrementar()
     try:
         # Verificar que el archivo existe
-        if not os.path.exists(ARCHIVO):
-            print("[WARNING] Archivo no encontrado. Inicializando...")
-            inicializar_inventario()
+        if not os.path.exists(archivo):
+            logger.warning("Archivo no encontrado. Inicializando...", extra={'archivo': archivo})
+            inicializar_inventario(archivo)
             return []
         
-        # Leer el archivo
-        with open(ARCHIVO, 'r', encoding='utf-8') as f:
-            contenido = f.read().strip()
+        # Leer el archivo (bytes directamente, sin copias intermedias)
+        with open(archivo, 'rb') as f:
+            contenido = f.read()
+            BYTES_LEIDOS.incrementar(len(contenido))
             
             # Verificar si el archivo está vacío
-            if not contenido:
-                print("[WARNING] Archivo vacio. Retornando lista vacia.")
+            if not contenido or contenido.isspace():
+                logger.warning("Archivo vacio. Retornando lista vacia.", extra={'archivo': archivo})
                 return []
             
             # Intentar parsear el JSON
-            productos = json.loads(contenido)
+            with DURACION_DECODIFICACION.cronometrar():
+                productos = desde_json(contenido)
             
             # Verificar que sea una lista
             if not isinstance(productos, list):
-                print("[WARNING] El contenido no es una lista. Reinicializando...")
-                inicializar_inventario()
+                logger.warning("El contenido no es una lista. Reinicializando...", extra={'archivo': archivo})
+                inicializar_inventario(archivo)
                 return []
             
             return productos
             
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] Error al decodificar JSON: {e}")
-        print("[WARNING] Archivo JSON corrupto. Creando respaldo y reinicializando...")
+    except (ErrorJSON, UnicodeDecodeError) as e:
+        # (json de la librería estándar falla con UnicodeDecodeError ante bytes inválidos)
+        ERRORES_IO.incrementar(1, 'leer')
+        logger.error("Archivo JSON corrupto (%s). Creando respaldo y rescatando los productos legibles...", e,
+                     extra={'archivo': archivo})
+        productos, descartados = rescatar_productos(contenido)
         
         # Crear respaldo del archivo corrupto
         try:
-            if os.path.exists(ARCHIVO):
-                backup = f"{ARCHIVO}.backup"
-                os.rename(ARCHIVO, backup)
-                print(f"[OK] Respaldo creado: {backup}")
+            if os.path.exists(archivo):
+                backup = f"{archivo}.backup"
+                os.rename(archivo, backup)
+                logger.info("Respaldo creado", extra={'archivo': backup})
         except Exception as backup_error:
-            print(f" Error al crear respaldo: {backup_error}")
+            logger.error("Error al crear respaldo: %s", backup_error, extra={'archivo': archivo})
         
-        # Reinicializar archivo
-        inicializar_inventario()
-        return []
+        # Reescribir el archivo solo con lo rescatado
+        if not guardar_inventario(productos, archivo):
+            inicializar_inventario(archivo)
+        logger.warning("Se rescataron %d productos; %d tramos ilegibles descartados", len(productos), descartados,
+                       extra={'archivo': archivo})
+        return productos
         
     except FileNotFoundError:
-        print(f" Archivo no encontrado: {ARCHIVO}")
-        inicializar_inventario()
+        logger.warning("Archivo no encontrado", extra={'archivo': archivo})
+        inicializar_inventario(archivo)
         return []
         
     except PermissionError:
-        print(f" Sin permisos para leer el archivo: {ARCHIVO}")
+        ERRORES_IO.incrementar(1, 'leer')
+        logger.error("Sin permisos para leer el archivo", extra={'archivo': archivo})
         return []
         
     except Exception as e:
-        print(f" Error inesperado al leer inventario: {e}")
+        ERRORES_IO.incrementar(1, 'leer')
+        logger.exception("Error inesperado al leer inventario: %s", e, extra={'archivo': archivo})
         return []
 
 
-def guardar_inventario(productos):
+def rescatar_productos(contenido):
+    # Recupera los productos legibles de un inventario dañado (cortado a
+    # mitad de una escritura, con bytes basura o con un elemento roto).
+    # Recorre el arreglo objeto por objeto; ante uno que no se puede
+    # decodificar salta al siguiente "{" y sigue desde ahí.
+    # Devuelve (productos, tramos ilegibles descartados).
+    texto = contenido.decode('utf-8', errors='replace')
+    decodificador = json.JSONDecoder()
+    productos = []
+    descartados = 0
+    en_tramo_ilegible = False
+    pos = texto.find('[') + 1
+    while True:
+        pos = texto.find('{', pos)
+        if pos < 0:
+            break
+        try:
+            valor, final = decodificador.raw_decode(texto, pos)
+        except json.JSONDecodeError:
+            if not en_tramo_ilegible:
+                descartados += 1
+                en_tramo_ilegible = True
+            pos += 1
+            continue
+        if isinstance(valor, dict) and 'id' in valor:
+            productos.append(valor)
+            en_tramo_ilegible = False
+        elif not en_tramo_ilegible:
+            # Un objeto suelto sin id (p. ej. anidado dentro de uno roto)
+            descartados += 1
+            en_tramo_ilegible = True
+        pos = final
+    return productos, descartados
+
+
+def guardar_inventario(productos, archivo=None, legible=LEGIBLE):
+    archivo = archivo or ARCHIVO
+    ESCRITURAS.incrementar()
     try:
         # Validar que productos sea una lista
         if not isinstance(productos, list):
-            print("[ERROR] Error: Se esperaba una lista de productos")
+            logger.error("Se esperaba una lista de productos")
             return False
         
         # Verificar que el directorio existe
-        directorio = os.path.dirname(ARCHIVO)
+        directorio = os.path.dirname(archivo)
         if directorio and not os.path.exists(directorio):
             os.makedirs(directorio)
         
         # Guardar en archivo temporal primero (para evitar corrupción)
-        archivo_temp = f"{ARCHIVO}.tmp"
-        with open(archivo_temp, 'w', encoding='utf-8') as f:
-            json.dump(productos, f, indent=4, ensure_ascii=False)
+        archivo_temp = f"{archivo}.tmp"
+        # Formato compacto salvo que se pida legible
+        with DURACION_CODIFICACION.cronometrar():
+            contenido = a_json(productos, legible=legible)
+        with DURACION_ESCRITURA.cronometrar(), open(archivo_temp, 'wb') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        BYTES_ESCRITOS.incrementar(len(contenido))
         
-        # Reemplazar archivo original con el temporal
-        if os.path.exists(ARCHIVO):
-            os.remove(ARCHIVO)
-        os.rename(archivo_temp, ARCHIVO)
+        # Reemplazar archivo original con el temporal de forma atómica
+        # (el archivo nunca deja de existir, ni siquiera por un instante)
+        os.replace(archivo_temp, archivo)
         
         return True
         
     except PermissionError:
-        print(f"[ERROR] Sin permisos para escribir en: {ARCHIVO}")
+        ERRORES_IO.incrementar(1, 'guardar')
+        logger.error("Sin permisos para escribir el archivo", extra={'archivo': archivo})
         return False
         
     except Exception as e:
-        print(f"[ERROR] Error al guardar inventario: {e}")
+        ERRORES_IO.incrementar(1, 'guardar')
+        logger.error("Error al guardar inventario: %s", e, extra={'archivo': archivo})
         # Limpiar archivo temporal si existe
-        archivo_temp = f"{ARCHIVO}.tmp"
+        archivo_temp = f"{archivo}.tmp"
         if os.path.exists(archivo_temp):
             try:
                 os.remove(archivo_temp)
@@ -136,7 +205,7 @@ def generar_id(productos):
         return max(ids) + 1
         
     except Exception as e:
-        print(f"[ERROR] Error al generar ID: {e}")
+        logger.error("Error al generar ID: %s", e)
         return 1
 
 
@@ -150,4 +219,108 @@ def validar_estructura_producto(producto):
         if campo not in producto:
             return False
     
-    return True
\ No newline at end of file
+    return True
+
+def firma_archivo(archivo=None):
+    # Identifica la versión del archivo en disco (mtime, inodo y tamaño)
+    archivo = archivo or ARCHIVO
+    try:
+        info = os.stat(archivo)
+        return (info.st_mtime_ns, info.st_ino, info.st_size)
+    except OSError:
+        return None
+
+
+# ---------------------------------------------------------------
+# Inventario particionado: un directorio con un archivo JSON (segmento)
+# por partición y un manifiesto pequeño. Cada segmento tiene el mismo
+# formato que inventario.json (una lista de productos).
+# ---------------------------------------------------------------
+
+MANIFIESTO = 'manifiesto.json'
+FORMATO_MANIFIESTO = 1
+
+
+def particion_por_categoria(categoria):
+    # Nombre del segmento de una categoría: legible y sin caracteres
+    # problemáticos, con un hash corto para que dos categorías que se
+    # escriben parecido ("Lácteos" y "lacteos") no compartan archivo
+    clave = a_json(categoria)
+    texto = categoria if isinstance(categoria, str) else ''
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+    legible = re.sub(r'[^a-z0-9]+', '-', texto).strip('-')[:40] or 'sin-nombre'
+    return f"categoria-{legible}-{hashlib.sha1(clave).hexdigest()[:8]}.json"
+
+
+def particion_por_id(id, cubetas):
+    # Nombre del segmento de un id cuando se reparte en cubetas fijas
+    return f"cubeta-{id % cubetas:03d}.json"
+
+
+def listar_particiones(directorio):
+    # Segmentos presentes en el directorio (sin el manifiesto)
+    try:
+        nombres = os.listdir(directorio)
+    except FileNotFoundError:
+        return []
+    return sorted(n for n in nombres if n.endswith('.json') and n != MANIFIESTO)
+
+
+def leer_manifiesto(directorio):
+    # Devuelve el manifiesto o None si no existe o no se puede leer
+    ruta = os.path.join(directorio, MANIFIESTO)
+    try:
+        with open(ruta, 'rb') as f:
+            manifiesto = desde_json(f.read())
+    except FileNotFoundError:
+        return None
+    except (ErrorJSON, OSError) as e:
+        ERRORES_IO.incrementar(1, 'leer')
+        logger.error("Manifiesto ilegible (%s)", e, extra={'archivo': ruta})
+        return None
+    if not isinstance(manifiesto, dict) or manifiesto.get('formato') != FORMATO_MANIFIESTO:
+        logger.error("Manifiesto con formato desconocido", extra={'archivo': ruta})
+        return None
+    return manifiesto
+
+
+def guardar_manifiesto(manifiesto, directorio):
+    # Escritura atómica, igual que la del inventario
+    ruta = os.path.join(directorio, MANIFIESTO)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        archivo_temp = f"{ruta}.tmp"
+        with open(archivo_temp, 'wb') as f:
+            f.write(a_json(dict(manifiesto, formato=FORMATO_MANIFIESTO), legible=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(archivo_temp, ruta)
+        return True
+    except Exception as e:
+        ERRORES_IO.incrementar(1, 'guardar')
+        logger.error("Error al guardar el manifiesto: %s", e, extra={'archivo': ruta})
+        return False
+
+
+def leer_particion(directorio, nombre):
+    # Un segmento que todavía no se escribió (o que quedó vacío) no tiene archivo
+    ruta = os.path.join(directorio, nombre)
+    if not os.path.exists(ruta):
+        return []
+    return leer_inventario(ruta)
+
+
+def guardar_particion(productos, directorio, nombre):
+    # Un segmento vacío se borra en lugar de dejar un archivo con []
+    ruta = os.path.join(directorio, nombre)
+    if productos:
+        return guardar_inventario(productos, ruta)
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        ERRORES_IO.incrementar(1, 'guardar')
+        logger.error("No se pudo borrar la partición vacía: %s", e, extra={'archivo': ruta})
+        return False
+    return True
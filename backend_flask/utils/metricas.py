@@ -0,0 +1,195 @@
+import bisect
+import threading
+import time
+
+# Métricas en memoria expuestas en el formato de texto de Prometheus
+# (GET /metrics). Registrar un valor cuesta un lock y una suma, así que
+# pueden quedar activas en producción.
+
+# Límites (en segundos) de los histogramas de duración
+LIMITES_DURACION = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    pares += [f'{n}="{_escapar(v)}"' for n, v in extra]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def _lineas(self):
+        raise NotImplementedError
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        return lineas + self._lineas()
+
+
+class Contador(Metrica):
+    # Valor que solo crece (llamadas, bytes)
+    tipo = 'counter'
+
+    def incrementar(self, cantidad=1, *etiquetas):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def _lineas(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, e)} {_numero(v)}' for e, v in valores]
+
+
+class Medidor(Metrica):
+    # Valor que sube y baja; se calcula con "funcion" al momento de exponerlo
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, funcion):
+        super().__init__(nombre, ayuda)
+        self.funcion = funcion
+
+    def _lineas(self):
+        return [f'{self.nombre} {_numero(self.funcion())}']
+
+
+class Histograma(Metrica):
+    # Distribución de valores (duraciones) en intervalos fijos
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_DURACION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, *etiquetas):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            datos = self._valores.get(etiquetas)
+            if datos is None:
+                # [conteo por intervalo..., suma, total]
+                datos = self._valores[etiquetas] = [0] * (len(self.limites) + 1) + [0.0, 0]
+            datos[i] += 1
+            datos[-2] += valor
+            datos[-1] += 1
+
+    def cronometrar(self, *etiquetas):
+        return _Cronometro(self, etiquetas)
+
+    def _lineas(self):
+        with self._lock:
+            valores = sorted((e, list(d)) for e, d in self._valores.items())
+        lineas = []
+        for etiquetas, datos in valores:
+            acumulado = 0
+            for limite, conteo in zip(self.limites + (float('inf'),), datos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket'
+                              f'{_etiquetas(self.etiquetas, etiquetas, [("le", _numero(limite))])} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(datos[-2])}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {datos[-1]}')
+        return lineas
+
+
+class _Cronometro:
+    # with histograma.cronometrar(): ... -> observa la duración del bloque
+
+    def __init__(self, histograma, etiquetas):
+        self.histograma = histograma
+        self.etiquetas = etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histograma.observar(time.perf_counter() - self.inicio, *self.etiquetas)
+
+
+class Registro:
+    # Conjunto de métricas del proceso
+
+    def __init__(self):
+        self._metricas = []
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_DURACION):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def medidor(self, nombre, ayuda, funcion):
+        return self._agregar(Medidor(nombre, ayuda, funcion))
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+# Peticiones HTTP (las registra instrumentar())
+DURACION_PETICIONES = registro.histograma(
+    'inventario_peticion_segundos', 'Duración de las peticiones HTTP por ruta', ('metodo', 'ruta', 'codigo'))
+
+# Entrada/salida del archivo de inventario (utils/manejador_json.py)
+LECTURAS = registro.contador('inventario_lecturas_total', 'Llamadas a leer_inventario')
+BYTES_LEIDOS = registro.contador('inventario_bytes_leidos_total', 'Bytes leídos del archivo de inventario')
+DURACION_DECODIFICACION = registro.histograma(
+    'inventario_decodificacion_segundos', 'Tiempo de interpretar el JSON del inventario')
+ESCRITURAS = registro.contador('inventario_escrituras_total', 'Llamadas a guardar_inventario')
+BYTES_ESCRITOS = registro.contador('inventario_bytes_escritos_total', 'Bytes escritos en el archivo de inventario')
+DURACION_CODIFICACION = registro.histograma(
+    'inventario_codificacion_segundos', 'Tiempo de convertir el inventario a JSON')
+DURACION_ESCRITURA = registro.histograma(
+    'inventario_escritura_segundos', 'Tiempo de escribir y sincronizar (fsync) el archivo de inventario')
+ERRORES_IO = registro.contador('inventario_errores_io_total', 'Errores al leer o escribir el inventario', ('operacion',))
+BYTES_BITACORA = registro.contador(
+    'inventario_anexados_bytes_total', 'Bytes anexados a archivos de solo-anexar (bitácora y registro de cambios)')
+
+# Compresión de respuestas (utils/compresion.py); origen: compresion, cache o streaming
+RESPUESTAS_COMPRIMIDAS = registro.contador(
+    'inventario_respuestas_comprimidas_total', 'Respuestas HTTP comprimidas', ('codificacion', 'origen'))
+
+FILAS_IMPORTADAS = registro.contador(
+    'inventario_importacion_filas_total', 'Filas procesadas por las importaciones masivas', ('resultado',))
+
+
+def instrumentar(app):
+    # Mide cada petición de la aplicación Flask. Se usa la regla de la ruta
+    # (p. ej. /api/productos/<int:id>) para no crear una serie por id.
+    from flask import g, request
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g.inicio_peticion = time.perf_counter()
+
+    @app.after_request
+    def _registrar_duracion(respuesta):
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is not None:
+            ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+            DURACION_PETICIONES.observar(time.perf_counter() - inicio, request.method, ruta, str(respuesta.status_code))
+        return respuesta
@@ -0,0 +1,58 @@
+import base64
+import json
+
+from models.producto import CAMPOS
+
+# Máximo de productos que se devuelven en una sola página
+LIMITE_MAXIMO = 1000
+
+
+def codificar_cursor(ultimo_id):
+    # El cursor es opaco para el cliente: solo debe devolverlo tal cual
+    contenido = json.dumps({'despues_de': ultimo_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(contenido).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return int(contenido['despues_de'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('El cursor no es válido')
+
+
+def leer_parametros_pagina(args):
+    # Interpreta limit, offset, cursor y fields de la petición.
+    # Lanza ValueError con un mensaje para el cliente si algo no es válido.
+    limite = None
+    if args.get('limit') not in (None, ''):
+        try:
+            limite = int(args['limit'])
+        except ValueError:
+            raise ValueError('El parámetro limit debe ser un número entero')
+        if limite < 1:
+            raise ValueError('El parámetro limit debe ser mayor que cero')
+        limite = min(limite, LIMITE_MAXIMO)
+
+    desplazamiento = 0
+    if args.get('offset') not in (None, ''):
+        try:
+            desplazamiento = int(args['offset'])
+        except ValueError:
+            raise ValueError('El parámetro offset debe ser un número entero')
+        if desplazamiento < 0:
+            raise ValueError('El parámetro offset no puede ser negativo')
+
+    despues_de = None
+    if args.get('cursor'):
+        despues_de = decodificar_cursor(args['cursor'])
+
+    campos = None
+    if args.get('fields'):
+        campos = [c.strip() for c in args['fields'].split(',') if c.strip()]
+        desconocidos = [c for c in campos if c not in CAMPOS]
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+
+    return limite, desplazamiento, despues_de, campos
@@ -0,0 +1,880 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from models.producto import CAMPOS
+from utils.serializacion import a_json, desde_json
+from utils.manejador_json import (
+    ARCHIVO, MANIFIESTO, leer_inventario, guardar_inventario, firma_archivo, generar_id,
+    particion_por_categoria, particion_por_id, listar_particiones, leer_manifiesto,
+    guardar_manifiesto, leer_particion, guardar_particion
+)
+from utils.bitacora import Bitacora
+from utils.estadisticas import Estadisticas, es_numero
+from utils.filtros import es_fecha
+from utils.volcado import leer_volcado, escribir_volcado
+from utils.bloqueo import BloqueoArchivo
+
+logger = logging.getLogger(__name__)
+
+# Modo de persistencia:
+#   'diferido' -> se reescribe el JSON completo en segundo plano, agrupando cambios
+#   'bitacora' -> cada cambio se anexa a una bitácora y el JSON se compacta de vez en cuando
+#   'sqlite'   -> base de datos SQLite con una fila por producto
+#   'particionado' -> un JSON por partición (categoría o cubeta de ids); solo
+#                     se leen y reescriben las particiones que hacen falta
+MODO = os.environ.get('INVENTARIO_MODO', 'diferido')
+
+# Segundos que se esperan para agrupar varias escrituras en una sola
+RETARDO_ESCRITURA = float(os.environ.get('INVENTARIO_RETARDO_ESCRITURA', '0.5'))
+
+# Tamaño en bytes de la bitácora a partir del cual se reescribe el JSON
+UMBRAL_COMPACTACION = int(os.environ.get('INVENTARIO_UMBRAL_COMPACTACION', str(1024 * 1024)))
+
+# Activar cuando varios procesos (p. ej. workers de gunicorn) comparten el archivo
+MULTIPROCESO = os.environ.get('INVENTARIO_MULTIPROCESO', '0') == '1'
+
+# Volcado binario del almacén (utils/volcado.py) para arrancar rápido en los
+# modos diferido y bitacora, y cada cuántos segundos como mínimo se renueva
+# mientras haya escrituras (además, siempre al cerrar)
+VOLCADO = os.environ.get('INVENTARIO_VOLCADO', '1') == '1'
+INTERVALO_VOLCADO = float(os.environ.get('INVENTARIO_INTERVALO_VOLCADO', '300'))
+
+# Reparto del modo particionado: 'categoria' (un segmento por categoría) o
+# 'cubetas:N' (N segmentos según el id). Solo se usa al crear el manifiesto.
+PARTICIONES = os.environ.get('INVENTARIO_PARTICIONES', 'categoria')
+
+# Ruta de la base de datos en modo sqlite
+ARCHIVO_SQLITE = os.environ.get('INVENTARIO_SQLITE', 'backend_flask/inventario.db')
+
+
+class Persistencia:
+    # Interfaz entre el almacén en memoria y el disco.
+    #
+    # cargar()          -> (productos, registros): estado base y operaciones a repetir encima
+    # cargar_volcado()  -> (datos del volcado binario, registros), o None si no hay uno vigente
+    # volcar()          -> escribe el volcado binario con el estado actual del almacén
+    # registrar(regs)   -> persiste operaciones ya aplicadas en memoria
+    # hay_cambios()     -> True si otro proceso o una edición externa cambió los datos
+    # leer_cambios()    -> operaciones externas nuevas, o None si hay que recargar todo
+    # pendiente()       -> True si hay cambios propios que todavía no están en disco
+    # bloqueo()         -> contexto de exclusión entre procesos
+    #
+    # Las estrategias particionadas cargan los productos por partes:
+    # id_maximo()               -> mayor id asignado, aunque no esté cargado
+    # por_cargar(ids, categorias, productos)
+    #                           -> particiones que faltan leer para trabajar con
+    #                              esos ids, categorías o productos nuevos
+    #                              (sin ninguno de los tres: todas las que faltan)
+    # cargar_particiones(nombres) -> productos de esas particiones
+    #
+    # multiproceso indica que la persistencia es síncrona y que el almacén
+    # debe ponerse al día antes de cada modificación.
+    #
+    # archivo_cambios es donde se guarda el registro de cambios
+    # (utils/cambios.py); None lo deja solo en memoria.
+    # directorio_importaciones es donde las importaciones publican su estado
+    # y su reporte (utils/importacion.py); None usa un directorio temporal.
+
+    multiproceso = False
+    archivo_cambios = None
+    directorio_importaciones = None
+
+    def vincular(self, lock, obtener_productos, obtener_volcado=None):
+        # El almacén entrega su lock y funciones que copian el estado actual,
+        # para las estrategias que necesitan reescribir todo el inventario
+        self._lock_almacen = lock
+        self._obtener_productos = obtener_productos
+        self._obtener_volcado = obtener_volcado
+
+    def cargar(self):
+        raise NotImplementedError
+
+    def cargar_volcado(self):
+        return None
+
+    def volcar(self):
+        return False
+
+    def registrar(self, registros):
+        raise NotImplementedError
+
+    def hay_cambios(self):
+        return False
+
+    def leer_cambios(self):
+        return []
+
+    def id_maximo(self):
+        return 0
+
+    def estado(self):
+        # Identifica lo que este proceso leyó o escribió del disco; coincide
+        # en todos los procesos que están al día con el mismo almacenamiento
+        return None
+
+    def por_cargar(self, ids=None, categorias=None, productos=None):
+        return ()
+
+    def por_cargar_rango(self, cantidad_max=None, vence_desde=None, vence_hasta=None):
+        return ()
+
+    def totales_sin_cargar(self):
+        # Totales por categoría de lo que no está en memoria (None: no se conocen)
+        return []
+
+    def cargar_particiones(self, nombres):
+        return []
+
+    def pendiente(self):
+        return False
+
+    def bloqueo(self):
+        return contextlib.nullcontext()
+
+    def guardar(self):
+        # Fuerza a disco lo pendiente
+        return True
+
+    def cerrar(self):
+        pass
+
+
+class PersistenciaJSON(Persistencia):
+    # El inventario completo en un archivo JSON, reescrito en segundo plano:
+    # las modificaciones seguidas se agrupan en una sola escritura
+
+    def __init__(self, archivo=None, retardo_escritura=RETARDO_ESCRITURA, multiproceso=MULTIPROCESO):
+        self.archivo = archivo or ARCHIVO
+        self.archivo_cambios = f"{self.archivo}.cambios"
+        self.directorio_importaciones = f"{self.archivo}.importaciones"
+        self.retardo_escritura = retardo_escritura
+        self.multiproceso = multiproceso
+        self._bloqueo = BloqueoArchivo(f"{self.archivo}.lock") if multiproceso else None
+        self._firma = None
+        self._lock_escritura = threading.Lock()
+        # Contadores para saber si hay cambios sin guardar
+        self._generacion = 0
+        self._generacion_guardada = 0
+        self._pendiente = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        # Volcado binario: ruta (None = desactivado), si refleja lo último
+        # en memoria y cuándo se escribió
+        self.volcado = f"{self.archivo}.volcado" if VOLCADO else None
+        self._volcado_al_dia = True
+        self._volcar_pronto = False
+        self._ultimo_volcado = time.monotonic()
+
+    def bloqueo(self):
+        return self._bloqueo if self._bloqueo is not None else contextlib.nullcontext()
+
+    def cargar(self):
+        productos = leer_inventario(self.archivo)
+        self._firma = firma_archivo(self.archivo)
+        self._generacion_guardada = self._generacion
+        if self.volcado is not None:
+            # No había volcado vigente: se escribe uno en segundo plano para
+            # que el próximo arranque no tenga que pasar por el JSON
+            self._volcado_al_dia = False
+            if not self.multiproceso:
+                self._volcar_pronto = True
+                self._programar()
+        return productos, []
+
+    def cargar_volcado(self):
+        if self.volcado is None:
+            return None
+        firma = firma_archivo(self.archivo)
+        datos = leer_volcado(self.volcado, firma)
+        if datos is None:
+            return None
+        self._firma = firma
+        self._generacion_guardada = self._generacion
+        self._volcado_al_dia = True
+        return datos, []
+
+    def volcar(self):
+        # Escribe el volcado si hay algo nuevo y la memoria coincide con lo
+        # que hay en disco (sin cambios pendientes de guardar en el JSON)
+        if self.volcado is None or self._obtener_volcado is None:
+            return False
+        with self._lock_escritura:
+            with self._lock_almacen:
+                if self._volcado_al_dia:
+                    return True
+                if self.pendiente() or self._firma is None:
+                    return False
+                firma = self._firma
+                datos = self._obtener_volcado()
+                self._volcado_al_dia = True
+
+            escrito = escribir_volcado(self.volcado, datos, firma)
+            with self._lock_almacen:
+                if not escrito:
+                    self._volcado_al_dia = False
+                self._volcar_pronto = False
+                self._ultimo_volcado = time.monotonic()
+            return escrito
+
+    def _instantanea_cambio(self):
+        # Una escritura propia en curso cambia el archivo antes de actualizar la firma
+        return not self._lock_escritura.locked() and firma_archivo(self.archivo) != self._firma
+
+    def hay_cambios(self):
+        return self._instantanea_cambio()
+
+    def estado(self):
+        return self._firma
+
+    def leer_cambios(self):
+        return None if self._instantanea_cambio() else []
+
+    def pendiente(self):
+        return self._generacion != self._generacion_guardada
+
+    def registrar(self, registros):
+        self._generacion += 1
+        self._volcado_al_dia = False
+        if self.multiproceso:
+            # Los demás procesos deben ver el cambio al soltar el bloqueo
+            self._guardar_ahora()
+        else:
+            self._programar()
+
+    def _guardar_ahora(self):
+        # Escritura síncrona, con el lock del almacén tomado
+        if not guardar_inventario(self._obtener_productos(), self.archivo):
+            raise IOError(f"No se pudo guardar el inventario en {self.archivo}")
+        self._generacion_guardada = self._generacion
+        self._firma = firma_archivo(self.archivo)
+
+    # Escritura en segundo plano
+
+    def _programar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._escritor, name='escritor-inventario', daemon=True)
+            self._hilo.start()
+        self._pendiente.set()
+
+    def _escritor(self):
+        while not self._detener.is_set():
+            self._pendiente.wait()
+            if self._detener.is_set():
+                break
+            # Ventana para agrupar las modificaciones que lleguen seguidas
+            self._detener.wait(self.retardo_escritura)
+            self._pendiente.clear()
+            if not self._trabajo_pendiente():
+                # Reintentar más tarde sin perder los cambios
+                self._detener.wait(self.retardo_escritura)
+                self._pendiente.set()
+            elif self._volcar_pronto or time.monotonic() - self._ultimo_volcado >= INTERVALO_VOLCADO:
+                self.volcar()
+
+    def _trabajo_pendiente(self):
+        return self.guardar()
+
+    def guardar(self):
+        # Escribe el estado actual si hay cambios pendientes
+        with self._lock_escritura:
+            with self._lock_almacen:
+                if not self.pendiente():
+                    return True
+                generacion = self._generacion
+                productos = self._obtener_productos()
+
+            if not guardar_inventario(productos, self.archivo):
+                return False
+
+            with self._lock_almacen:
+                self._generacion_guardada = generacion
+                self._firma = firma_archivo(self.archivo)
+            return True
+
+    def cerrar(self):
+        # Detiene el hilo de escritura y guarda lo pendiente
+        self._detener.set()
+        self._pendiente.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self.guardar()
+        self.volcar()
+        if self._bloqueo is not None:
+            self._bloqueo.cerrar()
+
+
+class PersistenciaBitacora(PersistenciaJSON):
+    # Instantánea JSON + bitácora de solo-anexar. Cada cambio es una línea
+    # en la bitácora; el JSON se reescribe (compacta) cuando esta crece.
+
+    def __init__(self, archivo=None, umbral_compactacion=UMBRAL_COMPACTACION, multiproceso=MULTIPROCESO,
+                 retardo_escritura=RETARDO_ESCRITURA):
+        super().__init__(archivo, retardo_escritura, multiproceso)
+        self.umbral_compactacion = umbral_compactacion
+        self.bitacora = Bitacora(f"{self.archivo}.bitacora")
+
+    def cargar(self):
+        productos, _ = super().cargar()
+        return productos, self._leer_bitacora()
+
+    def cargar_volcado(self):
+        # El volcado se tomó después de la instantánea JSON: repetir la
+        # bitácora completa encima es seguro porque las operaciones son idempotentes
+        cargado = super().cargar_volcado()
+        if cargado is None:
+            return None
+        return cargado[0], self._leer_bitacora()
+
+    def _leer_bitacora(self):
+        registros = self.bitacora.leer()
+        if registros:
+            logger.info("%d operaciones recuperadas de la bitácora", len(registros), extra={'archivo': self.bitacora.archivo})
+        return registros
+
+    def hay_cambios(self):
+        return self._instantanea_cambio() or self.bitacora.hay_cambios()
+
+    def estado(self):
+        return self._firma, self.bitacora.inodo, self.bitacora.posicion
+
+    def leer_cambios(self):
+        # Si cambió la instantánea (o se rotó la bitácora) hay que recargar;
+        # si solo creció la bitácora, basta con leer las líneas nuevas
+        if self._instantanea_cambio():
+            return None
+        if not self.bitacora.hay_cambios():
+            return []
+        return self.bitacora.leer_nuevos()
+
+    def pendiente(self):
+        # La bitácora ya es durable
+        return False
+
+    def registrar(self, registros):
+        self.bitacora.agregar_varios(registros)
+        self._volcado_al_dia = False
+        if self.bitacora.tamano() < self.umbral_compactacion:
+            return
+        if self.multiproceso:
+            self._compactar_ahora()
+        else:
+            self._programar()
+
+    def _trabajo_pendiente(self):
+        # El hilo también se despierta solo para escribir el volcado
+        if self.bitacora.tamano() < self.umbral_compactacion:
+            return True
+        return self.compactar()
+
+    def _compactar_ahora(self):
+        # Compactación síncrona, con el lock del almacén y el bloqueo entre procesos tomados
+        self.bitacora.rotar()
+        if guardar_inventario(self._obtener_productos(), self.archivo):
+            self.bitacora.descartar_rotado()
+            self._firma = firma_archivo(self.archivo)
+
+    def compactar(self):
+        # Reescribe el JSON con el estado actual y descarta la bitácora ya incluida
+        with self._lock_escritura:
+            with self._lock_almacen:
+                productos = self._obtener_productos()
+                # Si ya había un archivo rotado (p. ej. tras un corte) no se rota
+                # otra vez: la instantánea lo incluye y la bitácora actual se
+                # puede repetir sin problema porque las operaciones son idempotentes
+                self.bitacora.rotar()
+
+            if not guardar_inventario(productos, self.archivo):
+                return False
+
+            with self._lock_almacen:
+                self.bitacora.descartar_rotado()
+                self._firma = firma_archivo(self.archivo)
+            return True
+
+    def guardar(self):
+        return True
+
+    def cerrar(self):
+        super().cerrar()
+        self.bitacora.cerrar()
+
+
+def _resumen_particion(productos):
+    # Lo que el manifiesto guarda de cada partición para no tener que leerla:
+    # totales por categoría (estadísticas) y los rangos de cantidad y de
+    # vencimiento (para saber si puede tener stock bajo o productos por vencer)
+    estadisticas = Estadisticas()
+    cantidades, vencimientos = [], []
+    for producto in productos:
+        estadisticas.agregar(producto)
+        if es_numero(producto.get('cantidad')):
+            cantidades.append(producto.get('cantidad'))
+        if es_fecha(producto.get('fecha_vencimiento')):
+            vencimientos.append(producto.get('fecha_vencimiento'))
+    return {
+        'totales': estadisticas.totales(),
+        'cantidad_min': min(cantidades, default=None),
+        'vence_min': min(vencimientos, default=None),
+        'vence_max': max(vencimientos, default=None),
+    }
+
+
+class PersistenciaParticionada(PersistenciaJSON):
+    # Un segmento JSON por partición en el directorio <archivo>.particiones,
+    # más un manifiesto con el esquema de reparto, el mayor id asignado y la
+    # lista de segmentos.
+    #
+    # - cargar() solo lee el manifiesto; cada partición se lee la primera
+    #   vez que el almacén la necesita (cargar_particiones).
+    # - Al guardar se reescriben solo las particiones que cambiaron.
+    # - Con el esquema 'categoria' una consulta por categoría abre un único
+    #   segmento, pero buscar por id obliga a leerlos todos (el id no dice en
+    #   qué categoría está). Con 'cubetas:N' es al revés.
+    #
+    # El manifiesto se escribe antes que los segmentos: si el proceso se corta
+    # a mitad, el mayor id anotado nunca queda por debajo de uno ya usado y un
+    # segmento listado pero sin archivo se lee como vacío. Sin manifiesto se
+    # reparte lo que haya (los segmentos existentes o el inventario.json de
+    # siempre) con el esquema configurado; así también se cambia de esquema.
+    #
+    # El manifiesto guarda además un resumen de cada partición (totales por
+    # categoría, menor cantidad, rango de vencimientos): las estadísticas y
+    # las métricas se responden sin leer las particiones, y stock bajo o
+    # vencimientos solo leen las que pueden tener resultados.
+
+    def __init__(self, archivo=None, retardo_escritura=RETARDO_ESCRITURA, multiproceso=MULTIPROCESO,
+                 particiones=PARTICIONES):
+        super().__init__(archivo, retardo_escritura, multiproceso)
+        # Cada partición se lee por separado: el volcado de todo no aplica
+        self.volcado = None
+        self.directorio = f"{self.archivo}.particiones"
+        self.manifiesto = os.path.join(self.directorio, MANIFIESTO)
+        self.esquema, self.cubetas = self._leer_esquema(particiones)
+        self._por_categoria = {}
+        self._reiniciar()
+
+    @staticmethod
+    def _leer_esquema(texto):
+        if texto == 'categoria':
+            return 'categoria', None
+        nombre, _, numero = texto.partition(':')
+        if nombre == 'cubetas' and numero.isdigit() and int(numero) > 0:
+            return 'cubetas', int(numero)
+        raise ValueError(f"Esquema de particiones desconocido: {texto}")
+
+    def _reiniciar(self):
+        self._nombres = set()      # segmentos listados en el manifiesto
+        self._cargadas = set()
+        self._ubicacion = {}       # id -> partición, solo de los productos cargados
+        self._miembros = {}        # partición -> ids
+        self._sucias = set()
+        self._id_maximo = 0
+        self._resumenes = {}       # partición -> _resumen_particion (del manifiesto o al guardar)
+
+    def _de_categoria(self, categoria):
+        if not isinstance(categoria, str):
+            return particion_por_categoria(categoria)
+        nombre = self._por_categoria.get(categoria)
+        if nombre is None:
+            nombre = self._por_categoria[categoria] = particion_por_categoria(categoria)
+        return nombre
+
+    def particion(self, producto):
+        if self.esquema == 'categoria':
+            return self._de_categoria(producto.get('categoria'))
+        return particion_por_id(producto['id'], self.cubetas)
+
+    def cargar(self):
+        self._reiniciar()
+        manifiesto = leer_manifiesto(self.directorio) or self._repartir()
+        esquema, cubetas = manifiesto.get('esquema'), manifiesto.get('cubetas')
+        if (esquema, cubetas) != (self.esquema, self.cubetas):
+            logger.warning("El manifiesto usa el esquema %s; se ignora el configurado", esquema,
+                           extra={'archivo': self.manifiesto})
+            self.esquema, self.cubetas = esquema, cubetas
+        self._nombres = set(manifiesto.get('particiones', ()))
+        self._id_maximo = manifiesto.get('id_maximo', 0)
+        resumenes = manifiesto.get('resumenes')
+        self._resumenes = dict(resumenes) if isinstance(resumenes, dict) else {}
+        self._firma = firma_archivo(self.manifiesto)
+        self._generacion_guardada = self._generacion
+        return [], []
+
+    def _repartir(self):
+        # Arma el manifiesto cuando no hay uno válido, repartiendo los
+        # segmentos existentes o, la primera vez, el inventario de un solo archivo
+        segmentos = listar_particiones(self.directorio)
+        if segmentos:
+            productos = [p for nombre in segmentos for p in leer_particion(self.directorio, nombre)]
+            origen = self.directorio
+        else:
+            productos = leer_inventario(self.archivo) if os.path.exists(self.archivo) else []
+            origen = self.archivo
+
+        reparto = {}
+        for producto in productos:
+            if isinstance(producto, dict) and 'id' in producto:
+                reparto.setdefault(self.particion(producto), []).append(producto)
+
+        manifiesto = {'esquema': self.esquema, 'cubetas': self.cubetas,
+                      'id_maximo': generar_id(productos) - 1, 'particiones': sorted(reparto),
+                      'resumenes': {nombre: _resumen_particion(lista) for nombre, lista in reparto.items()}}
+        if not guardar_manifiesto(manifiesto, self.directorio):
+            raise IOError(f"No se pudo crear el manifiesto en {self.directorio}")
+        for nombre, lista in reparto.items():
+            if not guardar_particion(sorted(lista, key=lambda p: p['id']), self.directorio, nombre):
+                raise IOError(f"No se pudo guardar la partición {nombre}")
+        # Los segmentos que ya no corresponden se borran al final, con todo ya escrito
+        for nombre in set(segmentos) - reparto.keys():
+            guardar_particion([], self.directorio, nombre)
+
+        if productos:
+            logger.info("Inventario repartido en %d particiones (%s)", len(reparto), self.esquema,
+                        extra={'archivo': origen})
+        return manifiesto
+
+    def _instantanea_cambio(self):
+        return not self._lock_escritura.locked() and firma_archivo(self.manifiesto) != self._firma
+
+    def id_maximo(self):
+        return self._id_maximo
+
+    def por_cargar(self, ids=None, categorias=None, productos=None):
+        faltan = self._nombres - self._cargadas
+        if not faltan:
+            return ()
+        if ids is None and categorias is None and productos is None:
+            return faltan
+
+        necesarias = {self.particion(p) for p in productos or ()}
+        if self.esquema == 'categoria':
+            if any(i not in self._ubicacion for i in ids or ()):
+                return faltan
+            necesarias.update(self._de_categoria(c) for c in categorias or ())
+        else:
+            if categorias:
+                return faltan
+            necesarias.update(particion_por_id(i, self.cubetas) for i in ids or () if isinstance(i, int))
+        return necesarias & faltan
+
+    def por_cargar_rango(self, cantidad_max=None, vence_desde=None, vence_hasta=None):
+        # Particiones sin cargar que pueden tener productos con cantidad <=
+        # cantidad_max o con vencimiento en [vence_desde, vence_hasta]; las
+        # que no tienen resumen se leen siempre
+        def puede_tener(resumen):
+            if resumen is None:
+                return True
+            if cantidad_max is not None:
+                return resumen['cantidad_min'] is not None and resumen['cantidad_min'] <= cantidad_max
+            if resumen['vence_min'] is None:
+                return False
+            return ((vence_hasta is None or resumen['vence_min'] <= vence_hasta)
+                    and (vence_desde is None or resumen['vence_max'] >= vence_desde))
+        return {nombre for nombre in self._nombres - self._cargadas if puede_tener(self._resumenes.get(nombre))}
+
+    def totales_sin_cargar(self):
+        filas = []
+        for nombre in self._nombres - self._cargadas:
+            resumen = self._resumenes.get(nombre)
+            if resumen is None:
+                # Manifiesto de una versión anterior: hay que leer la partición
+                return None
+            filas.extend(resumen['totales'])
+        return filas
+
+    def cargar_particiones(self, nombres):
+        productos = []
+        for nombre in sorted(nombres):
+            miembros = self._miembros.setdefault(nombre, set())
+            for producto in leer_particion(self.directorio, nombre):
+                if not isinstance(producto, dict) or 'id' not in producto:
+                    continue
+                if producto['id'] in self._ubicacion:
+                    # Repetido en otro segmento (un cambio de categoría
+                    # cortado a mitad): vale la copia ya cargada y este
+                    # segmento se reescribe sin él
+                    logger.warning("Producto %s repetido en %s", producto['id'], nombre,
+                                   extra={'archivo': self.directorio})
+                    self._sucias.add(nombre)
+                    continue
+                self._ubicacion[producto['id']] = nombre
+                miembros.add(producto['id'])
+                productos.append(producto)
+            self._cargadas.add(nombre)
+        return productos
+
+    def _ubicar(self, id, nombre):
+        anterior = self._ubicacion.get(id)
+        if anterior is not None and anterior != nombre:
+            self._miembros[anterior].discard(id)
+            self._sucias.add(anterior)
+        self._ubicacion[id] = nombre
+        self._miembros.setdefault(nombre, set()).add(id)
+        if nombre not in self._nombres:
+            # Partición nueva: no hay nada en disco que leer
+            self._nombres.add(nombre)
+            self._cargadas.add(nombre)
+        self._sucias.add(nombre)
+
+    def registrar(self, registros):
+        for registro in registros:
+            op = registro['op']
+            if op == 'crear':
+                producto = registro['producto']
+                self._ubicar(producto['id'], self.particion(producto))
+                self._id_maximo = max(self._id_maximo, producto['id'])
+            elif op == 'actualizar':
+                if self.esquema == 'categoria' and 'categoria' in registro['cambios']:
+                    self._ubicar(registro['id'], self._de_categoria(registro['cambios']['categoria']))
+                elif registro['id'] in self._ubicacion:
+                    self._sucias.add(self._ubicacion[registro['id']])
+            elif op == 'eliminar':
+                nombre = self._ubicacion.pop(registro['id'], None)
+                if nombre is not None:
+                    self._miembros[nombre].discard(registro['id'])
+                    self._sucias.add(nombre)
+        super().registrar(registros)
+
+    def _preparar(self):
+        # Con el lock del almacén tomado: manifiesto y contenido de las
+        # particiones que cambiaron (los productos se convierten al escribir)
+        sucias, self._sucias = self._sucias, set()
+        segmentos = {nombre: self._obtener_productos(sorted(self._miembros.get(nombre, ())))
+                     for nombre in sucias}
+        for nombre, productos in segmentos.items():
+            self._resumenes[nombre] = _resumen_particion(productos)
+        # Las cargadas que llegaron sin resumen (manifiesto anterior) lo reciben ahora
+        for nombre in (self._cargadas & self._nombres) - self._resumenes.keys():
+            self._resumenes[nombre] = _resumen_particion(
+                self._obtener_productos(sorted(self._miembros.get(nombre, ()))))
+        manifiesto = {'esquema': self.esquema, 'cubetas': self.cubetas,
+                      'id_maximo': self._id_maximo, 'particiones': sorted(self._nombres),
+                      'resumenes': {nombre: self._resumenes[nombre] for nombre in sorted(self._nombres)
+                                    if nombre in self._resumenes}}
+        # Las que quedaron vacías salen del próximo manifiesto (en este
+        # siguen listadas por si el borrado no llega a hacerse)
+        vacias = {nombre for nombre, productos in segmentos.items() if not productos}
+        self._nombres -= vacias
+        for nombre in vacias:
+            self._resumenes.pop(nombre, None)
+        return manifiesto, segmentos
+
+    def _escribir(self, manifiesto, segmentos):
+        if not guardar_manifiesto(manifiesto, self.directorio):
+            return False
+        resultados = [guardar_particion(productos, self.directorio, nombre)
+                      for nombre, productos in sorted(segmentos.items())]
+        return all(resultados)
+
+    def _guardar_ahora(self):
+        # Escritura síncrona, con el lock del almacén tomado
+        manifiesto, segmentos = self._preparar()
+        if not self._escribir(manifiesto, segmentos):
+            self._sucias.update(segmentos)
+            raise IOError(f"No se pudo guardar el inventario en {self.directorio}")
+        self._generacion_guardada = self._generacion
+        self._firma = firma_archivo(self.manifiesto)
+
+    def guardar(self):
+        # Escribe las particiones con cambios pendientes
+        with self._lock_escritura:
+            with self._lock_almacen:
+                if not self.pendiente():
+                    return True
+                generacion = self._generacion
+                manifiesto, segmentos = self._preparar()
+
+            if not self._escribir(manifiesto, segmentos):
+                with self._lock_almacen:
+                    self._sucias.update(segmentos)
+                return False
+
+            with self._lock_almacen:
+                self._generacion_guardada = generacion
+                self._firma = firma_archivo(self.manifiesto)
+            return True
+
+
+class PersistenciaSQLite(Persistencia):
+    # Una fila por producto en SQLite (modo WAL). Cada cambio es un UPDATE,
+    # INSERT o DELETE por clave primaria, sin reescribir nada más.
+    #
+    # La tabla cambios guarda las operaciones recientes para que los demás
+    # procesos se pongan al día leyendo solo lo nuevo; las transacciones
+    # BEGIN IMMEDIATE hacen de bloqueo entre procesos.
+
+    multiproceso = True
+
+    # Operaciones que se conservan en la tabla cambios
+    RETENCION_CAMBIOS = 10000
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            descripcion TEXT NOT NULL DEFAULT '',
+            precio REAL NOT NULL DEFAULT 0,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            fecha_vencimiento TEXT NOT NULL DEFAULT '',
+            fecha_creacion TEXT NOT NULL DEFAULT '',
+            fecha_modificacion TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos (categoria);
+        CREATE INDEX IF NOT EXISTS idx_productos_vencimiento ON productos (fecha_vencimiento);
+        CREATE TABLE IF NOT EXISTS cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            registro TEXT NOT NULL
+        );
+    """
+
+    SQL_INSERTAR = (f"INSERT OR REPLACE INTO productos ({', '.join(CAMPOS)}) "
+                    f"VALUES ({', '.join('?' for _ in CAMPOS)})")
+    SQL_ELIMINAR = "DELETE FROM productos WHERE id = ?"
+    SQL_CAMBIO = "INSERT INTO cambios (registro) VALUES (?)"
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or ARCHIVO_SQLITE
+        self.archivo_cambios = f"{self.ruta}.cambios"
+        self.directorio_importaciones = f"{self.ruta}.importaciones"
+        self._conexiones = {}
+        self._profundidad = 0
+        self._version_datos = None
+        self._ultimo_cambio = 0
+
+    def _conexion(self):
+        # Una conexión por proceso, reutilizada en todas las peticiones
+        # (el almacén serializa su uso con su propio lock)
+        pid = os.getpid()
+        conexion = self._conexiones.get(pid)
+        if conexion is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio and not os.path.exists(directorio):
+                os.makedirs(directorio)
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.executescript(self.ESQUEMA)
+            self._conexiones = {pid: conexion}
+        return conexion
+
+    @contextlib.contextmanager
+    def bloqueo(self):
+        # Transacción de escritura; reentrante dentro del mismo proceso
+        conexion = self._conexion()
+        if self._profundidad == 0:
+            conexion.execute("BEGIN IMMEDIATE")
+        self._profundidad += 1
+        try:
+            yield
+        except BaseException:
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                conexion.execute("ROLLBACK")
+            raise
+        else:
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                conexion.execute("COMMIT")
+
+    @staticmethod
+    def _fila_a_producto(fila):
+        producto = dict(zip(CAMPOS, fila))
+        if producto['fecha_modificacion'] is None:
+            del producto['fecha_modificacion']
+        return producto
+
+    # Valores para los campos que falten en un producto
+    POR_DEFECTO = {'nombre': '', 'categoria': '', 'descripcion': '', 'precio': 0, 'cantidad': 0,
+                   'fecha_vencimiento': '', 'fecha_creacion': ''}
+
+    @classmethod
+    def _producto_a_fila(cls, producto):
+        return tuple(producto.get(campo, cls.POR_DEFECTO.get(campo)) for campo in CAMPOS)
+
+    def cargar(self):
+        conexion = self._conexion()
+        filas = conexion.execute(f"SELECT {', '.join(CAMPOS)} FROM productos ORDER BY id").fetchall()
+        self._ultimo_cambio = conexion.execute("SELECT COALESCE(MAX(seq), 0) FROM cambios").fetchone()[0]
+        self._version_datos = conexion.execute("PRAGMA data_version").fetchone()[0]
+        return [self._fila_a_producto(f) for f in filas], []
+
+    def vaciar(self):
+        with self.bloqueo():
+            self._conexion().execute("DELETE FROM productos")
+
+    def importar(self, productos):
+        # Carga masiva (migración): una sola transacción con executemany
+        with self.bloqueo():
+            self._conexion().executemany(self.SQL_INSERTAR, (self._producto_a_fila(p) for p in productos))
+
+    def registrar(self, registros):
+        with self.bloqueo():
+            conexion = self._conexion()
+            for registro in registros:
+                op = registro['op']
+                if op == 'crear':
+                    conexion.execute(self.SQL_INSERTAR, self._producto_a_fila(registro['producto']))
+                elif op == 'actualizar':
+                    columnas = [c for c in registro['cambios'] if c in CAMPOS and c != 'id']
+                    if columnas:
+                        # El texto de la sentencia depende solo de las columnas,
+                        # así que sqlite3 reutiliza la sentencia preparada
+                        conexion.execute(
+                            f"UPDATE productos SET {', '.join(f'{c} = ?' for c in columnas)} WHERE id = ?",
+                            [registro['cambios'][c] for c in columnas] + [registro['id']])
+                elif op == 'eliminar':
+                    conexion.execute(self.SQL_ELIMINAR, (registro['id'],))
+                cursor = conexion.execute(self.SQL_CAMBIO, (a_json(registro).decode('utf-8'),))
+                self._ultimo_cambio = cursor.lastrowid
+
+            if self._ultimo_cambio % 1000 < len(registros):
+                conexion.execute("DELETE FROM cambios WHERE seq <= ?",
+                                 (self._ultimo_cambio - self.RETENCION_CAMBIOS,))
+
+    def estado(self):
+        return self._ultimo_cambio
+
+    def hay_cambios(self):
+        # data_version cambia cuando otra conexión confirma una transacción
+        return self._conexion().execute("PRAGMA data_version").fetchone()[0] != self._version_datos
+
+    def leer_cambios(self):
+        if not self.hay_cambios():
+            return []
+        conexion = self._conexion()
+        primero = conexion.execute("SELECT MIN(seq) FROM cambios").fetchone()[0]
+        if primero is not None and primero > self._ultimo_cambio + 1:
+            # Los cambios que faltan ya se descartaron: recargar todo
+            return None
+        filas = conexion.execute("SELECT seq, registro FROM cambios WHERE seq > ? ORDER BY seq",
+                                 (self._ultimo_cambio,)).fetchall()
+        if filas:
+            self._ultimo_cambio = filas[-1][0]
+        self._version_datos = conexion.execute("PRAGMA data_version").fetchone()[0]
+        return [desde_json(registro) for _, registro in filas]
+
+    def cerrar(self):
+        conexion = self._conexiones.pop(os.getpid(), None)
+        if conexion is not None:
+            conexion.close()
+
+
+def crear_persistencia(modo=MODO, archivo=None, retardo_escritura=RETARDO_ESCRITURA,
+                       umbral_compactacion=UMBRAL_COMPACTACION, multiproceso=MULTIPROCESO):
+    # Construye la persistencia según la configuración (INVENTARIO_MODO)
+    if modo == 'diferido':
+        return PersistenciaJSON(archivo, retardo_escritura, multiproceso)
+    if modo == 'bitacora':
+        return PersistenciaBitacora(archivo, umbral_compactacion, multiproceso, retardo_escritura)
+    if modo == 'sqlite':
+        return PersistenciaSQLite(archivo)
+    if modo == 'particionado':
+        return PersistenciaParticionada(archivo, retardo_escritura, multiproceso)
+    raise ValueError(f"Modo de almacenamiento desconocido: {modo}")
@@ -0,0 +1,61 @@
+import json
+import os
+
+from flask import Response
+
+# Capa única de (de)serialización JSON: usa orjson si está instalado (mucho
+# más rápido) y si no, la librería estándar. Siempre trabaja con bytes UTF-8,
+# sin pasar por un str intermedio.
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+# El archivo de inventario se escribe compacto; INVENTARIO_JSON_LEGIBLE=1
+# lo escribe con sangría para poder leerlo a mano
+LEGIBLE = os.environ.get('INVENTARIO_JSON_LEGIBLE', '0') == '1'
+
+# Error de decodificación de ambas implementaciones
+# (orjson.JSONDecodeError hereda de json.JSONDecodeError)
+ErrorJSON = json.JSONDecodeError
+
+
+def _a_dict(objeto):
+    # Los productos del almacén son objetos Producto: se escriben con to_dict()
+    if hasattr(objeto, 'to_dict'):
+        return objeto.to_dict()
+    raise TypeError(f"No se puede convertir a JSON: {type(objeto).__name__}")
+
+
+def a_json(datos, legible=False, ordenar=False):
+    # Objeto -> bytes UTF-8. Con ordenar=True la salida no depende del orden
+    # de las claves (sirve para calcular hashes estables).
+    # Con NaN o inf las dos implementaciones no coinciden: orjson escribe
+    # null y json escribe NaN/Infinity (que no es JSON válido). Por eso la
+    # validación rechaza los números no finitos antes de guardarlos.
+    if orjson is not None:
+        opciones = orjson.OPT_NON_STR_KEYS
+        if legible:
+            opciones |= orjson.OPT_INDENT_2
+        if ordenar:
+            opciones |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(datos, default=_a_dict, option=opciones)
+
+    if legible:
+        texto = json.dumps(datos, indent=2, ensure_ascii=False, sort_keys=ordenar, default=_a_dict)
+    else:
+        texto = json.dumps(datos, separators=(',', ':'), ensure_ascii=False, sort_keys=ordenar, default=_a_dict)
+    return texto.encode('utf-8')
+
+
+def desde_json(datos):
+    # bytes o str -> objeto. Lanza ErrorJSON si el contenido no es válido.
+    if orjson is not None:
+        return orjson.loads(datos)
+    return json.loads(datos)
+
+
+def respuesta_json(datos, codigo=200):
+    # Reemplazo de jsonify que serializa con a_json
+    return Response(a_json(datos), status=codigo, mimetype='application/json')
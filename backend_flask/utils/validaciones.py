@@ -0,0 +1,132 @@
+import math
+from datetime import date, datetime
+
+# Reglas de validación de productos, compartidas por los endpoints
+# individuales y por el endpoint de lotes.
+# Cada función devuelve (datos_limpios, None) o (None, mensaje_de_error).
+
+# Formatos aceptados para la fecha de vencimiento; se guarda siempre como AAAA-MM-DD
+FORMATOS_FECHA = ['%Y-%m-%d', '%d/%m/%Y']
+
+
+def _texto(valor):
+    return valor.strip() if isinstance(valor, str) else ''
+
+
+def _validar_precio(valor):
+    try:
+        precio = float(valor)
+    except (ValueError, TypeError):
+        return None, 'El precio debe ser un número válido'
+    # float() acepta "nan" e "inf", que no se pueden ordenar ni sumar
+    if not math.isfinite(precio):
+        return None, 'El precio debe ser un número válido'
+    if precio < 0:
+        return None, 'El precio no puede ser negativo'
+    return precio, None
+
+
+def _validar_cantidad(valor):
+    try:
+        cantidad = int(valor)
+    except (ValueError, TypeError, OverflowError):
+        # OverflowError: int(float('inf'))
+        return None, 'La cantidad debe ser un número entero válido'
+    if cantidad < 0:
+        return None, 'La cantidad no puede ser negativa'
+    return cantidad, None
+
+
+def _validar_fecha_vencimiento(valor):
+    # Opcional: vacía significa que el producto no vence
+    texto = _texto(valor)
+    if not texto:
+        return '', None
+    # Atajo para el formato habitual (AAAA-MM-DD): fromisoformat es mucho
+    # más rápida que strptime, lo que se nota en las importaciones masivas
+    if len(texto) == 10 and texto.isascii() and texto[4] == '-' and texto[7] == '-':
+        try:
+            return date.fromisoformat(texto).isoformat(), None
+        except ValueError:
+            return None, 'La fecha de vencimiento debe tener el formato AAAA-MM-DD'
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).strftime('%Y-%m-%d'), None
+        except ValueError:
+            pass
+    return None, 'La fecha de vencimiento debe tener el formato AAAA-MM-DD'
+
+
+def validar_nuevo_producto(data):
+    if not data or not isinstance(data, dict):
+        return None, 'No se recibieron datos'
+
+    # Validar nombre (obligatorio)
+    if not _texto(data.get('nombre')):
+        return None, 'El nombre es obligatorio'
+
+    # Validar categoría (obligatoria)
+    if not _texto(data.get('categoria')):
+        return None, 'La categoría es obligatoria'
+
+    precio, error = _validar_precio(data.get('precio', 0))
+    if error:
+        return None, error
+
+    cantidad, error = _validar_cantidad(data.get('cantidad', 0))
+    if error:
+        return None, error
+
+    fecha_vencimiento, error = _validar_fecha_vencimiento(data.get('fecha_vencimiento', ''))
+    if error:
+        return None, error
+
+    return {
+        'nombre': _texto(data['nombre']),
+        'categoria': _texto(data['categoria']),
+        'descripcion': _texto(data.get('descripcion', '')),
+        'precio': precio,
+        'cantidad': cantidad,
+        'fecha_vencimiento': fecha_vencimiento
+    }, None
+
+
+def validar_cambios_producto(data):
+    # Solo se validan los campos presentes (actualización parcial)
+    if not data or not isinstance(data, dict):
+        return None, 'No se recibieron datos para actualizar'
+
+    cambios = {}
+
+    if 'nombre' in data:
+        if not _texto(data['nombre']):
+            return None, 'El nombre no puede estar vacío'
+        cambios['nombre'] = _texto(data['nombre'])
+
+    if 'categoria' in data:
+        if not _texto(data['categoria']):
+            return None, 'La categoría no puede estar vacía'
+        cambios['categoria'] = _texto(data['categoria'])
+
+    if 'precio' in data:
+        precio, error = _validar_precio(data['precio'])
+        if error:
+            return None, error
+        cambios['precio'] = precio
+
+    if 'cantidad' in data:
+        cantidad, error = _validar_cantidad(data['cantidad'])
+        if error:
+            return None, error
+        cambios['cantidad'] = cantidad
+
+    if 'descripcion' in data:
+        cambios['descripcion'] = _texto(data['descripcion'])
+
+    if 'fecha_vencimiento' in data:
+        fecha_vencimiento, error = _validar_fecha_vencimiento(data['fecha_vencimiento'])
+        if error:
+            return None, error
+        cambios['fecha_vencimiento'] = fecha_vencimiento
+
+    return cambios, None
@@ -0,0 +1,44 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos se marcan los productos que vencieron
+INTERVALO_BARRIDO = float(os.environ.get('INVENTARIO_INTERVALO_VENCIMIENTOS', '3600'))
+
+
+class ProgramadorVencimientos:
+    # Hilo en segundo plano que barre periódicamente los vencimientos del
+    # almacén. El barrido solo recorre el tramo del índice de vencimiento
+    # que venció desde la vez anterior, nunca todo el catálogo.
+    # (Las consultas de vencidos también barren antes de responder, así que
+    # el hilo solo adelanta el trabajo y deja constancia en el registro.)
+
+    def __init__(self, almacen, intervalo=INTERVALO_BARRIDO):
+        self.almacen = almacen
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ejecutar, name='vencimientos', daemon=True)
+            self._hilo.start()
+        return self
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            try:
+                marcados = self.almacen.barrer_vencidos()
+                if marcados:
+                    logger.warning("%d productos vencidos desde el último barrido", marcados)
+            except Exception as e:
+                logger.exception("Error al barrer vencimientos: %s", e)
+            self._detener.wait(self.intervalo)
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
@@ -0,0 +1,106 @@
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from utils.metricas import LECTURAS, BYTES_LEIDOS, DURACION_DECODIFICACION, ESCRITURAS, BYTES_ESCRITOS, ERRORES_IO
+
+logger = logging.getLogger(__name__)
+
+# Volcado binario del almacén (productos e índices ya construidos) para
+# arrancar sin decodificar el JSON ni reconstruir los índices.
+#
+# Formato: una cabecera fija seguida del contenido en marshal.
+#   mágica (8 bytes) | formato | versión de Python (mayor, menor) | crc32 |
+#   largo del contenido | firma del JSON de origen (mtime_ns, inodo, tamaño)
+#
+# El volcado solo vale para el JSON con esa firma: si el archivo cambió
+# (se guardó, se compactó o se editó a mano) se ignora y se carga el JSON.
+# marshal cambia entre versiones de Python, por eso la versión va en la
+# cabecera. Se lee con mmap: el crc32 y marshal trabajan sobre el mapa
+# del archivo sin copiarlo antes a memoria.
+
+MAGICA = b'INVVOLC\x00'
+# 2: estadísticas e índices sin valores NaN/inf (los volcados anteriores se descartan)
+FORMATO = 2
+CABECERA = struct.Struct('<8sHBBIQqQQ')
+
+
+def escribir_volcado(ruta, datos, firma_origen):
+    # datos: diccionario del almacén; los productos (objetos Producto) se
+    # convierten aquí, fuera del lock, en tuplas o en diccionarios
+    ESCRITURAS.incrementar()
+    try:
+        filas, otros = [], []
+        for producto in datos.pop('productos'):
+            fila = producto.fila()
+            if fila is None:
+                otros.append(producto.to_dict())
+            else:
+                filas.append(fila)
+        datos = dict(datos, filas=filas, otros=otros)
+        contenido = marshal.dumps(datos)
+        mtime, inodo, tamano = firma_origen
+        cabecera = CABECERA.pack(MAGICA, FORMATO, sys.version_info[0], sys.version_info[1],
+                                 zlib.crc32(contenido), len(contenido), mtime, inodo, tamano)
+        # Con varios procesos cada uno usa su propio temporal
+        archivo_temp = f"{ruta}.{os.getpid()}.tmp"
+        with open(archivo_temp, 'wb') as f:
+            f.write(cabecera)
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(archivo_temp, ruta)
+        BYTES_ESCRITOS.incrementar(len(cabecera) + len(contenido))
+        return True
+    except Exception as e:
+        ERRORES_IO.incrementar(1, 'guardar')
+        logger.error("Error al escribir el volcado: %s", e, extra={'archivo': ruta})
+        return False
+
+
+def leer_volcado(ruta, firma_origen):
+    # Devuelve los datos del volcado, o None si no existe, no corresponde
+    # al JSON actual o está dañado (en ese caso se carga el JSON)
+    if firma_origen is None:
+        return None
+    try:
+        with open(ruta, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return _leer_mapa(ruta, mapa, firma_origen)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        # mmap de un archivo vacío o contenido que marshal no reconoce
+        ERRORES_IO.incrementar(1, 'leer')
+        logger.warning("Volcado ilegible (%s). Se cargará el JSON.", e, extra={'archivo': ruta})
+        return None
+
+
+def _leer_mapa(ruta, mapa, firma_origen):
+    if len(mapa) < CABECERA.size:
+        logger.warning("Volcado incompleto. Se cargará el JSON.", extra={'archivo': ruta})
+        return None
+    magica, formato, mayor, menor, crc, largo, *firma = CABECERA.unpack_from(mapa)
+    if magica != MAGICA or formato != FORMATO or (mayor, menor) != sys.version_info[:2]:
+        logger.info("Volcado de otra versión. Se cargará el JSON.", extra={'archivo': ruta})
+        return None
+    if tuple(firma) != tuple(firma_origen):
+        # Normal tras guardar el JSON: el próximo volcado lo pone al día
+        return None
+
+    LECTURAS.incrementar()
+    contenido = memoryview(mapa)[CABECERA.size:]
+    try:
+        if len(contenido) != largo or zlib.crc32(contenido) != crc:
+            ERRORES_IO.incrementar(1, 'leer')
+            logger.warning("Volcado dañado (crc32). Se cargará el JSON.", extra={'archivo': ruta})
+            return None
+        BYTES_LEIDOS.incrementar(largo)
+        with DURACION_DECODIFICACION.cronometrar():
+            return marshal.loads(contenido)
+    finally:
+        contenido.release()
@@ -19,6 +19,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: comprime la respuesta que dejan los demás (ver productos/compresion.py)
+    'productos.compresion.CompresionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +52,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'inventario_django.wsgi.application'
 
+# Las vistas son asíncronas: con un servidor ASGI (p. ej. uvicorn
+# inventario_django.asgi:application) comparten un solo bucle de eventos y el
+# pool de conexiones hacia la API. Con runserver/WSGI también funcionan.
+ASGI_APPLICATION = 'inventario_django.asgi:application'
+
 # No usar base de datos
 DATABASES = {
     'default': {
@@ -57,6 +64,29 @@ DATABASES = {
     }
 }
 
+# Cachés: 'paginas' guarda el HTML ya renderizado de la lista y el detalle
+# (ver productos/cache_paginas.py). Por defecto en memoria del proceso; con
+# varios procesos se puede cambiar por un backend compartido (Redis, Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'paginas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'paginas',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+CACHE_PAGINAS = 'paginas'
+
+# Segundos que una página guardada se sirve sin consultar la API
+TTL_PAGINAS = 10
+
+# Compresión de las respuestas (gzip; br y zstd si están instaladas brotli y
+# zstandard): bytes mínimos para comprimir y caché de los cuerpos comprimidos
+COMPRESION_MINIMA = 1024
+CACHE_COMPRESION = 'paginas'
+
 # Configuración de idioma
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'America/Guatemala'
@@ -0,0 +1,277 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Cliente compartido para la API de Flask: una sola sesión con conexiones
+# persistentes (keep-alive), reintentos y tiempos de espera en todas las
+# llamadas, más una caché corta para las lecturas de productos.
+#
+# Las funciones *_async son para las vistas asíncronas: permiten lanzar
+# varias llamadas a la vez con asyncio.gather. Usan httpx si está instalado
+# y, si no, las mismas funciones síncronas en hilos aparte.
+
+API_URL = "http://127.0.0.1:5000/api/productos"
+
+# (conexión, lectura) en segundos
+TIMEOUT = (3, 5)
+
+# Conexiones que se mantienen abiertas hacia la API
+TAMANO_POOL = 10
+
+# Segundos que una lectura se sirve desde la caché
+TTL_CACHE = 10
+MAX_ENTRADAS_CACHE = 256
+
+_sesion = None
+_lock_sesion = threading.Lock()
+
+
+def sesion():
+    global _sesion
+    if _sesion is None:
+        with _lock_sesion:
+            if _sesion is None:
+                # Solo se reintentan los métodos idempotentes
+                reintentos = Retry(
+                    total=2,
+                    backoff_factor=0.2,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'HEAD'])
+                )
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=TAMANO_POOL, max_retries=reintentos)
+                s = requests.Session()
+                s.mount('http://', adaptador)
+                s.mount('https://', adaptador)
+                _sesion = s
+    return _sesion
+
+
+class CacheTTL:
+    # Caché en memoria con expiración; se vacía con cada escritura propia.
+    # Las entradas vencidas se conservan con su ETag para revalidarlas con
+    # una petición condicional en lugar de descargarlas de nuevo.
+
+    def __init__(self, ttl=TTL_CACHE, max_entradas=MAX_ENTRADAS_CACHE):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        # (vigente, valor, validadores) o None si la clave no está guardada
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor, validadores = entrada
+            return expira >= time.monotonic(), valor, validadores
+
+    def guardar(self, clave, valor, validadores=None):
+        with self._lock:
+            if clave not in self._datos and len(self._datos) >= self.max_entradas:
+                # Descartar la entrada que vence primero
+                del self._datos[min(self._datos, key=lambda c: self._datos[c][0])]
+            self._datos[clave] = (time.monotonic() + self.ttl, valor, validadores or {})
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+cache = CacheTTL()
+
+# Un cliente asíncrono por bucle de eventos: las conexiones de httpx no se
+# pueden compartir entre bucles. Con ASGI hay un solo bucle y el pool dura
+# todo el proceso; con WSGI cada vista asíncrona corre en su propio bucle
+# (async_to_sync usa asyncio.run) y el cliente se cierra al terminar este.
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+async def _cerrar_al_terminar(cliente):
+    # Queda suspendido mientras viva el bucle: asyncio.run cierra los
+    # generadores asíncronos pendientes antes de cerrar el bucle, y eso
+    # ejecuta el finally dentro del mismo bucle
+    try:
+        yield
+    finally:
+        await cliente.aclose()
+
+
+async def cliente_async():
+    bucle = asyncio.get_running_loop()
+    entrada = _clientes_async.get(bucle)
+    if entrada is None:
+        cliente = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT[1], connect=TIMEOUT[0]),
+            limits=httpx.Limits(max_connections=TAMANO_POOL, max_keepalive_connections=TAMANO_POOL),
+            transport=httpx.AsyncHTTPTransport(retries=2)
+        )
+        # El bucle solo guarda una referencia débil al generador
+        cierre = _cerrar_al_terminar(cliente)
+        await cierre.asend(None)
+        entrada = _clientes_async[bucle] = (cliente, cierre)
+    return entrada[0]
+
+
+async def _pedir_async(metodo, url, **kwargs):
+    # Los errores de httpx se traducen a los de requests para que las vistas
+    # manejen igual las llamadas síncronas y las asíncronas
+    try:
+        cliente = await cliente_async()
+        return await cliente.request(metodo, url, **kwargs)
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e))
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e))
+
+
+def _respuesta(response):
+    # (código de estado, cuerpo JSON o {} si no es JSON)
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    return response.status_code, data
+
+
+def _validadores(response):
+    # Cabeceras para repetir la lectura como petición condicional
+    validadores = {}
+    if response.headers.get('ETag'):
+        validadores['If-None-Match'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validadores['If-Modified-Since'] = response.headers['Last-Modified']
+    return validadores
+
+
+def _leer(url, params=None):
+    clave = (url, tuple(sorted((params or {}).items())))
+    guardado = cache.obtener(clave)
+    if guardado is not None and guardado[0]:
+        return guardado[1]
+
+    headers = guardado[2] if guardado is not None else None
+    response = sesion().get(url, params=params, headers=headers, timeout=TIMEOUT)
+    if response.status_code == 304 and guardado is not None:
+        # Sin cambios en la API: se renueva la entrada sin volver a descargarla
+        cache.guardar(clave, guardado[1], guardado[2])
+        return guardado[1]
+
+    resultado = _respuesta(response)
+    if resultado[0] == 200:
+        cache.guardar(clave, resultado, _validadores(response))
+    return resultado
+
+
+async def _leer_async(url, params=None):
+    if httpx is None:
+        return await sync_to_async(_leer, thread_sensitive=False)(url, params)
+
+    clave = (url, tuple(sorted((params or {}).items())))
+    guardado = cache.obtener(clave)
+    if guardado is not None and guardado[0]:
+        return guardado[1]
+
+    headers = guardado[2] if guardado is not None else None
+    response = await _pedir_async('GET', url, params=params, headers=headers)
+    if response.status_code == 304 and guardado is not None:
+        cache.guardar(clave, guardado[1], guardado[2])
+        return guardado[1]
+
+    resultado = _respuesta(response)
+    if resultado[0] == 200:
+        cache.guardar(clave, resultado, _validadores(response))
+    return resultado
+
+
+def _escribir(metodo, url, **kwargs):
+    try:
+        return _respuesta(sesion().request(metodo, url, timeout=TIMEOUT, **kwargs))
+    finally:
+        # Cualquier escritura invalida las lecturas guardadas
+        cache.limpiar()
+
+
+async def _escribir_async(metodo, url, **kwargs):
+    if httpx is None:
+        return await sync_to_async(_escribir, thread_sensitive=False)(metodo, url, **kwargs)
+    try:
+        return _respuesta(await _pedir_async(metodo, url, **kwargs))
+    finally:
+        cache.limpiar()
+
+
+def listar_productos(params=None):
+    return _leer(API_URL, params)
+
+
+def obtener_producto(id):
+    return _leer(f"{API_URL}/{id}")
+
+
+def crear_producto(data):
+    return _escribir('POST', API_URL, json=data)
+
+
+def actualizar_producto(id, data):
+    return _escribir('PUT', f"{API_URL}/{id}", json=data)
+
+
+def eliminar_producto(id):
+    return _escribir('DELETE', f"{API_URL}/{id}")
+
+
+def _parametros(**params):
+    # Omite los parámetros no indicados para que la API use sus valores por defecto
+    return {k: v for k, v in params.items() if v is not None}
+
+
+async def listar_productos_async(params=None):
+    return await _leer_async(API_URL, params)
+
+
+async def obtener_producto_async(id):
+    return await _leer_async(f"{API_URL}/{id}")
+
+
+async def crear_producto_async(data):
+    return await _escribir_async('POST', API_URL, json=data)
+
+
+async def actualizar_producto_async(id, data):
+    return await _escribir_async('PUT', f"{API_URL}/{id}", json=data)
+
+
+async def eliminar_producto_async(id):
+    return await _escribir_async('DELETE', f"{API_URL}/{id}")
+
+
+async def estadisticas_async():
+    return await _leer_async(f"{API_URL}/estadisticas")
+
+
+async def estadisticas_categorias_async():
+    return await _leer_async(f"{API_URL}/estadisticas/categorias")
+
+
+async def stock_bajo_async(umbral=None, limite=None):
+    return await _leer_async(f"{API_URL}/estadisticas/stock-bajo", _parametros(umbral=umbral, limit=limite))
+
+
+async def por_vencer_async(dias=None, limite=None):
+    return await _leer_async(f"{API_URL}/por-vencer", _parametros(dias=dias, limit=limite))
+
+
+async def vencidos_async(limite=None):
+    return await _leer_async(f"{API_URL}/vencidos", _parametros(limit=limite))
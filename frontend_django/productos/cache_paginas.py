@@ -0,0 +1,118 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+# Caché de páginas ya renderizadas (lista y detalle). Cada página se guarda
+# junto con la versión de los datos con que se generó: la revisión del
+# catálogo para la lista y el propio producto para el detalle.
+#
+# - Mientras la página esté vigente (TTL_PAGINAS) se sirve directamente, sin
+#   llamar a la API ni a las plantillas.
+# - Ya vencida, la vista vuelve a pedir los datos (normalmente una petición
+#   condicional que responde 304) y, si la versión no cambió, reutiliza el
+#   HTML guardado en lugar de renderizarlo otra vez.
+# - Las escrituras hechas desde este frontend invalidan todas las páginas
+#   subiendo un número de generación que forma parte de la clave.
+# - Cada página lleva un ETag calculado del HTML, con el que
+#   productos/compresion.py reutiliza el cuerpo ya comprimido.
+#
+# El backend de caché se elige en settings.CACHES (alias CACHE_PAGINAS).
+
+ALIAS = getattr(settings, 'CACHE_PAGINAS', 'default')
+TTL_PAGINAS = getattr(settings, 'TTL_PAGINAS', 10)
+
+# Tiempo que se conserva una página vencida para poder revalidarla
+DURACION_MAXIMA = getattr(settings, 'DURACION_MAXIMA_PAGINAS', 3600)
+
+CLAVE_GENERACION = 'paginas:generacion'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _guardable(request):
+    # Solo lecturas sin mensajes pendientes: los mensajes son de cada usuario
+    # y se muestran una sola vez
+    return request.method == 'GET' and len(messages.get_messages(request)) == 0
+
+
+async def _generacion():
+    # Si la generación se perdió (p. ej. la caché descartó la clave) se
+    # empieza desde la hora actual, que no repite ninguna generación anterior
+    cache = _cache()
+    generacion = await cache.aget(CLAVE_GENERACION)
+    if generacion is None:
+        await cache.aadd(CLAVE_GENERACION, time.time_ns(), None)
+        generacion = await cache.aget(CLAVE_GENERACION)
+    return generacion
+
+
+async def _clave(request):
+    generacion = await _generacion()
+    ruta = hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest()
+    return f'paginas:{generacion}:{ruta}'
+
+
+def _etag(contenido):
+    return '"%s"' % hashlib.sha1(contenido).hexdigest()[:20]
+
+
+class PaginaGuardada:
+    def __init__(self, clave, expira, version, contenido, etag):
+        self.clave = clave
+        self.expira = expira
+        self.version = version
+        self.contenido = contenido
+        self.etag = etag
+
+    @property
+    def vigente(self):
+        return self.expira >= time.time()
+
+    def respuesta(self):
+        response = HttpResponse(self.contenido)
+        response['ETag'] = self.etag
+        return response
+
+
+async def obtener(request):
+    # PaginaGuardada (vigente o no) o None si no hay nada que reutilizar
+    if not _guardable(request):
+        return None
+    clave = await _clave(request)
+    guardada = await _cache().aget(clave)
+    if guardada is None:
+        return None
+    expira, version, contenido, etag = guardada
+    return PaginaGuardada(clave, expira, version, contenido, etag)
+
+
+async def renovar(pagina):
+    # La versión de los datos no cambió: la misma página vale otro periodo
+    pagina.expira = time.time() + TTL_PAGINAS
+    await _cache().aset(pagina.clave, (pagina.expira, pagina.version, pagina.contenido, pagina.etag),
+                        DURACION_MAXIMA)
+
+
+async def guardar(request, version, response):
+    if version is None or response.status_code != 200 or not _guardable(request):
+        return
+    clave = await _clave(request)
+    response['ETag'] = _etag(response.content)
+    await _cache().aset(clave, (time.time() + TTL_PAGINAS, version, response.content, response['ETag']),
+                        DURACION_MAXIMA)
+
+
+async def invalidar():
+    # Cambia la generación: las páginas anteriores dejan de encontrarse y
+    # el backend de caché las descarta al vencer
+    cache = _cache()
+    try:
+        await cache.aincr(CLAVE_GENERACION)
+    except ValueError:
+        await cache.aset(CLAVE_GENERACION, time.time_ns(), None)
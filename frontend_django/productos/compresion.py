@@ -0,0 +1,153 @@
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+# Compresión de las páginas según Accept-Encoding: gzip siempre, y brotli
+# (br) y zstd si están instaladas las librerías. Reemplaza a GZipMiddleware.
+#
+# - Las respuestas pequeñas (menos de COMPRESION_MINIMA bytes) van sin comprimir.
+# - Las respuestas en streaming se comprimen por partes, a medida que se envían.
+# - Si la página trae ETag (las de cache_paginas.py lo calculan del HTML) el
+#   cuerpo comprimido se guarda en la caché CACHE_COMPRESION: una página que
+#   no cambió no se vuelve a comprimir en cada petición.
+#
+# Cada codificación lleva su propio ETag ("<etag>-gzip"), igual que la API.
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Dependencia opcional
+    zstandard = None
+
+COMPRESION_MINIMA = getattr(settings, 'COMPRESION_MINIMA', 1024)
+ALIAS = getattr(settings, 'CACHE_COMPRESION', getattr(settings, 'CACHE_PAGINAS', 'default'))
+DURACION_CACHE = getattr(settings, 'DURACION_CACHE_COMPRESION', 3600)
+
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+NIVEL_ZSTD = 3
+
+# En orden de preferencia cuando el cliente acepta varias con la misma calidad
+CODIFICACIONES = tuple(c for c, disponible in (('zstd', zstandard), ('br', brotli), ('gzip', zlib))
+                       if disponible is not None)
+
+TIPOS_COMPRIMIBLES = ('text/html', 'text/plain', 'text/css', 'text/csv', 'application/json',
+                      'application/javascript', 'image/svg+xml')
+
+
+def _compresor(codificacion):
+    # (comprimir, terminar) para una codificación
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=NIVEL_BROTLI)
+        return compresor.process, compresor.finish
+    if codificacion == 'zstd':
+        compresor = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+        return compresor.compress, compresor.flush
+    # wbits=31: formato gzip, con fecha 0 (el mismo cuerpo da los mismos bytes)
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compresor.compress, compresor.flush
+
+
+def comprimir(datos, codificacion):
+    comprimir_parte, terminar = _compresor(codificacion)
+    return comprimir_parte(datos) + terminar()
+
+
+def comprimir_partes(partes, codificacion):
+    comprimir_parte, terminar = _compresor(codificacion)
+    for parte in partes:
+        datos = comprimir_parte(parte)
+        if datos:
+            yield datos
+    yield terminar()
+
+
+async def comprimir_partes_async(partes, codificacion):
+    comprimir_parte, terminar = _compresor(codificacion)
+    async for parte in partes:
+        datos = comprimir_parte(parte)
+        if datos:
+            yield datos
+    yield terminar()
+
+
+def elegir_codificacion(aceptadas):
+    # La codificación de mayor calidad (q) en Accept-Encoding, o None
+    calidades = {}
+    for elemento in aceptadas.split(','):
+        nombre, _, parametros = elemento.partition(';')
+        calidad = 1.0
+        for parametro in parametros.split(';'):
+            clave, _, valor = parametro.partition('=')
+            if clave.strip() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        calidades[nombre.strip().lower()] = calidad
+
+    elegida, mejor = None, 0.0
+    for codificacion in CODIFICACIONES:
+        calidad = calidades.get(codificacion, calidades.get('*', 0.0))
+        if calidad > mejor:
+            elegida, mejor = codificacion, calidad
+    return elegida
+
+
+def _tipo(response):
+    return response.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+class CompresionMiddleware(MiddlewareMixin):
+    # Va primero en settings.MIDDLEWARE: comprime la respuesta ya terminada
+
+    def process_response(self, request, response):
+        if (request.method == 'HEAD' or response.status_code != 200
+                or response.has_header('Content-Encoding') or _tipo(response) not in TIPOS_COMPRIMIBLES
+                or 'no-transform' in response.get('Cache-Control', '')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacion = elegir_codificacion(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = comprimir_partes_async(response.streaming_content, codificacion)
+            else:
+                response.streaming_content = comprimir_partes(response.streaming_content, codificacion)
+            del response['Content-Length']
+        else:
+            if len(response.content) < COMPRESION_MINIMA:
+                return response
+            response.content = self._comprimido(response, codificacion)
+            response['Content-Length'] = str(len(response.content))
+
+        response['Content-Encoding'] = codificacion
+        etag = response.get('ETag')
+        if etag and etag.endswith('"'):
+            response['ETag'] = f'{etag[:-1]}-{codificacion}"'
+        return response
+
+    def _comprimido(self, response, codificacion):
+        # Con ETag se busca primero en la caché; el largo del HTML descarta
+        # una entrada que no corresponda a este contenido
+        etag = response.get('ETag')
+        if not etag:
+            return comprimir(response.content, codificacion)
+        cache = caches[ALIAS]
+        clave = 'compresion:%s:%s' % (hashlib.sha1(etag.encode('utf-8')).hexdigest(), codificacion)
+        guardado = cache.get(clave)
+        if guardado is not None and guardado[0] == len(response.content):
+            return guardado[1]
+        comprimido = comprimir(response.content, codificacion)
+        cache.set(clave, (len(response.content), comprimido), DURACION_CACHE)
+        return comprimido
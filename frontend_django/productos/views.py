@@ -1,24 +1,60 @@
+import asyncio
+
 import requests
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.contrib import messages
 
-API_URL = "http://127.0.0.1:5000/api/productos"
+from . import api_cliente, cache_paginas
+
+# Productos por página en la lista y campos que necesita la tabla
+POR_PAGINA = 25
+CAMPOS_LISTA = "id,nombre,categoria,precio,cantidad,fecha_vencimiento"
+
+# Productos que se muestran en cada sección del panel
+LIMITE_PANEL = 10
 
 
-def lista_productos(request):
-    # Obtiene y muestra todos los productos del inventario
+async def lista_productos(request):
+    # Obtiene y muestra una página de productos del inventario
+    
+    guardada = await cache_paginas.obtener(request)
+    if guardada is not None and guardada.vigente:
+        return guardada.respuesta()
     
     try:
-        response = requests.get(API_URL, timeout=5)
+        try:
+            pagina = max(int(request.GET.get("pagina", 1)), 1)
+        except ValueError:
+            pagina = 1
+        
+        params = {
+            "limit": POR_PAGINA,
+            "offset": (pagina - 1) * POR_PAGINA,
+            "fields": CAMPOS_LISTA
+        }
+        status, data = await api_cliente.listar_productos_async(params)
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
+            # Si el catálogo sigue en la misma revisión se reutiliza el HTML
+            revision = data.get("revision")
+            if guardada is not None and revision is not None and guardada.version == revision:
+                await cache_paginas.renovar(guardada)
+                return guardada.respuesta()
+            
             productos = data.get("productos", [])
-            return render(request, "lista.html", {
+            total = data.get("total", len(productos))
+            total_paginas = max((total + POR_PAGINA - 1) // POR_PAGINA, 1)
+            response = render(request, "lista.html", {
                 "productos": productos,
-                "total": len(productos)
+                "total": total,
+                "pagina": pagina,
+                "total_paginas": total_paginas,
+                "pagina_anterior": pagina - 1 if pagina > 1 else None,
+                "pagina_siguiente": pagina + 1 if pagina < total_paginas else None
             })
+            await cache_paginas.guardar(request, revision, response)
+            return response
         else:
             messages.error(request, "Error al obtener los productos")
             return render(request, "lista.html", {"productos": []})
@@ -34,18 +70,28 @@ def lista_productos(request):
         return render(request, "lista.html", {"productos": []})
 
 
-def detalle_producto(request, id):
+async def detalle_producto(request, id):
     #Muestra los detalles de un producto específico
     
+    guardada = await cache_paginas.obtener(request)
+    if guardada is not None and guardada.vigente:
+        return guardada.respuesta()
+    
     try:
-        response = requests.get(f"{API_URL}/{id}", timeout=5)
+        status, data = await api_cliente.obtener_producto_async(id)
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             producto = data.get("producto")
             if producto:
-                return render(request, "detalle.html", {"producto": producto})
-        elif response.status_code == 404:
+                # La versión del detalle es el propio producto (el mismo
+                # contenido del que sale el ETag de la API)
+                if guardada is not None and guardada.version == producto:
+                    await cache_paginas.renovar(guardada)
+                    return guardada.respuesta()
+                response = render(request, "detalle.html", {"producto": producto})
+                await cache_paginas.guardar(request, producto, response)
+                return response
+        elif status == 404:
             messages.error(request, "Producto no encontrado")
             return redirect(reverse("lista_productos"))
         else:
@@ -60,7 +106,7 @@ def detalle_producto(request, id):
         return redirect(reverse("lista_productos"))
 
 
-def crear_producto(request):
+async def crear_producto(request):
     #Crea un nuevo producto en el inventario
     
     if request.method == "POST":
@@ -84,14 +130,15 @@ def crear_producto(request):
             }
             
             # Enviar petición a la API
-            response = requests.post(API_URL, json=data, timeout=5)
+            status, respuesta = await api_cliente.crear_producto_async(data)
+            # Las páginas guardadas pueden mostrar datos que ya cambiaron
+            await cache_paginas.invalidar()
             
-            if response.status_code == 201:
+            if status == 201:
                 messages.success(request, "Producto creado exitosamente")
                 return redirect(reverse("lista_productos"))
             else:
-                error_data = response.json()
-                error_msg = error_data.get("error", "Error al crear el producto")
+                error_msg = respuesta.get("error", "Error al crear el producto")
                 messages.error(request, error_msg)
                 return render(request, "formulario.html", {"datos": request.POST})
                 
@@ -105,7 +152,7 @@ def crear_producto(request):
     return render(request, "formulario.html")
 
 
-def actualizar_producto(request, id):
+async def actualizar_producto(request, id):
     # Actualiza un producto existente
     
     if request.method == "POST":
@@ -116,8 +163,7 @@ def actualizar_producto(request, id):
             
             if not nombre or not categoria:
                 messages.error(request, "El nombre y la categoría son obligatorios")
-                producto = requests.get(f"{API_URL}/{id}").json().get("producto", {})
-                return render(request, "formulario.html", {"producto": producto})
+                return render(request, "formulario.html", {"producto": _producto_enviado(request, id)})
             
             # Preparar datos
             data = {
@@ -130,20 +176,20 @@ def actualizar_producto(request, id):
             }
             
             # Enviar petición a la API
-            response = requests.put(f"{API_URL}/{id}", json=data, timeout=5)
+            status, respuesta = await api_cliente.actualizar_producto_async(id, data)
+            # Las páginas guardadas pueden mostrar datos que ya cambiaron
+            await cache_paginas.invalidar()
             
-            if response.status_code == 200:
+            if status == 200:
                 messages.success(request, "Producto actualizado exitosamente")
                 return redirect(reverse("lista_productos"))
-            elif response.status_code == 404:
+            elif status == 404:
                 messages.error(request, "Producto no encontrado")
                 return redirect(reverse("lista_productos"))
             else:
-                error_data = response.json()
-                error_msg = error_data.get("error", "Error al actualizar el producto")
+                error_msg = respuesta.get("error", "Error al actualizar el producto")
                 messages.error(request, error_msg)
-                producto = requests.get(f"{API_URL}/{id}").json().get("producto", {})
-                return render(request, "formulario.html", {"producto": producto})
+                return render(request, "formulario.html", {"producto": _producto_enviado(request, id)})
                 
         except requests.exceptions.ConnectionError:
             messages.error(request, "No se pudo conectar con el servidor")
@@ -154,9 +200,8 @@ def actualizar_producto(request, id):
     
     # GET request - mostrar formulario con datos del producto
     try:
-        response = requests.get(f"{API_URL}/{id}", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
+        status, data = await api_cliente.obtener_producto_async(id)
+        if status == 200:
             producto = data.get("producto", {})
             return render(request, "formulario.html", {"producto": producto})
         else:
@@ -167,18 +212,29 @@ def actualizar_producto(request, id):
         return redirect(reverse("lista_productos"))
 
 
-def eliminar_producto(request, id):
+def _producto_enviado(request, id):
+    # Datos del formulario tal como se enviaron: al volver a mostrarlo tras un
+    # error no hace falta pedir el producto otra vez a la API
+    campos = ["nombre", "categoria", "descripcion", "precio", "cantidad", "fecha_vencimiento"]
+    producto = {campo: request.POST.get(campo, "") for campo in campos}
+    producto["id"] = id
+    return producto
+
+
+async def eliminar_producto(request, id):
     """
     Elimina un producto del inventario
     """
     if request.method == "POST":
         try:
-            response = requests.delete(f"{API_URL}/{id}", timeout=5)
+            status, _ = await api_cliente.eliminar_producto_async(id)
+            # Las páginas guardadas pueden mostrar datos que ya cambiaron
+            await cache_paginas.invalidar()
             
-            if response.status_code == 200:
+            if status == 200:
                 messages.success(request, "Producto eliminado exitosamente")
                 return redirect(reverse("lista_productos"))
-            elif response.status_code == 404:
+            elif status == 404:
                 messages.error(request, "Producto no encontrado")
                 return redirect(reverse("lista_productos"))
             else:
@@ -194,9 +250,8 @@ def eliminar_producto(request, id):
     
     # GET request - mostrar confirmación
     try:
-        response = requests.get(f"{API_URL}/{id}", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
+        status, data = await api_cliente.obtener_producto_async(id)
+        if status == 200:
             producto = data.get("producto", {})
             return render(request, "eliminar.html", {"producto": producto})
         else:
@@ -204,4 +259,40 @@ def eliminar_producto(request, id):
             return redirect(reverse("lista_productos"))
     except Exception as e:
         messages.error(request, f"Error al cargar el producto: {str(e)}")
-        return redirect(reverse("lista_productos"))
\ No newline at end of file
+        return redirect(reverse("lista_productos"))
+
+
+async def panel(request):
+    # Resumen del inventario: las cinco consultas a la API son independientes
+    # y se hacen a la vez, así la página tarda lo que la más lenta
+    
+    try:
+        totales, categorias, stock, por_vencer, vencidos = await asyncio.gather(
+            api_cliente.estadisticas_async(),
+            api_cliente.estadisticas_categorias_async(),
+            api_cliente.stock_bajo_async(limite=LIMITE_PANEL),
+            api_cliente.por_vencer_async(limite=LIMITE_PANEL),
+            api_cliente.vencidos_async(limite=LIMITE_PANEL),
+        )
+        
+        # Cada sección se muestra solo si su consulta respondió bien
+        if any(status != 200 for status, _ in (totales, categorias, stock, por_vencer, vencidos)):
+            messages.error(request, "Algunas secciones del panel no se pudieron cargar")
+        
+        return render(request, "panel.html", {
+            "totales": totales[1].get("estadisticas") if totales[0] == 200 else None,
+            "categorias": categorias[1].get("categorias", []) if categorias[0] == 200 else [],
+            "stock_bajo": stock[1] if stock[0] == 200 else None,
+            "por_vencer": por_vencer[1] if por_vencer[0] == 200 else None,
+            "vencidos": vencidos[1] if vencidos[0] == 200 else None,
+        })
+        
+    except requests.exceptions.ConnectionError:
+        messages.error(request, "No se pudo conectar con el servidor Flask. Asegúrate de que esté corriendo en http://127.0.0.1:5000")
+        return render(request, "panel.html")
+    except requests.exceptions.Timeout:
+        messages.error(request, "El servidor tardó demasiado en responder")
+        return render(request, "panel.html")
+    except Exception as e:
+        messages.error(request, f"Error inesperado: {str(e)}")
+        return render(request, "panel.html")